@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AuthConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Auth'
+
+    def ready(self):
+        # Сигнали інвалідації кешу юзерів
+        from . import authentification  # noqa: F401
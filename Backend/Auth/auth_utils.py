@@ -1,4 +1,8 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
 from .models import CustomUser
+from . import token_ledger
+from .authentification import aget_cached_user
 
 def authenticate_user(email, password):
     try:
@@ -8,14 +12,33 @@ def authenticate_user(email, password):
     except CustomUser.DoesNotExist:
         return None
 
-def add_token_transaction(user: CustomUser, input_tokens=0, output_tokens=0):
-    # create a record
-    TokenTransaction.objects.create(
-        user=user,
-        input_token=input_tokens,
-        output_token=output_tokens
-    )
-    # update user's total tokens
-    user.tokens += input_tokens
-    user.tokens -= output_tokens
-    user.save()
\ No newline at end of file
+def add_token_transaction(user: CustomUser, input_tokens=0, output_tokens=0, endpoint="manual", model=""):
+    """
+    Ручний запис у журнал токенів. LLM-виклики через Courses/llm.py
+    пишуться туди самі.
+    """
+    token_ledger.record(user.id, endpoint, model, input_tokens, output_tokens)
+
+async def aget_jwt_user(request):
+    """
+    Async-версія JWTAuthentication для ASGI в'юх.
+    Повертає юзера або None, якщо токена немає чи він невалідний.
+    """
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    if header is None:
+        return None
+
+    raw_token = auth.get_raw_token(header)
+    if raw_token is None:
+        return None
+
+    try:
+        validated_token = auth.get_validated_token(raw_token)
+    except InvalidToken:
+        return None
+
+    user = await aget_cached_user(validated_token["user_id"])
+    if user is None or not user.is_active:
+        return None
+    return user
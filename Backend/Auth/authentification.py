@@ -1,11 +1,143 @@
-# your_auth_app/authentication.py
+"""
+JWT-авторизація з кешем юзерів.
+
+Стандартний JWTAuthentication робить CustomUser.objects.get(id=...) на
+кожен запит. Тут юзер береться з LRU-кешу процесу (AUTH_USER_CACHE_SIZE
+записів, живе AUTH_USER_CACHE_TTL секунд). Будь-який save()/delete()
+юзера (UserUpdateSerializer, set_password) скидає запис через сигнали.
+Зміни через QuerySet.update() сигналів не шлють — там треба викликати
+invalidate_user() вручну (як Auth/streaks.py).
+
+Кеш свій у кожного процесу: зміна в одному воркері видна іншим
+щонайпізніше через TTL.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
 from .models import CustomUser
 
+
+class UserCache:
+    """
+    LRU з TTL: user_id -> (expires_at, user).
+    Ключ — str(user_id): у токені simplejwt id лежить рядком.
+    """
+
+    def __init__(self):
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        # Росте з кожною інвалідацією: запит, що читав БД до неї, не покладе в кеш старий рядок
+        self.generation = 0
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is None:
+                return None
+            expires_at, user = item
+            if expires_at <= time.monotonic():
+                del self._items[user_id]
+                return None
+            self._items.move_to_end(user_id)
+        # Кожен запит отримує свою копію — зміни в в'юсі не течуть у кеш
+        return copy.copy(user)
+
+    def set(self, user, generation):
+        ttl = settings.AUTH_USER_CACHE_TTL
+        if ttl <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            key = str(user.pk)
+            self._items[key] = (time.monotonic() + ttl, copy.copy(user))
+            self._items.move_to_end(key)
+            while len(self._items) > settings.AUTH_USER_CACHE_SIZE:
+                self._items.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self.generation += 1
+            self._items.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+user_cache = UserCache()
+
+
+def invalidate_user(user_id):
+    user_cache.invalidate(user_id)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def _drop_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+def get_cached_user(user_id):
+    """Юзер з кешу або з БД; None, якщо такого немає."""
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    generation = user_cache.generation
+    user = CustomUser.objects.filter(id=user_id).first()
+    if user is not None:
+        user_cache.set(user, generation)
+    return user
+
+
+async def aget_cached_user(user_id):
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    generation = user_cache.generation
+    user = await CustomUser.objects.filter(id=user_id).afirst()
+    if user is not None:
+        user_cache.set(user, generation)
+    return user
+
+
 class CustomJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication, але юзер з user_cache — мінус один SQL-запит на кожен API-виклик."""
+
     def get_user(self, validated_token):
         try:
-            user_id = validated_token["user_id"]
-            return CustomUser.objects.get(id=user_id)
-        except CustomUser.DoesNotExist:
-            return None
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        # Ті самі перевірки, що й у JWTAuthentication.get_user
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
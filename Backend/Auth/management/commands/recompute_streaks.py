@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from Auth.streaks import recompute_streaks
+
+
+class Command(BaseCommand):
+    help = "Recomputes users' streaks from the activity event log."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, nargs="+", dest="user_ids", help="Only these user ids.")
+
+    def handle(self, *args, **options):
+        updated = recompute_streaks(options["user_ids"])
+        self.stdout.write(f"Recomputed streaks for {updated} users")
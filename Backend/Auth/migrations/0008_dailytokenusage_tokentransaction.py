@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Auth', '0007_customuser_last_submission_date_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTokenUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('endpoint', models.CharField(max_length=20)),
+                ('calls', models.IntegerField(default=0)),
+                ('cache_hits', models.IntegerField(default=0)),
+                ('input_tokens', models.BigIntegerField(default=0)),
+                ('output_tokens', models.BigIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_token_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'day', 'endpoint'), name='daily_token_usage_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TokenTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=20)),
+                ('model', models.CharField(blank=True, max_length=100)),
+                ('input_tokens', models.IntegerField(default=0)),
+                ('output_tokens', models.IntegerField(default=0)),
+                ('latency_ms', models.IntegerField(default=0)),
+                ('cache_hit', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='token_transactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at'], name='tokentx_user_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:00
+
+from datetime import timedelta
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_events(apps, schema_editor):
+    """Старі стріки -> події за кожен день стріку, щоб recompute_streaks їх не обнулив."""
+    CustomUser = apps.get_model("Auth", "CustomUser")
+    ActivityEvent = apps.get_model("Auth", "ActivityEvent")
+    users = CustomUser.objects.filter(last_submission_date__isnull=False).values_list(
+        "id", "streak_days", "last_submission_date"
+    )
+    events = [
+        ActivityEvent(user_id=user_id, day=last_day - timedelta(days=offset))
+        for user_id, streak_days, last_day in users.iterator()
+        for offset in range(max(streak_days, 1))
+    ]
+    ActivityEvent.objects.bulk_create(events, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Auth', '0008_dailytokenusage_tokentransaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(default='homework_check', max_length=20)),
+                ('day', models.DateField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-day'], name='activity_user_day_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_events, migrations.RunPython.noop),
+    ]
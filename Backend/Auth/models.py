@@ -1,7 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
-from datetime import timedelta
 
 class CustomUser(AbstractUser):
     username = models.CharField(max_length=25, unique=True)
@@ -16,28 +15,100 @@ class CustomUser(AbstractUser):
     class Meta:
         db_table = 'custom_user'
 
-    # Метод, який ти будеш викликати при успішній здачі ДЗ
     def update_streak(self):
-        today = timezone.now().date()
-        
-        # Якщо юзер вже щось здавав сьогодні — не чіпаємо, не накручуємо
-        if self.last_submission_date == today:
-            return
-
-        # Якщо остання здача була вчора — інкрементуємо (дофамін пішов!)
-        if self.last_submission_date == today - timedelta(days=1):
-            self.streak_days += 1
-        else:
-            # Юзер пропустив день або це перша здача — скидаємо на 1
-            self.streak_days = 1
-            
-        self.last_submission_date = today
-        self.save()
+        """Зараховує сьогоднішню активність — див. Auth/streaks.py."""
+        from .streaks import record_activity
+        record_activity(self)
+
+    @property
+    def current_streak(self):
+        # streak_days не обнуляється сам, коли юзер пропустив день — рахуємо при читанні
+        today = timezone.localdate()
+        if self.last_submission_date and (today - self.last_submission_date).days <= 1:
+            return self.streak_days
+        return 0
 
     @property
     def is_on_fire(self):
         # Вогник даємо, якщо стрік 2 дні або більше
-        return self.streak_days >= 2
+        return self.current_streak >= 2
+
+    class Meta:
+        db_table = 'custom_user'
+
+class ActivityEvent(models.Model):
+    """
+    Журнал активності (лише додаємо рядки). streak_days/last_submission_date
+    юзера — похідні від нього, тож їх завжди можна перерахувати (Auth/streaks.py).
+    """
+    KIND_HOMEWORK_CHECK = "homework_check"
+
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="activity_events"
+    )
+    kind = models.CharField(max_length=20, default=KIND_HOMEWORK_CHECK)
+    day = models.DateField()  # локальна дата — по ній рахується стрік
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-day"], name="activity_user_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.day}: {self.kind}"
+
+
+class TokenTransaction(models.Model):
+    """Один LLM-виклик. Пишуться пачками з буфера — див. Auth/token_ledger.py."""
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="token_transactions"
+    )
+    endpoint = models.CharField(max_length=20)  # course, lesson, homework, review
+    model = models.CharField(max_length=100, blank=True)
+    input_tokens = models.IntegerField(default=0)
+    output_tokens = models.IntegerField(default=0)
+    latency_ms = models.IntegerField(default=0)
+    cache_hit = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="tokentx_user_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.endpoint}: {self.input_tokens}+{self.output_tokens}"
+
+
+class DailyTokenUsage(models.Model):
+    """Підсумок TokenTransaction по юзеру/дню/ендпоінту — для квот і звітів по вартості."""
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="daily_token_usage"
+    )
+    day = models.DateField()
+    endpoint = models.CharField(max_length=20)
+    calls = models.IntegerField(default=0)
+    cache_hits = models.IntegerField(default=0)
+    input_tokens = models.BigIntegerField(default=0)
+    output_tokens = models.BigIntegerField(default=0)
 
     class Meta:
-        db_table = 'custom_user'
\ No newline at end of file
+        constraints = [
+            models.UniqueConstraint(fields=["user", "day", "endpoint"], name="daily_token_usage_unique"),
+        ]
+
+    @property
+    def total_tokens(self):
+        return self.input_tokens + self.output_tokens
+
+    def __str__(self):
+        return f"{self.user_id} {self.day} {self.endpoint}: {self.total_tokens}"
@@ -0,0 +1,98 @@
+"""
+Стрік — скільки днів поспіль юзер перевіряє ДЗ.
+
+Кожна успішна перевірка додає рядок в ActivityEvent, а стрік на юзері
+оновлюється одним атомарним UPDATE ... SET streak_days = CASE ...:
+без SELECT + save() всього рядка і без гонки двох одночасних перевірок.
+Друга й наступні перевірки за день у рядок юзера не пишуть взагалі.
+
+Обнулення за пропущені дні не пишеться — ProfileView показує
+CustomUser.current_streak. recompute_streaks() відновлює стріки з
+журналу (manage.py recompute_streaks).
+"""
+from datetime import timedelta
+
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .authentification import invalidate_user
+from .models import ActivityEvent, CustomUser
+
+RECOMPUTE_BATCH_SIZE = 500
+
+
+def advance_streaks(users, today):
+    """Вчора була активність — +1, інакше стрік з 1. Хто вже має сьогодні, не чіпаємо."""
+    return users.exclude(last_submission_date=today).update(
+        streak_days=Case(
+            When(last_submission_date=today - timedelta(days=1), then=F("streak_days") + 1),
+            default=Value(1),
+        ),
+        last_submission_date=today,
+    )
+
+
+def record_activity(user, kind=ActivityEvent.KIND_HOMEWORK_CHECK):
+    today = timezone.localdate()
+    ActivityEvent.objects.create(user_id=user.id, kind=kind, day=today)
+
+    # Дата лише росте: якщо навіть (можливо, кешований) юзер вже має сьогодні — в БД так само
+    if user.last_submission_date == today:
+        return
+    updated = advance_streaks(CustomUser.objects.filter(id=user.id), today)
+    if updated:
+        # QuerySet.update() не шле post_save — скидаємо кеш авторизації самі
+        invalidate_user(user.id)
+
+
+def record_activity_many(user_ids, kind=ActivityEvent.KIND_HOMEWORK_CHECK):
+    """record_activity() для пакета: подія на кожен id (з повторами), стрік — одним UPDATE."""
+    if not user_ids:
+        return
+    today = timezone.localdate()
+    ActivityEvent.objects.bulk_create([ActivityEvent(user_id=user_id, kind=kind, day=today) for user_id in user_ids])
+
+    changed = list(
+        CustomUser.objects.filter(id__in=set(user_ids)).exclude(last_submission_date=today).values_list("id", flat=True)
+    )
+    if changed and advance_streaks(CustomUser.objects.filter(id__in=changed), today):
+        for user_id in changed:
+            invalidate_user(user_id)
+
+
+def streak_from_days(days):
+    """days — різні дні активності від нових до старих. Повертає (streak_days, last_day)."""
+    if not days:
+        return 0, None
+    streak = 1
+    for newer, older in zip(days, days[1:]):
+        if (newer - older).days != 1:
+            break
+        streak += 1
+    return streak, days[0]
+
+
+def recompute_streaks(user_ids=None):
+    """
+    Перераховує streak_days/last_submission_date з журналу ActivityEvent.
+    Юзерів без жодної події не чіпаємо. Повертає кількість оновлених.
+    """
+    events = ActivityEvent.objects.all()
+    if user_ids is not None:
+        events = events.filter(user_id__in=user_ids)
+    rows = events.values_list("user_id", "day").distinct().order_by("user_id", "-day")
+
+    days_by_user = {}
+    for user_id, day in rows.iterator():
+        days_by_user.setdefault(user_id, []).append(day)
+
+    users = []
+    for user_id, days in days_by_user.items():
+        streak, last_day = streak_from_days(days)
+        users.append(CustomUser(id=user_id, streak_days=streak, last_submission_date=last_day))
+    CustomUser.objects.bulk_update(
+        users, ["streak_days", "last_submission_date"], batch_size=RECOMPUTE_BATCH_SIZE
+    )
+    for user in users:
+        invalidate_user(user.id)
+    return len(users)
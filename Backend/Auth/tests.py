@@ -1,3 +1,210 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import streaks, throttling, token_ledger
+from .authentification import get_cached_user, user_cache
+from .models import ActivityEvent, CustomUser, DailyTokenUsage, TokenTransaction
+
+
+@override_settings(TOKEN_LEDGER_FLUSH_INTERVAL=60, TOKEN_LEDGER_BATCH_SIZE=1000)
+class TokenLedgerTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="student", email="student@example.com", password="password123"
+        )
+        # Фоновий потік не запускаємо — пишемо явно через flush()
+        patch = mock.patch.object(token_ledger, "start_flusher")
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.addCleanup(token_ledger.flush)
+
+    def test_record_is_buffered_until_flush(self):
+        token_ledger.record(self.user.id, "lesson", "m", 100, 400, latency=0.8)
+        token_ledger.record(self.user.id, "review", "m", 50, 20, latency=0.3)
+
+        self.assertFalse(TokenTransaction.objects.exists())
+        with self.assertNumQueries(4):  # savepoint, bulk INSERT, upsert, release
+            self.assertEqual(token_ledger.flush(), 2)
+
+        lesson = TokenTransaction.objects.get(endpoint="lesson")
+        self.assertEqual((lesson.input_tokens, lesson.output_tokens, lesson.latency_ms), (100, 400, 800))
+
+    def test_daily_rollup_accumulates_across_flushes(self):
+        token_ledger.record(self.user.id, "lesson", "m", 100, 400)
+        token_ledger.flush()
+        token_ledger.record(self.user.id, "lesson", "m", 10, 40)
+        token_ledger.record(self.user.id, "lesson", "m", 0, 0, cache_hit=True)
+        token_ledger.record(None, "lesson", "m", 5, 5)  # без юзера — лише в журнал
+        token_ledger.flush()
+
+        usage = DailyTokenUsage.objects.get()
+        self.assertEqual(usage.day, timezone.localdate())
+        self.assertEqual((usage.calls, usage.cache_hits, usage.total_tokens), (3, 1, 550))
+        self.assertEqual(TokenTransaction.objects.count(), 4)
+
+
+    @override_settings(TOKEN_LEDGER_FLUSH_INTERVAL=0)
+    def test_sync_flush_error_is_logged_and_requeued(self):
+        with mock.patch.object(token_ledger, "upsert_daily_usage", side_effect=RuntimeError("db down")), \
+                self.assertLogs("Auth.token_ledger", "ERROR"):
+            token_ledger.record(self.user.id, "lesson", "m", 100, 400)
+        self.assertEqual(len(token_ledger.pending()), 1)
+        self.assertFalse(TokenTransaction.objects.exists())
+
+        token_ledger.record(self.user.id, "review", "m", 10, 20)
+        self.assertEqual(token_ledger.pending(), [])
+        self.assertEqual(TokenTransaction.objects.count(), 2)
+
+    @override_settings(TOKEN_LEDGER_MAX_BUFFER=2)
+    def test_buffer_cap_drops_oldest_records(self):
+        with self.assertLogs("Auth.token_ledger", "WARNING"):
+            for tokens in (1, 2, 3):
+                token_ledger.record(self.user.id, "lesson", "m", tokens, 0)
+        self.assertEqual([entry.input_tokens for entry in token_ledger.pending()], [2, 3])
+
+
+@override_settings(
+    RATE_LIMITS={"course": {"capacity": 2, "per_minute": 1}},
+    DAILY_TOKEN_QUOTA=1000,
+    LLM_BACKEND="stub",
+    LLM_BACKENDS={"stub": {"BACKEND": "Courses.llm_backends.StubBackend", "LATENCY": 0, "JITTER": 0}},
+    TOKEN_LEDGER_FLUSH_INTERVAL=0,
+)
+class GenerationLimitTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = CustomUser.objects.create_user(
+            username="student", email="student@example.com", password="password123"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_token_bucket_needs_no_queries(self):
+        with self.assertNumQueries(0):
+            self.assertIsNone(throttling.take_token(self.user.id, "course"))
+            self.assertIsNone(throttling.take_token(self.user.id, "course"))
+            wait = throttling.take_token(self.user.id, "course")
+        self.assertAlmostEqual(wait, 60, delta=1)
+
+    def test_bulk_take_is_all_or_nothing(self):
+        wait = throttling.take_token(self.user.id, "course", 3)
+        self.assertAlmostEqual(wait, 60, delta=1)
+        # Неуспішне списання нічого не забрало
+        self.assertIsNone(throttling.take_token(self.user.id, "course", 2))
+        self.assertIsNotNone(throttling.take_token(self.user.id, "course"))
+
+    def test_burst_over_capacity_gets_429(self):
+        for _ in range(2):
+            self.assertEqual(self.client.post("/courses/", {"prompt": "Go"}, format="json").status_code, 200)
+
+        response = self.client.post("/courses/", {"prompt": "Go"}, format="json")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "60")
+
+    def test_daily_quota_from_rollup(self):
+        DailyTokenUsage.objects.create(
+            user=self.user, day=timezone.localdate(), endpoint="course", calls=1, input_tokens=600, output_tokens=400
+        )
+        response = self.client.post("/courses/", {"prompt": "Go"}, format="json")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username="student", email="student@example.com", password="password123"
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_repeated_requests_skip_user_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/profile/").status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/profile/").status_code, 200)
+
+    @override_settings(AUTH_USER_CACHE_TTL=0)
+    def test_cache_can_be_disabled(self):
+        self.client.get("/profile/")
+        with self.assertNumQueries(1):
+            self.client.get("/profile/")
+
+    def test_profile_update_invalidates_cache(self):
+        self.client.get("/profile/")
+        response = self.client.patch("/profile/update", {"username": "renamed"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get("/profile/").data["username"], "renamed")
+
+    def test_streak_and_password_changes_invalidate_cache(self):
+        self.client.get("/profile/")
+        CustomUser.objects.get(id=self.user.id).update_streak()
+        self.assertEqual(self.client.get("/profile/").data["streak_days"], 1)
+
+        user = CustomUser.objects.get(id=self.user.id)
+        user.is_active = False
+        user.set_password("new-password-1")
+        user.save()
+        self.assertEqual(self.client.get("/profile/").status_code, 401)
+
+    def test_cached_user_is_copied_per_request(self):
+        get_cached_user(self.user.id).username = "mutated"
+        self.assertEqual(get_cached_user(self.user.id).username, "student")
+
+
+class StreakTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="student", email="student@example.com", password="password123"
+        )
+
+    def record_on(self, day):
+        with mock.patch.object(timezone, "localdate", return_value=day):
+            streaks.record_activity(CustomUser.objects.get(id=self.user.id))
+        self.user.refresh_from_db()
+        return self.user.streak_days
+
+    def test_consecutive_days_extend_streak(self):
+        monday = date(2026, 3, 2)
+        self.assertEqual(self.record_on(monday), 1)
+        self.assertEqual(self.record_on(monday), 1)
+        self.assertEqual(self.record_on(monday + timedelta(days=1)), 2)
+        self.assertEqual(self.record_on(monday + timedelta(days=4)), 1)
+        self.assertEqual(ActivityEvent.objects.filter(user=self.user).count(), 4)
+
+    def test_same_day_check_does_not_touch_user_row(self):
+        today = timezone.localdate()
+        self.record_on(today)
+        with self.assertNumQueries(1):
+            streaks.record_activity(self.user)
+
+    def test_broken_streak_reads_as_zero(self):
+        self.record_on(timezone.localdate() - timedelta(days=3))
+        self.assertEqual(self.user.streak_days, 1)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get("/profile/").data["streak_days"], 0)
+
+    def test_recompute_from_events(self):
+        today = timezone.localdate()
+        ActivityEvent.objects.bulk_create(
+            ActivityEvent(user=self.user, day=today - timedelta(days=offset)) for offset in (0, 0, 1, 2, 5)
+        )
+        self.assertEqual(streaks.recompute_streaks(), 1)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.streak_days, self.user.last_submission_date), (3, today))
+
+    def test_unauthenticated_check_records_nothing(self):
+        response = self.client.post("/teacher/homeworks/1/check/", {"submission": "print(1)"}, format="json")
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(ActivityEvent.objects.exists())
@@ -0,0 +1,96 @@
+"""
+Ліміти на генерації, щоб один акаунт не з'їв увесь бюджет OpenRouter.
+
+1. Token bucket на (юзер, ендпоінт): RATE_LIMITS[scope] = capacity
+   запитів підряд, далі — per_minute на хвилину. Стан — у кеші Django
+   (за замовчуванням LocMemCache процесу), без запитів у БД.
+2. Денна квота токенів DAILY_TOKEN_QUOTA з підсумків DailyTokenUsage.
+   Сума кешується на RATE_LIMIT_QUOTA_CACHE_TTL секунд, тож у БД
+   ходимо не частіше разу на хвилину на юзера.
+
+В'юхи викликають enforce_generation_limits() прямо перед LLM-викликом —
+вже згенерований урок віддається без лімітів. Перевищення —
+Throttled, тобто 429 з Retry-After.
+"""
+import threading
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Sum
+from django.utils import timezone
+from rest_framework.exceptions import Throttled
+
+from .models import DailyTokenUsage
+
+_bucket_lock = threading.Lock()
+
+
+def bucket_capacity(scope):
+    """Скільки запитів scope можна зробити підряд; None — без ліміту."""
+    limit = settings.RATE_LIMITS.get(scope)
+    return limit["capacity"] if limit else None
+
+
+def take_token(user_id, scope, count=1):
+    """
+    Забирає count токенів з відра — всі або жодного. Повертає None, якщо можна,
+    або скільки секунд чекати. count більше за capacity не пройде ніколи —
+    перевіряйте bucket_capacity() заздалегідь.
+    """
+    limit = settings.RATE_LIMITS.get(scope)
+    if not limit:
+        return None
+    capacity = limit["capacity"]
+    rate = limit["per_minute"] / 60  # токенів за секунду
+
+    key = f"ratelimit:{scope}:{user_id}"
+    with _bucket_lock:
+        now = time.time()
+        tokens, updated_at = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+        if tokens < count:
+            cache.set(key, (tokens, now), timeout=int(capacity / rate) + 60)
+            return (count - tokens) / rate
+        cache.set(key, (tokens - count, now), timeout=int(capacity / rate) + 60)
+    return None
+
+
+def quota_cache_key(user_id, day):
+    return f"token_quota:{user_id}:{day.isoformat()}"
+
+
+def tokens_used_today(user_id):
+    today = timezone.localdate()
+    key = quota_cache_key(user_id, today)
+    used = cache.get(key)
+    if used is None:
+        used = DailyTokenUsage.objects.filter(user_id=user_id, day=today).aggregate(
+            total=Sum(F("input_tokens") + F("output_tokens"))
+        )["total"] or 0
+        cache.set(key, used, timeout=settings.RATE_LIMIT_QUOTA_CACHE_TTL)
+    return used
+
+
+def seconds_until_tomorrow():
+    now = timezone.localtime()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), dt_time.min, tzinfo=now.tzinfo)
+    return (tomorrow - now).total_seconds()
+
+
+def enforce_generation_limits(user, scope, count=1):
+    """
+    Кидає Throttled (429 + Retry-After), якщо юзеру зараз не можна генерувати.
+    count — скільки генерацій списати разом (пакетна перевірка ДЗ).
+    """
+    quota = settings.DAILY_TOKEN_QUOTA
+    if quota and tokens_used_today(user.id) >= quota:
+        raise Throttled(
+            wait=seconds_until_tomorrow(),
+            detail="Daily token quota exceeded. Try again tomorrow."
+        )
+
+    wait = take_token(user.id, scope, count)
+    if wait is not None:
+        raise Throttled(wait=wait, detail="Too many generation requests. Slow down.")
@@ -0,0 +1,173 @@
+"""
+Облік токенів: рядок TokenTransaction на кожен LLM-виклик і денний
+підсумок DailyTokenUsage (юзер, день, ендпоінт) для квот і звітів.
+
+record() лише кладе запис у буфер процесу. У БД буфер пише фоновий
+потік — кожні TOKEN_LEDGER_FLUSH_INTERVAL секунд або одразу, щойно
+набралось TOKEN_LEDGER_BATCH_SIZE записів: один bulk INSERT журналу
+і один upsert підсумків на всю пачку. Запит на це не чекає.
+TOKEN_LEDGER_FLUSH_INTERVAL = 0 — писати одразу (тести, скрипти).
+
+Помилка БД не ламає запит (LLM вже оплачено): пачка лишається в буфері
+до наступного flush. Буфер обмежений TOKEN_LEDGER_MAX_BUFFER — понад
+це найстаріші записи викидаються з попередженням у лог.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import DailyTokenUsage, TokenTransaction
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_buffer = []
+_wakeup = threading.Event()
+_flusher = None
+
+
+def record(user_id, endpoint, model="", input_tokens=0, output_tokens=0, latency=0.0, cache_hit=False):
+    entry = TokenTransaction(
+        user_id=user_id,
+        endpoint=endpoint,
+        model=model or "",
+        input_tokens=input_tokens or 0,
+        output_tokens=output_tokens or 0,
+        latency_ms=int(latency * 1000),
+        cache_hit=cache_hit,
+        created_at=timezone.now(),
+    )
+    with _lock:
+        _buffer.append(entry)
+        dropped = trim_buffer()
+        size = len(_buffer)
+    if dropped:
+        logger.warning("Token ledger buffer is full, dropped %s oldest records", dropped)
+
+    if not settings.TOKEN_LEDGER_FLUSH_INTERVAL:
+        try:
+            flush()
+        except Exception:
+            # Як і фоновий потік: записи вже повернуто в буфер, запит не падає
+            logger.exception("Token ledger flush failed")
+        return
+
+    start_flusher()
+    if size >= settings.TOKEN_LEDGER_BATCH_SIZE:
+        _wakeup.set()
+
+
+def record_usage(user_id, endpoint, model, usage, latency=0.0, cache_hit=False):
+    """record() для usage з відповіді OpenAI SDK (може бути None)."""
+    record(
+        user_id, endpoint, model,
+        input_tokens=getattr(usage, "prompt_tokens", 0),
+        output_tokens=getattr(usage, "completion_tokens", 0),
+        latency=latency,
+        cache_hit=cache_hit,
+    )
+
+
+def trim_buffer():
+    """Під _lock: лишає останні TOKEN_LEDGER_MAX_BUFFER записів. Повертає, скільки викинуто."""
+    dropped = len(_buffer) - settings.TOKEN_LEDGER_MAX_BUFFER
+    if dropped <= 0:
+        return 0
+    del _buffer[:dropped]
+    return dropped
+
+
+def pending():
+    """Ще не записані в БД записи (копія)."""
+    with _lock:
+        return list(_buffer)
+
+
+def flush():
+    """Пише буфер у БД. Повертає кількість записів."""
+    with _lock:
+        batch = _buffer[:]
+        _buffer.clear()
+    if not batch:
+        return 0
+
+    try:
+        with transaction.atomic():
+            TokenTransaction.objects.bulk_create(batch)
+            upsert_daily_usage(batch)
+    except Exception:
+        # Повертаємо пачку в буфер, щоб не загубити облік через тимчасову помилку БД
+        with _lock:
+            _buffer[:0] = batch
+            dropped = trim_buffer()
+        if dropped:
+            logger.warning("Token ledger buffer is full, dropped %s oldest records", dropped)
+        raise
+    return len(batch)
+
+
+def upsert_daily_usage(batch):
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+    for entry in batch:
+        if entry.user_id is None:
+            continue
+        row = totals[(entry.user_id, timezone.localdate(entry.created_at), entry.endpoint)]
+        row[0] += 1
+        row[1] += int(entry.cache_hit)
+        row[2] += entry.input_tokens
+        row[3] += entry.output_tokens
+    if not totals:
+        return
+
+    # bulk_create(update_conflicts=True) вміє лише перезаписати значення,
+    # а нам треба додати — тож INSERT ... ON CONFLICT руками (SQLite і Postgres)
+    table = connection.ops.quote_name(DailyTokenUsage._meta.db_table)
+    counters = ("calls", "cache_hits", "input_tokens", "output_tokens")
+    sql = (
+        f"INSERT INTO {table} (user_id, day, endpoint, {', '.join(counters)}) "
+        f"VALUES (%s, %s, %s, %s, %s, %s, %s) "
+        f"ON CONFLICT (user_id, day, endpoint) DO UPDATE SET "
+        + ", ".join(f"{c} = {table}.{c} + excluded.{c}" for c in counters)
+    )
+    rows = [
+        (user_id, connection.ops.adapt_datefield_value(day), endpoint, *values)
+        for (user_id, day, endpoint), values in totals.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def start_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _lock:
+        if _flusher is not None and _flusher.is_alive():
+            return
+        _flusher = threading.Thread(target=run_flusher, name="token-ledger", daemon=True)
+        _flusher.start()
+
+
+def run_flusher():
+    while True:
+        _wakeup.wait(settings.TOKEN_LEDGER_FLUSH_INTERVAL)
+        _wakeup.clear()
+        try:
+            flush()
+        except Exception:
+            logger.exception("Token ledger flush failed")
+        finally:
+            connection.close()
+
+
+@atexit.register
+def flush_on_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception("Token ledger flush on exit failed")
@@ -36,7 +36,7 @@ class ProfileView(APIView):
         return Response({
             "username": user.username,
             "email": user.email,
-            "streak_days": user.streak_days,
+            "streak_days": user.current_streak,
             "last_submission_date": user.last_submission_date
         }, status=200)
     
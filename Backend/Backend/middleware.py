@@ -0,0 +1,135 @@
+"""
+Метрики кожного запиту: загальний час, SQL (кількість і час), LLM
+(виклики, час, токени), спани з в'юх і розмір відповіді.
+
+Віддаються заголовком Server-Timing (видно у DevTools -> Network -> Timing)
+і структурованим рядком у лог "Backend.middleware": DEBUG на кожен запит,
+WARNING — якщо запит довший за PERF_SLOW_REQUEST_MS.
+
+Для StreamingHttpResponse заголовок уходить раніше за тіло, тож у
+Server-Timing лише час до першого байта. Рядок у лог пишемо після
+останнього шматка (чи обриву стріму): там повний час, SQL і LLM
+самого стріму і розмір відповіді.
+"""
+import json
+import logging
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.utils.decorators import sync_and_async_middleware
+
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+
+def server_timing(trace, total):
+    parts = [
+        f"total;dur={total * 1000:.1f}",
+        f'db;dur={trace.db_time * 1000:.1f};desc="{trace.db_queries} queries"',
+    ]
+    if trace.llm_calls:
+        parts.append(
+            f'llm;dur={trace.llm_time * 1000:.1f};desc="{trace.llm_calls} calls, {trace.llm_tokens} tokens"'
+        )
+    parts.extend(f"{name};dur={seconds * 1000:.1f}" for name, seconds in trace.spans.items())
+    return ", ".join(parts)
+
+
+def finish(request, response, trace):
+    if settings.PERF_SERVER_TIMING:
+        response["Server-Timing"] = server_timing(trace, trace.elapsed())
+
+    if not response.streaming:
+        log_request(request, response, trace, len(response.content))
+    elif response.is_async:
+        response.streaming_content = traced_async_stream(request, response, trace, response.streaming_content)
+    else:
+        response.streaming_content = traced_stream(request, response, trace, response.streaming_content)
+    return response
+
+
+def traced_stream(request, response, trace, content):
+    """Віддає тіло стріму, рахуючи його в trace; лог — коли стрім скінчився чи обірвався."""
+    chunks = iter(content)
+    size = 0
+    try:
+        while True:
+            token = tracing.resume_trace(trace)
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                tracing.end_trace(token)
+            size += len(chunk)
+            yield chunk
+    finally:
+        log_request(request, response, trace, size)
+
+
+async def traced_async_stream(request, response, trace, content):
+    chunks = aiter(content)
+    size = 0
+    try:
+        while True:
+            token = tracing.resume_trace(trace)
+            try:
+                chunk = await anext(chunks)
+            except StopAsyncIteration:
+                return
+            finally:
+                tracing.end_trace(token)
+            size += len(chunk)
+            yield chunk
+    finally:
+        log_request(request, response, trace, size)
+
+
+def log_request(request, response, trace, size):
+    total = trace.elapsed()
+    record = {
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "total_ms": round(total * 1000, 1),
+        "db_queries": trace.db_queries,
+        "db_ms": round(trace.db_time * 1000, 1),
+        "llm_calls": trace.llm_calls,
+        "llm_ms": round(trace.llm_time * 1000, 1),
+        "llm_tokens": trace.llm_tokens,
+        "spans_ms": {name: round(seconds * 1000, 1) for name, seconds in trace.spans.items()},
+        "response_bytes": size,
+    }
+    level = logging.WARNING if total * 1000 >= settings.PERF_SLOW_REQUEST_MS else logging.DEBUG
+    if logger.isEnabledFor(level):
+        logger.log(level, json.dumps(record, ensure_ascii=False))
+
+
+@sync_and_async_middleware
+def performance_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            trace, token = tracing.start_trace()
+            try:
+                response = await get_response(request)
+            finally:
+                tracing.end_trace(token)
+            return finish(request, response, trace)
+
+        return middleware
+
+    def middleware(request):
+        # З'єднання, відкриті ще до старту (тести, runserver), сигналу connection_created не бачили
+        for connection in connections.all(initialized_only=True):
+            tracing.install_query_tracer(connection)
+
+        trace, token = tracing.start_trace()
+        try:
+            response = get_response(request)
+        finally:
+            tracing.end_trace(token)
+        return finish(request, response, trace)
+
+    return middleware
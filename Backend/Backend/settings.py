@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Першим, щоб міряти весь запит разом з іншими middleware
+    'Backend.middleware.performance_middleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     "corsheaders.middleware.CorsMiddleware",
@@ -84,12 +86,61 @@ WSGI_APPLICATION = 'Backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=postgres — прод (див. нижче), інакше SQLite для розробки.
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgres":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv("POSTGRES_DB", "edupixels"),
+            'USER': os.getenv("POSTGRES_USER", "edupixels"),
+            'PASSWORD': os.getenv("POSTGRES_PASSWORD", ""),
+            'HOST': os.getenv("POSTGRES_HOST", "127.0.0.1"),
+            'PORT': os.getenv("POSTGRES_PORT", "5432"),
+            # Перевіряти "протухлі" з'єднання перед запитом, а не падати на них
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.getenv("DB_POOL", "1") == "1":
+        # Пул psycopg (psycopg[pool]) на процес: з'єднання переживають запити
+        # і діляться між потоками. З пулом Django вимагає CONN_MAX_AGE = 0.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv("DB_POOL_MIN_SIZE", 2)),
+            'max_size': int(os.getenv("DB_POOL_MAX_SIZE", 20)),
+            'timeout': 10,  # секунд чекати на вільне з'єднання
+        }
+    else:
+        # Без пулу — хоча б постійне з'єднання на потік
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv("DB_CONN_MAX_AGE", 60))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Скільки чекати на чужий запис, замість миттєвого "database is locked"
+                'timeout': 20,
+                # BEGIN IMMEDIATE: atomic() бере блокування на запис одразу. Інакше
+                # транзакція "читаю, потім пишу" падає без очікування, якщо її випередили
+                'transaction_mode': 'IMMEDIATE',
+                # WAL: читачі не блокують письменника і навпаки;
+                # synchronous=NORMAL у WAL безпечно і без fsync на кожен коміт
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA busy_timeout=20000;'
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA temp_store=MEMORY'
+                ),
+            },
+            # Тести з потоками (single-flight, прогрів курсу): in-memory SQLite
+            # не чекає на блокування таблиць, а одразу падає — беремо файл
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        }
     }
-}
 
 
 # Password validation
@@ -135,13 +186,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'Auth.authentification.CustomJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     )
 }
 
+# Кеш юзерів для CustomJWTAuthentication (на процес). TTL=0 — вимкнено
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", 10000))
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", 60))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1), 
     'AUTH_HEADER_TYPES': ('Bearer',),
@@ -178,3 +233,151 @@ CORS_ALLOWED_ORIGIN_REGEXES = [
 CORS_ALLOW_CREDENTIALS = True
 
 AUTH_USER_MODEL = 'Auth.CustomUser'
+
+# Фонові генерації (Courses/jobs.py, manage.py run_generation_workers)
+GENERATION_WORKER_THREADS = int(os.getenv("GENERATION_WORKER_THREADS", 4))
+GENERATION_JOB_POLL_INTERVAL = 1.0  # секунд, коли черга порожня
+GENERATION_JOB_TIMEOUT = 600  # секунд без heartbeat — вважаємо, що воркер помер
+GENERATION_JOB_MAX_ATTEMPTS = 3
+
+# "Прогрів" курсу: паралельна генерація всіх уроків і ДЗ одразу після створення
+COURSE_WARMUP_DEFAULT = os.getenv("COURSE_WARMUP_DEFAULT", "0") == "1"
+COURSE_WARMUP_CONCURRENCY = int(os.getenv("COURSE_WARMUP_CONCURRENCY", 4))  # LLM-викликів одночасно на курс
+
+# Спільний кеш відповідей LLM (Courses/llm_cache.py).
+# Ендпоінти: course, lesson, homework, homework_tests, review. review тут вимкнено — у нього свій кеш
+# по нормалізованому коду (нижче).
+LLM_CACHE_ENDPOINTS = [e for e in os.getenv("LLM_CACHE_ENDPOINTS", "course,lesson,homework,homework_tests").split(",") if e]
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 60 * 60 * 24 * 30))  # секунд
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+LLM_CACHE_EVICT_INTERVAL = int(os.getenv("LLM_CACHE_EVICT_INTERVAL", 60))  # секунд між прибираннями; 0 — на кожен store
+
+# Кеш code review по (задача, нормалізований код) — див. Teacher/review_cache.py
+REVIEW_CACHE_ENABLED = os.getenv("REVIEW_CACHE_ENABLED", "1") == "1"
+
+# Пакетна перевірка ДЗ (POST /teacher/homeworks/check_batch/)
+REVIEW_BATCH_CONCURRENCY = int(os.getenv("REVIEW_BATCH_CONCURRENCY", 8))  # рев'ю одночасно на запит
+REVIEW_BATCH_MAX_ITEMS = 500
+
+# Локальна перевірка здачі перед AI-рев'ю (Teacher/precheck.py)
+PRECHECK_ENABLED = os.getenv("PRECHECK_ENABLED", "1") == "1"
+# Пробний запуск коду в пісочниці — за замовчуванням вимкнено; без ізоляції (не root) не запускається й увімкнений
+PRECHECK_SANDBOX_RUN = os.getenv("PRECHECK_SANDBOX_RUN", "0") == "1"
+
+# Автотести до Python-ДЗ: генеруються разом з ДЗ, ганяються в пісочниці до AI-рев'ю
+HOMEWORK_TESTS_ENABLED = os.getenv("HOMEWORK_TESTS_ENABLED", "1") == "1"
+HOMEWORK_TESTS_MAX_CASES = 10
+# Усі тести пройдено — оцінка не нижче за цю; інакше — частка пройдених від 49
+TESTS_PASSED_MIN_GRADE = 70
+
+# Пісочниця для студентського коду (Teacher/sandbox.py)
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", os.cpu_count() or 2))  # процесів одночасно
+SANDBOX_TIMEOUT = float(os.getenv("SANDBOX_TIMEOUT", 3))  # wall-clock, с
+SANDBOX_CPU_SECONDS = int(os.getenv("SANDBOX_CPU_SECONDS", 2))
+SANDBOX_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", 256))
+SANDBOX_MAX_OUTPUT = int(os.getenv("SANDBOX_MAX_OUTPUT", 64 * 1024))  # байт на stdout/stderr
+# Ізоляція — непривілейовані user namespace (Teacher/jail.py), root не потрібен
+SANDBOX_MAX_PROCESSES = int(os.getenv("SANDBOX_MAX_PROCESSES", 8))  # RLIMIT_NPROC на здачу, з потоками
+
+# GET /courses/ — розмір сторінки
+COURSE_LIST_PAGE_SIZE = 20
+COURSE_LIST_MAX_PAGE_SIZE = 100
+
+# Cache-Control: max-age для вже згенерованих уроків (ETag/304 — див. Courses/views.py)
+LESSON_CACHE_MAX_AGE = int(os.getenv("LESSON_CACHE_MAX_AGE", 3600))
+
+# Single-flight генерацій (Courses/singleflight.py)
+# SINGLE_FLIGHT_LEASE_TTL — нижче, після LLM_TIMEOUTS: він від них залежить
+SINGLE_FLIGHT_WAIT_TIMEOUT = 180  # скільки максимум чекати чужу генерацію; далі — 503 + Retry-After
+SINGLE_FLIGHT_POLL_INTERVAL = 0.25
+
+# LLM-шлюз (Courses/llm.py) і його бекенди (Courses/llm_backends.py).
+# LLM_BACKEND=stub — локальна заглушка без мережі й токенів, для навантажувальних тестів.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openrouter")
+LLM_BACKENDS = {
+    "openrouter": {
+        "BACKEND": "Courses.llm_backends.OpenRouterBackend",
+        "MODEL": os.getenv("LLM_MODEL", "openai/gpt-4o-mini"),
+        "BASE_URL": os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
+        "API_KEY": os.getenv("OPENROUTER_API_KEY"),
+        # Один пул з'єднань на процес
+        "MAX_CONNECTIONS": int(os.getenv("LLM_MAX_CONNECTIONS", 50)),
+        "MAX_KEEPALIVE_CONNECTIONS": int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 20)),
+        "KEEPALIVE_EXPIRY": 60,  # секунд
+    },
+    "stub": {
+        "BACKEND": "Courses.llm_backends.StubBackend",
+        "MODEL": "stub",
+        "LATENCY": float(os.getenv("LLM_STUB_LATENCY", 0.5)),  # секунд на відповідь
+        "JITTER": float(os.getenv("LLM_STUB_JITTER", 0.1)),
+        "STREAM_CHUNKS": 20,
+    },
+}
+LLM_CONNECT_TIMEOUT = 5  # секунд
+# Загальний таймаут одного виклику, секунд. Курс і урок генеруються довше за рев'ю.
+LLM_TIMEOUTS = {
+    "course": 120,
+    "lesson": 120,
+    "homework": 60,
+    "review": 60,
+    "homework_tests": 60,
+    "default": 60,
+}
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))  # повтори на таймаут/5xx/429
+LLM_RETRY_BACKOFF = 0.5  # секунд, база для експоненційного backoff з jitter
+LLM_RETRY_MAX_BACKOFF = 8
+LLM_CIRCUIT_FAILURE_THRESHOLD = 5  # помилок поспіль, після яких перестаємо ходити в апстрім
+LLM_CIRCUIT_RESET_TIMEOUT = 30  # секунд до пробного запиту
+
+
+def _worst_llm_call(endpoint):
+    """Найдовший шлях одного виклику шлюзу: усі спроби до таймауту + паузи між ними."""
+    attempts = LLM_MAX_RETRIES + 1
+    return (LLM_TIMEOUTS[endpoint] + LLM_CONNECT_TIMEOUT) * attempts + LLM_RETRY_MAX_BACKOFF * LLM_MAX_RETRIES
+
+
+# Оренда single-flight має пережити найгірший випадок живого лідера (для ДЗ — ще й
+# генерація автотестів), інакше її забере другий запит і піде в LLM вдруге.
+# Після TTL оренду мертвого лідера можна забрати.
+SINGLE_FLIGHT_LEASE_TTL = max(
+    _worst_llm_call("lesson"),
+    _worst_llm_call("homework") + _worst_llm_call("homework_tests"),
+) + 60
+
+# Метрики запитів (Backend/middleware.py): заголовок Server-Timing і рядок у лог
+PERF_SERVER_TIMING = os.getenv("PERF_SERVER_TIMING", "1") == "1"
+PERF_SLOW_REQUEST_MS = int(os.getenv("PERF_SLOW_REQUEST_MS", 1000))  # довші — WARNING у лог
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        # PERF_LOG_LEVEL=DEBUG — рядок на кожен запит, INFO — лише повільні
+        "Backend.middleware": {
+            "handlers": ["console"],
+            "level": os.getenv("PERF_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
+# Журнал токенів (Auth/token_ledger.py): буфер у пам'яті, запис у БД пачками
+TOKEN_LEDGER_FLUSH_INTERVAL = float(os.getenv("TOKEN_LEDGER_FLUSH_INTERVAL", 5))  # секунд; 0 — писати одразу
+TOKEN_LEDGER_BATCH_SIZE = 200  # записів у буфері, після яких пишемо, не чекаючи інтервалу
+TOKEN_LEDGER_MAX_BUFFER = 10000  # скільки тримати в пам'яті, якщо БД тимчасово недоступна
+
+# Ліміти генерацій (Auth/throttling.py). Token bucket на юзера і ендпоінт:
+# capacity запитів підряд, далі per_minute на хвилину.
+RATE_LIMITS = {
+    "course": {"capacity": 3, "per_minute": 1},
+    "lesson": {"capacity": 20, "per_minute": 10},
+    "homework": {"capacity": 5, "per_minute": 2},
+    "review": {"capacity": 10, "per_minute": 5},
+}
+if os.getenv("RATE_LIMITS_DISABLED") == "1":  # навантажувальні тести (benchmarks/)
+    RATE_LIMITS = {}
+DAILY_TOKEN_QUOTA = int(os.getenv("DAILY_TOKEN_QUOTA", 500_000))  # на юзера; 0 — без квоти
+RATE_LIMIT_QUOTA_CACHE_TTL = 60  # секунд, скільки тримати суму токенів за день у кеші
@@ -0,0 +1,98 @@
+"""
+Легкий трейсинг запиту: скільки часу пішло на SQL, на LLM і на решту.
+
+Трейс живе в contextvar, тож його бачать і sync-, і async-в'юхи
+(sync_to_async копіює контекст). Заповнюють його:
+- обгортка над усіма SQL-запитами (trace_queries);
+- LLM-шлюз Courses/llm.py (record_llm_call);
+- в'юхи через span("serialize") тощо.
+Збирає і віддає назовні — Backend/middleware.py.
+"""
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_current = ContextVar("request_trace", default=None)
+
+
+class RequestTrace:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.llm_calls = 0
+        self.llm_time = 0.0
+        self.llm_tokens = 0
+        self.spans = defaultdict(float)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def start_trace():
+    """Повертає (trace, token); token потрібен для end_trace()."""
+    trace = RequestTrace()
+    return trace, _current.set(trace)
+
+
+def resume_trace(trace):
+    """Знову робить trace поточним (стрім віддається вже після middleware)."""
+    return _current.set(trace)
+
+
+def end_trace(token):
+    _current.reset(token)
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """with tracing.span("serialize"): ... — час блоку піде в Server-Timing."""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.spans[name] += time.perf_counter() - started
+
+
+def record_llm_call(seconds, usage=None):
+    trace = current_trace()
+    if trace is None:
+        return
+    trace.llm_calls += 1
+    trace.llm_time += seconds
+    trace.llm_tokens += getattr(usage, "total_tokens", 0) or 0
+
+
+def trace_queries(execute, sql, params, many, context):
+    trace = current_trace()
+    if trace is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        trace.db_queries += 1
+        trace.db_time += time.perf_counter() - started
+
+
+def install_query_tracer(connection):
+    if trace_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(trace_queries)
+
+
+@receiver(connection_created)
+def on_connection_created(sender, connection, **kwargs):
+    install_query_tracer(connection)
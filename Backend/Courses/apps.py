@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoursesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Courses'
+
+    def ready(self):
+        # Перенумерація модулів і уроків після видалень
+        from . import signals  # noqa: F401
@@ -0,0 +1,214 @@
+import json
+import logging
+import math
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import Throttled
+
+from Auth.auth_utils import aget_jwt_user
+from Auth.throttling import enforce_generation_limits
+from .llm import achat_completion
+from .models import *
+from .singleflight import SingleFlightTimeout, arun_single_flight
+from .views import (
+    course_request,
+    fetch_generated_homework,
+    fetch_generated_lesson,
+    generation_in_progress_response,
+    homework_flight_key,
+    homework_request,
+    homework_tests_request,
+    lesson_flight_key,
+    lesson_request,
+    parse_test_cases,
+    save_generated_course,
+    save_homework,
+    should_generate_tests,
+    warm_up_if_requested,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def json_response(data, status=200):
+    return JsonResponse(
+        data,
+        status=status,
+        safe=False,
+        json_dumps_params={"ensure_ascii": False},
+    )
+
+
+async def agenerate_homework_tests(module, homework_obj):
+    """Async-версія generate_homework_tests."""
+    try:
+        response = await achat_completion("homework_tests", **homework_tests_request(module, homework_obj))
+        return parse_test_cases(response.choices[0].message.content)
+    except Exception:
+        logger.exception("Test generation failed for module %s", module.id)
+        return []
+
+
+class AsyncAPIView(View):
+    """
+    Базова async-в'юха для ASGI: JWT-авторизація без DRF,
+    бо DRF APIView не вміє async-хендлери.
+    Поки чекаємо на LLM, воркер обслуговує інші запити.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Як і в DRF: авторизація по Bearer-токену, CSRF не потрібен
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await aget_jwt_user(request)
+        if request.user is None:
+            return json_response({"error": "Unauthorized"}, status=401)
+
+        if request.body:
+            try:
+                request.data = json.loads(request.body)
+            except json.JSONDecodeError:
+                return json_response({"error": "Invalid JSON"}, status=400)
+        else:
+            request.data = {}
+
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except Throttled as e:
+            # Як DRF: 429 + Retry-After
+            response = json_response({"detail": str(e.detail)}, status=429)
+            if e.wait is not None:
+                response["Retry-After"] = str(math.ceil(e.wait))
+            return response
+
+
+class AsyncChatAPIView(AsyncAPIView):
+    """
+    POST /courses/async/
+    Async-версія ChatAPIView.post.
+    """
+
+    async def post(self, request):
+        user_input = request.data.get("prompt")
+        if not user_input:
+            return json_response({"error": "Prompt is required"}, status=400)
+
+        await sync_to_async(enforce_generation_limits)(request.user, "course")
+
+        chat_entry = await ChatPrompt.objects.acreate(user=request.user, user_input=user_input)
+
+        try:
+            response = await achat_completion("course", **course_request(request.user, user_input))
+            parsed, course = await sync_to_async(save_generated_course)(request.user, chat_entry, response)
+            await sync_to_async(warm_up_if_requested)(request.user, request.data, parsed, course)
+            return json_response(parsed)
+
+        except Exception as e:
+            logger.exception("Course generation failed for user %s", request.user.id)
+            return json_response({"error": str(e)}, status=500)
+
+
+class AsyncGenerateLessonAPIView(AsyncAPIView):
+    """
+    GET /courses/async/lessons/<lesson_id>/
+    Async-версія GenerateLessonAPIView.
+    """
+
+    async def get(self, request, lesson_id: int):
+        target_lesson = await (
+            LessonModel.objects
+            .filter(id=lesson_id, owner=request.user)
+            .select_related("module__course")
+            .afirst()
+        )
+
+        if not target_lesson:
+            return json_response({"error": "Lesson not found"}, status=404)
+
+        order_id = target_lesson.position
+
+        def build_response(text_content):
+            return json_response({
+                "id": target_lesson.id,
+                "order_id": order_id,
+                "content": text_content
+            })
+
+        if target_lesson.content and len(target_lesson.content) > 10:
+            return build_response(target_lesson.content)
+
+        await sync_to_async(enforce_generation_limits)(request.user, "lesson")
+
+        async def produce():
+            response = await achat_completion("lesson", **lesson_request(target_lesson))
+
+            target_lesson.content = response.choices[0].message.content
+            await target_lesson.asave(update_fields=["content", "updated_at"])
+            return target_lesson.content
+
+        try:
+            md_output = await arun_single_flight(
+                lesson_flight_key(target_lesson.id), produce,
+                lambda: fetch_generated_lesson(target_lesson)
+            )
+            return build_response(md_output)
+
+        except SingleFlightTimeout as e:
+            return generation_in_progress_response(e, json_response)
+        except Exception as e:
+            return json_response({"error": str(e)}, status=500)
+
+
+class AsyncGenerateHomeworkAPIView(AsyncAPIView):
+    """
+    GET /courses/async/modules/<module_id>/generate_homework/
+    Async-версія GenerateHomeworkAPIView.
+    """
+
+    async def get(self, request, module_id: int):
+        module = await (
+            ModuleModel.objects
+            .filter(id=module_id, course__owner=request.user)
+            .select_related("course")
+            .prefetch_related("lessons")
+            .afirst()
+        )
+
+        if not module:
+            return json_response({"error": "Module not found"}, status=404)
+
+        homework_obj = await HomeworkModel.objects.filter(module=module).afirst()
+
+        if homework_obj and len(homework_obj.content) > 10:
+            return json_response(homework_obj.content)
+
+        if not homework_obj:
+            homework_obj = HomeworkModel(module=module, owner=request.user, title=f"ДЗ: {module.title}")
+
+        await sync_to_async(enforce_generation_limits)(request.user, "homework")
+
+        async def produce():
+            response = await achat_completion("homework", **homework_request(module, homework_obj))
+
+            homework_obj.content = response.choices[0].message.content
+            if should_generate_tests(module, homework_obj):
+                homework_obj.test_cases = await agenerate_homework_tests(module, homework_obj)
+            await sync_to_async(save_homework)(module, homework_obj)
+            return homework_obj.content
+
+        try:
+            md_output = await arun_single_flight(
+                homework_flight_key(module.id), produce,
+                lambda: fetch_generated_homework(module, homework_obj)
+            )
+            return json_response(md_output)
+
+        except SingleFlightTimeout as e:
+            return generation_in_progress_response(e, json_response)
+        except Exception as e:
+            return json_response({"error": str(e)}, status=500)
@@ -0,0 +1,310 @@
+"""
+Черга фонових генерацій на базі таблиці GenerationJob.
+
+POST /courses/jobs/ лише ставить завдання в чергу, а LLM-виклик робить
+пул воркерів (manage.py run_generation_workers). Якщо клієнт відвалився
+по таймауту — результат все одно запишеться в курс/урок/ДЗ.
+"""
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from .models import *
+
+logger = logging.getLogger(__name__)
+
+
+def make_dedupe_key(user, kind, payload):
+    raw = json.dumps([kind, user.id, payload], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def enqueue_job(user, kind, payload):
+    """
+    Ставить завдання в чергу. Повертає (job, created).
+    created=False — таке саме завдання вже чекає або виконується,
+    повертаємо його замість дубля.
+    """
+    dedupe_key = make_dedupe_key(user, kind, payload)
+
+    existing = GenerationJob.objects.filter(
+        dedupe_key=dedupe_key, status__in=GenerationJob.ACTIVE_STATUSES
+    ).first()
+    if existing:
+        return existing, False
+
+    try:
+        with transaction.atomic():
+            job = GenerationJob.objects.create(
+                owner=user, kind=kind, payload=payload, dedupe_key=dedupe_key
+            )
+        return job, True
+    except IntegrityError:
+        # Хтось поставив те саме завдання між SELECT і INSERT
+        return enqueue_job(user, kind, payload)
+
+
+def claim_next_job(worker):
+    """
+    Забирає найстаріше queued-завдання. Захоплення — умовний UPDATE
+    (status=queued -> running), тож два воркери не візьмуть один запис
+    ні на SQLite, ні на Postgres.
+    """
+    candidates = (
+        GenerationJob.objects
+        .filter(status=GenerationJob.STATUS_QUEUED)
+        .order_by("created_at")
+        .values_list("id", flat=True)[:10]
+    )
+    for job_id in list(candidates):
+        claimed = GenerationJob.objects.filter(
+            id=job_id, status=GenerationJob.STATUS_QUEUED
+        ).update(
+            status=GenerationJob.STATUS_RUNNING,
+            worker=worker,
+            started_at=timezone.now(),
+            heartbeat_at=timezone.now(),
+            attempts=F("attempts") + 1,
+            progress=10,
+        )
+        if claimed:
+            return GenerationJob.objects.select_related("owner").get(id=job_id)
+    return None
+
+
+def heartbeat(job_id, **fields):
+    """Воркер ще працює над завданням (і, за бажанням, оновлює progress тощо)."""
+    GenerationJob.objects.filter(id=job_id, status=GenerationJob.STATUS_RUNNING).update(
+        heartbeat_at=timezone.now(), **fields
+    )
+
+
+def requeue_stale_jobs():
+    """
+    Повертає в чергу running-завдання, чий воркер, схоже, помер: heartbeat
+    не оновлювався GENERATION_JOB_TIMEOUT секунд. Довге, але живе завдання
+    (warm_course) б'є heartbeat з прогресом і не запускається вдруге.
+    Після GENERATION_JOB_MAX_ATTEMPTS спроб — failed.
+    """
+    deadline = timezone.now() - timedelta(seconds=settings.GENERATION_JOB_TIMEOUT)
+    stale = GenerationJob.objects.filter(status=GenerationJob.STATUS_RUNNING).filter(
+        Q(heartbeat_at__lt=deadline) | Q(heartbeat_at__isnull=True, started_at__lt=deadline)
+    )
+    failed = stale.filter(attempts__gte=settings.GENERATION_JOB_MAX_ATTEMPTS).update(
+        status=GenerationJob.STATUS_FAILED,
+        error="Job timed out",
+        finished_at=timezone.now(),
+    )
+    requeued = stale.update(status=GenerationJob.STATUS_QUEUED, worker="", progress=0)
+    return requeued, failed
+
+
+def run_course_job(job):
+    from .views import generate_course
+
+    _, course = generate_course(job.owner, job.payload["prompt"])
+    result = {"course_id": course.id, "topic": course.topic}
+
+    if job.payload.get("warm"):
+        warm_job, _ = enqueue_job(job.owner, GenerationJob.KIND_WARM_COURSE, {"course_id": course.id})
+        result["warmup_job_id"] = warm_job.id
+    return result
+
+
+def run_lesson_job(job):
+    from .views import generate_lesson_content, get_owned_lesson
+
+    lesson = get_owned_lesson(job.owner, job.payload["lesson_id"])
+    if not lesson:
+        raise ValueError("Lesson not found")
+
+    # Повторний запуск (ретрай, дубль після завершення) не платить за токени вдруге
+    if not (lesson.content and len(lesson.content) > 10):
+        generate_lesson_content(lesson)
+
+    return {"lesson_id": lesson.id, "order_id": lesson.position}
+
+
+def run_homework_job(job):
+    from .views import generate_homework_content
+
+    module = (
+        ModuleModel.objects
+        .filter(id=job.payload["module_id"], course__owner=job.owner)
+        .select_related("course")
+        .prefetch_related("lessons")
+        .first()
+    )
+    if not module:
+        raise ValueError("Module not found")
+
+    homework_obj = HomeworkModel.objects.filter(module=module).first()
+    if not homework_obj:
+        homework_obj = HomeworkModel(module=module, owner_id=module.course.owner_id, title=f"ДЗ: {module.title}")
+
+    if len(homework_obj.content) <= 10:
+        generate_homework_content(module, homework_obj)
+
+    return {"module_id": module.id, "homework_id": homework_obj.id}
+
+
+def warm_course(course_id, concurrency=None, on_progress=None):
+    """
+    Паралельно генерує всі ще порожні уроки та ДЗ курсу, щоб студент
+    потрапляв у кеш (content вже є) замість чекати LLM на кожному уроці.
+    Кожен результат зберігається одразу, як готовий, не чекаючи решти.
+
+    concurrency — скільки LLM-викликів одночасно (COURSE_WARMUP_CONCURRENCY).
+    on_progress(done, total) викликається після кожного завершеного виклику.
+    """
+    from .views import generate_homework_content, generate_lesson_content
+
+    concurrency = concurrency or settings.COURSE_WARMUP_CONCURRENCY
+
+    # Та сама умова, що й у GenerateLessonAPIView: len(content) > 10 — вже згенеровано
+    cold_lessons = (
+        LessonModel.objects
+        .filter(course_id=course_id)
+        .annotate(content_len=Length("content"))
+        .filter(content_len__lte=10)
+        .select_related("module__course")
+    )
+    modules = (
+        ModuleModel.objects
+        .filter(course_id=course_id)
+        .select_related("course")
+        .prefetch_related("lessons", "homeworks")
+    )
+
+    tasks = [(generate_lesson_content, (lesson,)) for lesson in cold_lessons]
+    for module in modules:
+        homework_obj = next(iter(module.homeworks.all()), None)
+        if not homework_obj:
+            homework_obj = HomeworkModel(module=module, owner_id=module.course.owner_id, title=f"ДЗ: {module.title}")
+        if len(homework_obj.content) <= 10:
+            tasks.append((generate_homework_content, (module, homework_obj)))
+
+    def run(task):
+        func, args = task
+        try:
+            func(*args)
+            return True
+        except Exception:
+            logger.exception("Warm-up of course %s: %s failed", course_id, func.__name__)
+            return False
+        finally:
+            connection.close()
+
+    generated = failed = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run, task) for task in tasks]
+        for future in as_completed(futures):
+            if future.result():
+                generated += 1
+            else:
+                failed += 1
+            if on_progress:
+                on_progress(generated + failed, len(tasks))
+
+    return {"course_id": course_id, "generated": generated, "failed": failed}
+
+
+def run_warm_course_job(job):
+    course_id = job.payload["course_id"]
+    if not CourseModel.objects.filter(id=course_id, owner=job.owner).exists():
+        raise ValueError("Course not found")
+
+    def on_progress(done, total):
+        # Разом з прогресом — heartbeat, інакше довгий прогрів забере інший воркер
+        heartbeat(job.id, progress=10 + 89 * done // total)
+
+    return warm_course(course_id, on_progress=on_progress)
+
+
+JOB_HANDLERS = {
+    GenerationJob.KIND_COURSE: run_course_job,
+    GenerationJob.KIND_LESSON: run_lesson_job,
+    GenerationJob.KIND_HOMEWORK: run_homework_job,
+    GenerationJob.KIND_WARM_COURSE: run_warm_course_job,
+}
+
+
+def run_job(job):
+    try:
+        result = JOB_HANDLERS[job.kind](job)
+    except Exception as e:
+        logger.exception("Generation job %s failed", job.id)
+        GenerationJob.objects.filter(id=job.id).update(
+            status=GenerationJob.STATUS_FAILED,
+            error=str(e),
+            finished_at=timezone.now(),
+        )
+        return
+
+    GenerationJob.objects.filter(id=job.id).update(
+        status=GenerationJob.STATUS_DONE,
+        result=result,
+        progress=100,
+        finished_at=timezone.now(),
+    )
+
+
+class GenerationWorkerPool:
+    """
+    Пул потоків, що розбирає чергу. LLM-виклики — це очікування мережі,
+    тож потоків вистачає (GIL тут не заважає).
+    """
+
+    def __init__(self, threads=None, poll_interval=None):
+        self.threads = threads or settings.GENERATION_WORKER_THREADS
+        self.poll_interval = poll_interval or settings.GENERATION_JOB_POLL_INTERVAL
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.threads):
+            thread = threading.Thread(
+                target=self._work, args=(f"{self.name}/{i}",), daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def run_forever(self):
+        """Блокує поточний потік: стартує воркерів і час від часу прибирає завислі завдання."""
+        self.start()
+        try:
+            while not self._stop.wait(settings.GENERATION_JOB_TIMEOUT / 4):
+                close_old_connections()
+                requeue_stale_jobs()
+        finally:
+            self.stop()
+
+    def _work(self, worker):
+        try:
+            while not self._stop.is_set():
+                close_old_connections()
+                job = claim_next_job(worker)
+                if job is None:
+                    self._stop.wait(self.poll_interval)
+                    continue
+                run_job(job)
+        finally:
+            connection.close()
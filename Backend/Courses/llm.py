@@ -0,0 +1,316 @@
+"""
+Єдиний шлюз до LLM для всіх в'юх — і Courses, і Teacher.
+Куди саме йдуть запити (OpenRouter чи локальна заглушка), вирішує
+бекенд з settings.LLM_BACKEND — див. Courses/llm_backends.py.
+
+- один пул HTTP-з'єднань на процес з keep-alive;
+- таймаут на кожен ендпоінт (LLM_TIMEOUTS), щоб завислий апстрім не тримав воркер;
+- повтори на таймаутах/5xx/429 з експоненційним backoff і jitter;
+- circuit breaker: після LLM_CIRCUIT_FAILURE_THRESHOLD помилок поспіль
+  запити LLM_CIRCUIT_RESET_TIMEOUT секунд одразу падають з LLMUnavailable;
+- кеш відповідей (llm_cache) і метрики latency/помилок (metrics_snapshot()).
+
+В'юхи викликають chat_completion("lesson", messages=...) замість
+client.chat.completions.create(...); model за замовчуванням — з бекенда.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+import httpx
+import openai
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from openai.types import CompletionUsage
+
+from Auth import token_ledger
+from Backend import tracing
+from . import llm_cache
+
+# Апстрім перевантажений або недоступний — є сенс повторити
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,  # включно з APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+# Для оцінки usage обірваного стріму (estimate_usage)
+CHARS_PER_TOKEN = 4
+
+
+class LLMUnavailable(Exception):
+    """Circuit breaker відкритий — запит в OpenRouter навіть не надсилаємо."""
+
+
+class CircuitBreaker:
+    """closed -> (N помилок поспіль) -> open -> (reset_timeout) -> half_open -> один пробний запит."""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class Metrics:
+    """Лічильники і latency по ендпоінтах з моменту старту процесу."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self.calls = Counter()
+        self.errors = Counter()
+        self.retries = Counter()
+        self.rejected = Counter()
+        self.latencies = defaultdict(lambda: deque(maxlen=window))
+
+    def observe(self, endpoint, seconds, ok):
+        with self._lock:
+            self.calls[endpoint] += 1
+            if not ok:
+                self.errors[endpoint] += 1
+            self.latencies[endpoint].append(seconds)
+
+    def retry(self, endpoint):
+        with self._lock:
+            self.retries[endpoint] += 1
+
+    def reject(self, endpoint):
+        with self._lock:
+            self.rejected[endpoint] += 1
+
+    def snapshot(self):
+        with self._lock:
+            data = {}
+            for endpoint in sorted(set(self.calls) | set(self.rejected)):
+                samples = sorted(self.latencies[endpoint])
+                data[endpoint] = {
+                    "calls": self.calls[endpoint],
+                    "errors": self.errors[endpoint],
+                    "retries": self.retries[endpoint],
+                    "rejected": self.rejected[endpoint],
+                    "p50_ms": percentile_ms(samples, 50),
+                    "p95_ms": percentile_ms(samples, 95),
+                    "p99_ms": percentile_ms(samples, 99),
+                }
+            return data
+
+
+def percentile_ms(samples, p):
+    if not samples:
+        return None
+    index = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+    return round(samples[index] * 1000, 1)
+
+
+breaker = CircuitBreaker(settings.LLM_CIRCUIT_FAILURE_THRESHOLD, settings.LLM_CIRCUIT_RESET_TIMEOUT)
+metrics = Metrics()
+
+_backend_lock = threading.Lock()
+_backend = None
+
+
+def get_backend():
+    """Бекенд з settings.LLM_BACKENDS[settings.LLM_BACKEND], один на процес."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = dict(settings.LLM_BACKENDS[settings.LLM_BACKEND])
+                _backend = import_string(config.pop("BACKEND"))(**config)
+    return _backend
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    # override_settings(LLM_BACKEND="stub") у тестах
+    global _backend
+    if setting in ("LLM_BACKEND", "LLM_BACKENDS"):
+        _backend = None
+
+
+def default_model():
+    return get_backend().model
+
+
+def endpoint_timeout(endpoint):
+    total = settings.LLM_TIMEOUTS.get(endpoint, settings.LLM_TIMEOUTS["default"])
+    return httpx.Timeout(total, connect=settings.LLM_CONNECT_TIMEOUT)
+
+
+def backoff_delay(attempt):
+    # "Full jitter": випадкова пауза до exp-межі, щоб воркери не били в апстрім хвилею
+    cap = min(settings.LLM_RETRY_MAX_BACKOFF, settings.LLM_RETRY_BACKOFF * 2 ** attempt)
+    return random.uniform(0, cap)
+
+
+def check_breaker(endpoint):
+    if not breaker.allow():
+        metrics.reject(endpoint)
+        raise LLMUnavailable("LLM provider is temporarily unavailable, try again later.")
+
+
+def handle_failure(endpoint, started, error, attempt):
+    """Рахує помилку; повертає паузу перед повтором або None, якщо повторювати не треба."""
+    elapsed = time.perf_counter() - started
+    metrics.observe(endpoint, elapsed, ok=False)
+    tracing.record_llm_call(elapsed)
+    if not isinstance(error, RETRYABLE_ERRORS):
+        # Апстрім відповів (400/401/...) — він живий, просто запит поганий
+        breaker.record_success()
+        return None
+    breaker.record_failure()
+    if attempt >= settings.LLM_MAX_RETRIES:
+        return None
+    metrics.retry(endpoint)
+    return backoff_delay(attempt)
+
+
+def handle_success(endpoint, started, result):
+    elapsed = time.perf_counter() - started
+    breaker.record_success()
+    metrics.observe(endpoint, elapsed, ok=True)
+    # Для стріму це лише час до першого байта, токенів ще немає
+    tracing.record_llm_call(elapsed, getattr(result, "usage", None))
+
+
+def create(endpoint, **kwargs):
+    """client.chat.completions.create(**kwargs) з таймаутом, повторами і breaker — без кешу."""
+    attempt = 0
+    while True:
+        check_breaker(endpoint)
+        started = time.perf_counter()
+        try:
+            result = get_backend().create(endpoint, timeout=endpoint_timeout(endpoint), **kwargs)
+        except Exception as e:
+            delay = handle_failure(endpoint, started, e, attempt)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            attempt += 1
+            continue
+        handle_success(endpoint, started, result)
+        return result
+
+
+async def acreate(endpoint, **kwargs):
+    attempt = 0
+    while True:
+        check_breaker(endpoint)
+        started = time.perf_counter()
+        try:
+            result = await get_backend().acreate(endpoint, timeout=endpoint_timeout(endpoint), **kwargs)
+        except Exception as e:
+            delay = handle_failure(endpoint, started, e, attempt)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        handle_success(endpoint, started, result)
+        return result
+
+
+def chat_completion(endpoint, user_id=None, **kwargs):
+    """
+    Основна точка входу для в'юх. Для ендпоінтів з LLM_CACHE_ENDPOINTS
+    спершу дивиться в спільний кеш, а свіжу відповідь туди кладе.
+    Кожен виклик (і з кешу теж) потрапляє в журнал токенів юзера user_id.
+    """
+    kwargs.setdefault("model", default_model())
+    started = time.perf_counter()
+
+    key = llm_cache.make_cache_key(**kwargs) if llm_cache.is_enabled(endpoint) else None
+    completion = llm_cache.lookup(endpoint, key) if key else None
+    cache_hit = completion is not None
+    if not cache_hit:
+        completion = create(endpoint, **kwargs)
+        if key:
+            llm_cache.store(endpoint, key, completion)
+
+    token_ledger.record_usage(
+        user_id, endpoint, completion.model or kwargs["model"], completion.usage,
+        latency=time.perf_counter() - started, cache_hit=cache_hit,
+    )
+    return completion
+
+
+async def achat_completion(endpoint, user_id=None, **kwargs):
+    """Async-версія chat_completion для ASGI в'юх."""
+    kwargs.setdefault("model", default_model())
+    started = time.perf_counter()
+
+    key = llm_cache.make_cache_key(**kwargs) if llm_cache.is_enabled(endpoint) else None
+    completion = await sync_to_async(llm_cache.lookup)(endpoint, key) if key else None
+    cache_hit = completion is not None
+    if not cache_hit:
+        completion = await acreate(endpoint, **kwargs)
+        if key:
+            await sync_to_async(llm_cache.store)(endpoint, key, completion)
+
+    # sync_to_async: при TOKEN_LEDGER_FLUSH_INTERVAL = 0 record пише в БД одразу
+    await sync_to_async(token_ledger.record_usage)(
+        user_id, endpoint, completion.model or kwargs["model"], completion.usage,
+        latency=time.perf_counter() - started, cache_hit=cache_hit,
+    )
+    return completion
+
+
+def stream_chat_completion(endpoint, **kwargs):
+    """
+    Стрім токенів. Повторюємо лише відкриття стріму: якщо обірвалось
+    посередині, юзер уже бачив частину тексту — хай перезапускає сам.
+    Останній чанк (без choices) несе usage — його в журнал пише в'юха.
+    """
+    kwargs.setdefault("model", default_model())
+    kwargs.setdefault("stream_options", {"include_usage": True})
+    return create(endpoint, stream=True, **kwargs)
+
+
+def estimate_usage(messages, text):
+    """
+    Грубо, ~CHARS_PER_TOKEN символів на токен: usage приходить останнім
+    чанком стріму, і якщо стрім обірвався раніше, записати більше нічого.
+    """
+    prompt_tokens = sum(len(m.get("content") or "") for m in messages) // CHARS_PER_TOKEN
+    completion_tokens = len(text) // CHARS_PER_TOKEN
+    return CompletionUsage(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+    )
+
+
+def metrics_snapshot():
+    return {
+        "circuit": {"state": breaker.state, "consecutive_failures": breaker.failures},
+        "endpoints": metrics.snapshot(),
+    }
@@ -0,0 +1,214 @@
+"""
+Бекенди LLM для шлюзу Courses/llm.py. Який саме — вирішує settings.LLM_BACKEND,
+налаштування кожного лежать у settings.LLM_BACKENDS (як CACHES/DATABASES):
+
+    LLM_BACKENDS = {
+        "openrouter": {"BACKEND": "Courses.llm_backends.OpenRouterBackend", "MODEL": "...", ...},
+        "stub": {"BACKEND": "Courses.llm_backends.StubBackend", "LATENCY": 0.5, "JITTER": 0.1},
+    }
+
+Бекенд отримує назву ендпоінта (course/lesson/homework/review) і kwargs
+для chat.completions.create() та повертає ChatCompletion (або ітератор
+ChatCompletionChunk при stream=True).
+"""
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+
+class BaseLLMBackend:
+
+    def __init__(self, MODEL, **options):
+        self.model = MODEL
+        self.options = options
+
+    def create(self, endpoint, timeout=None, **kwargs):
+        raise NotImplementedError
+
+    async def acreate(self, endpoint, timeout=None, **kwargs):
+        raise NotImplementedError
+
+
+class OpenRouterBackend(BaseLLMBackend):
+    """OpenRouter (або будь-який OpenAI-сумісний API) з одним пулом з'єднань на процес."""
+
+    def __init__(self, MODEL, BASE_URL, API_KEY=None, MAX_CONNECTIONS=50,
+                 MAX_KEEPALIVE_CONNECTIONS=20, KEEPALIVE_EXPIRY=60, **options):
+        super().__init__(MODEL, **options)
+        self.base_url = BASE_URL
+        self.api_key = API_KEY
+        self.limits = httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+        self._lock = threading.Lock()
+        self._client = None
+        self._async_client = None
+
+    def get_api_key(self):
+        # Перевіряємо при першому запиті, а не при імпорті — без ключа застосунок
+        # хоча б стартує (міграції, адмінка, stub-бекенд)
+        if not self.api_key:
+            raise ValueError("OpenRouter API key not found.")
+        return self.api_key
+
+    def get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = OpenAI(
+                        base_url=self.base_url,
+                        api_key=self.get_api_key(),
+                        # Повтори робить шлюз, щоб їх бачив breaker і метрики
+                        max_retries=0,
+                        http_client=httpx.Client(limits=self.limits),
+                    )
+        return self._client
+
+    def get_async_client(self):
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    self._async_client = AsyncOpenAI(
+                        base_url=self.base_url,
+                        api_key=self.get_api_key(),
+                        max_retries=0,
+                        http_client=httpx.AsyncClient(limits=self.limits),
+                    )
+        return self._async_client
+
+    def create(self, endpoint, timeout=None, **kwargs):
+        return self.get_client().chat.completions.create(timeout=timeout, **kwargs)
+
+    async def acreate(self, endpoint, timeout=None, **kwargs):
+        return await self.get_async_client().chat.completions.create(timeout=timeout, **kwargs)
+
+
+STUB_MARKDOWN = "## Теорія\n\n**Змінна** — іменоване значення.\n\n```python\nx = 42\nprint(x)\n```\n"
+
+
+def stub_course(topic, modules=5, lessons=4):
+    return {
+        "meta": {"topic": topic},
+        "modules": [
+            {
+                "title": f"{topic}: модуль {m}",
+                "homework_topic": f"ДЗ: модуль {m}",
+                "lessons": [
+                    {"title": f"Урок {m}.{l}", "type": "lecture"} for l in range(1, lessons + 1)
+                ],
+            }
+            for m in range(1, modules + 1)
+        ],
+    }
+
+
+def stub_content(endpoint, messages):
+    """
+    Заготовлена відповідь для ендпоінта. Детермінована: той самий запит —
+    той самий текст, тож кеш і single-flight поводяться як з реальним LLM.
+    """
+    try:
+        payload = json.loads(messages[-1]["content"]) if messages else {}
+    except ValueError:
+        payload = {}
+    if not isinstance(payload, dict):
+        payload = {}
+    digest = int(hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).hexdigest(), 16)
+
+    if endpoint == "course":
+        return json.dumps(stub_course(str(payload.get("topic") or "Python")), ensure_ascii=False)
+    if endpoint == "review":
+        return json.dumps({
+            "grade": 60 + digest % 41,
+            "feedback": "Код працює, але бракує перевірок вхідних даних.",
+        }, ensure_ascii=False)
+    if endpoint == "homework":
+        return f"# {payload.get('homework_focus') or 'Домашнє завдання'}\n\n" + STUB_MARKDOWN * 2
+    if endpoint == "homework_tests":
+        # Задача-заглушка: сума двох чисел з одного рядка
+        return json.dumps({"cases": [
+            {"input": f"{a} {b}\n", "expected_output": f"{a + b}\n"}
+            for a, b in ((2, 3), (10, -4), (digest % 100, 7))
+        ]})
+    return f"# {payload.get('lesson_title') or 'Урок'}\n\n" + STUB_MARKDOWN * 4
+
+
+class StubBackend(BaseLLMBackend):
+    """
+    Локальна заглушка для навантажувальних тестів: жодних мереж і токенів,
+    лише затримка LATENCY ± JITTER секунд (стрім розтягує її на STREAM_CHUNKS шматків).
+    """
+
+    def __init__(self, MODEL="stub", LATENCY=0.5, JITTER=0.0, STREAM_CHUNKS=20, **options):
+        super().__init__(MODEL, **options)
+        self.latency = LATENCY
+        self.jitter = JITTER
+        self.stream_chunks = STREAM_CHUNKS
+
+    def delay(self):
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def completion(self, endpoint, kwargs):
+        content = stub_content(endpoint, kwargs.get("messages") or [])
+        prompt_tokens = sum(len(m.get("content", "")) for m in kwargs.get("messages") or []) // 4
+        completion_tokens = len(content) // 4
+        return ChatCompletion.model_validate({
+            "id": "stub-completion",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": kwargs.get("model") or self.model,
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    def stream(self, completion, delay, include_usage=False):
+        content = completion.choices[0].message.content
+        step = max(1, -(-len(content) // self.stream_chunks))
+        for i in range(0, len(content), step):
+            time.sleep(delay / self.stream_chunks)
+            yield ChatCompletionChunk.model_validate({
+                "id": completion.id,
+                "object": "chat.completion.chunk",
+                "created": completion.created,
+                "model": completion.model,
+                "choices": [{"index": 0, "delta": {"content": content[i:i + step]}, "finish_reason": None}],
+            })
+        if include_usage:
+            # Як у OpenAI: stream_options={"include_usage": True} -> останній чанк з usage і без choices
+            yield ChatCompletionChunk.model_validate({
+                "id": completion.id,
+                "object": "chat.completion.chunk",
+                "created": completion.created,
+                "model": completion.model,
+                "choices": [],
+                "usage": completion.usage.model_dump(),
+            })
+
+    def create(self, endpoint, timeout=None, stream=False, stream_options=None, **kwargs):
+        completion = self.completion(endpoint, kwargs)
+        if stream:
+            include_usage = bool((stream_options or {}).get("include_usage"))
+            return self.stream(completion, self.delay(), include_usage)
+        time.sleep(self.delay())
+        return completion
+
+    async def acreate(self, endpoint, timeout=None, **kwargs):
+        await asyncio.sleep(self.delay())
+        return self.completion(endpoint, kwargs)
@@ -0,0 +1,171 @@
+"""
+Кеш відповідей LLM, спільний для всіх юзерів.
+
+Ключ — sha256 від нормалізованого запиту (model, system prompt,
+temperature, payload), тож два юзери з "Python basics" платять за
+структуру курсу один раз. Кеш вмикається окремо для кожного ендпоінта
+через LLM_CACHE_ENDPOINTS; записи живуть LLM_CACHE_TTL секунд, а понад
+LLM_CACHE_MAX_ENTRIES витісняються найдавніше використані (LRU).
+
+Прибирання (evict) — не частіше ніж раз на LLM_CACHE_EVICT_INTERVAL
+секунд на процес, тож між прибираннями записів може бути трохи більше.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from openai.types.chat import ChatCompletion
+from openai.types.completion_usage import CompletionUsage
+
+from .models import LLMCacheEntry
+
+_stats_lock = threading.Lock()
+_hits = Counter()
+_misses = Counter()
+_evict_lock = threading.Lock()
+_last_evict = float("-inf")
+
+
+def is_enabled(endpoint):
+    return endpoint in settings.LLM_CACHE_ENDPOINTS
+
+
+def normalize(value):
+    """
+    Рядки: без зайвих пробілів. JSON-рядки розбираємо і нормалізуємо рекурсивно.
+    Регістр не чіпаємо: у тексті ДЗ для homework_tests від нього залежить очікуваний вивід.
+    """
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [normalize(v) for v in value]
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            return " ".join(value.split())
+        if isinstance(parsed, (dict, list)):
+            return normalize(parsed)
+        return " ".join(value.split())
+    return value
+
+
+def make_cache_key(**kwargs):
+    """kwargs — ті самі, що йдуть у client.chat.completions.create()."""
+    request = {k: v for k, v in kwargs.items() if k != "stream"}
+    request["messages"] = [
+        {"role": m["role"], "content": normalize(m["content"])}
+        for m in request.get("messages", [])
+    ]
+    raw = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def record(endpoint, hit):
+    with _stats_lock:
+        (_hits if hit else _misses)[endpoint] += 1
+
+
+def cache_stats():
+    with _stats_lock:
+        endpoints = sorted(set(_hits) | set(_misses))
+        data = {
+            endpoint: {
+                "hits": _hits[endpoint],
+                "misses": _misses[endpoint],
+                "hit_ratio": round(_hits[endpoint] / ((_hits[endpoint] + _misses[endpoint]) or 1), 3),
+            }
+            for endpoint in endpoints
+        }
+    return {
+        "enabled_endpoints": list(settings.LLM_CACHE_ENDPOINTS),
+        "entries": LLMCacheEntry.objects.count(),
+        "endpoints": data,
+    }
+
+
+def lookup(endpoint, key):
+    entry = (
+        LLMCacheEntry.objects
+        .filter(key=key, expires_at__gt=timezone.now())
+        .only("id", "response")
+        .first()
+    )
+    if entry is None:
+        record(endpoint, hit=False)
+        return None
+
+    LLMCacheEntry.objects.filter(id=entry.id).update(
+        hits=F("hits") + 1, last_used_at=timezone.now()
+    )
+    record(endpoint, hit=True)
+
+    completion = ChatCompletion.model_validate(entry.response)
+    # За кешовану відповідь токени не платимо
+    completion.usage = CompletionUsage(prompt_tokens=0, completion_tokens=0, total_tokens=0)
+    return completion
+
+
+def store(endpoint, key, completion):
+    now = timezone.now()
+    # Один INSERT ... ON CONFLICT замість update_or_create: без read-then-write
+    # транзакції, на якій SQLite одразу падає з "database is locked"
+    LLMCacheEntry.objects.bulk_create(
+        [LLMCacheEntry(
+            key=key,
+            endpoint=endpoint,
+            model=completion.model or "",
+            response=completion.model_dump(mode="json"),
+            expires_at=now + timedelta(seconds=settings.LLM_CACHE_TTL),
+            last_used_at=now,
+        )],
+        update_conflicts=True,
+        unique_fields=["key"],
+        update_fields=["endpoint", "model", "response", "expires_at", "last_used_at"],
+    )
+    maybe_evict()
+
+
+def maybe_evict():
+    """evict() раз на LLM_CACHE_EVICT_INTERVAL: без COUNT(*) і DELETE на кожен store."""
+    global _last_evict
+    now = time.monotonic()
+    with _evict_lock:
+        if now - _last_evict < settings.LLM_CACHE_EVICT_INTERVAL:
+            return
+        _last_evict = now
+    evict()
+
+
+def evict():
+    LLMCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()
+
+    overflow = LLMCacheEntry.objects.count() - settings.LLM_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        oldest = (
+            LLMCacheEntry.objects
+            .order_by("last_used_at")
+            .values_list("id", flat=True)[:overflow]
+        )
+        LLMCacheEntry.objects.filter(id__in=list(oldest)).delete()
+
+
+def completion_from_text(model, text):
+    """ChatCompletion зі зібраного стріму — щоб кешувати і стрімінгові відповіді."""
+    return ChatCompletion.model_validate({
+        "id": "cached-stream",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": text},
+        }],
+    })
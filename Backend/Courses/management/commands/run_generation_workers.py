@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from Courses.jobs import GenerationWorkerPool
+
+
+class Command(BaseCommand):
+    help = "Runs the background generation worker pool (courses, lessons, homeworks)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, help="Number of worker threads.")
+        parser.add_argument("--poll-interval", type=float, help="Seconds to sleep when the queue is empty.")
+
+    def handle(self, *args, **options):
+        pool = GenerationWorkerPool(
+            threads=options["threads"],
+            poll_interval=options["poll_interval"],
+        )
+        self.stdout.write(f"Starting {pool.threads} generation workers ({pool.name})")
+        try:
+            pool.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping workers...")
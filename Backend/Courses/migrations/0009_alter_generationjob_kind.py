@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Courses', '0008_generationjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='generationjob',
+            name='kind',
+            field=models.CharField(choices=[('course', 'Course'), ('lesson', 'Lesson'), ('homework', 'Homework'), ('warm_course', 'Warm course')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,47 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_positions(apps, schema_editor):
+    """Нумерація як у старому коді: модулі по id, уроки по (module_id, id)."""
+    CourseModel = apps.get_model("Courses", "CourseModel")
+    ModuleModel = apps.get_model("Courses", "ModuleModel")
+    LessonModel = apps.get_model("Courses", "LessonModel")
+
+    for course_id in CourseModel.objects.values_list("id", flat=True).iterator():
+        modules = list(ModuleModel.objects.filter(course_id=course_id).order_by("id"))
+        for index, module in enumerate(modules, start=1):
+            module.position = index
+        ModuleModel.objects.bulk_update(modules, ["position"])
+
+        lessons = list(LessonModel.objects.filter(module__course_id=course_id).order_by("module_id", "id"))
+        for index, lesson in enumerate(lessons, start=1):
+            lesson.course_id = course_id
+            lesson.position = index
+        LessonModel.objects.bulk_update(lessons, ["course", "position"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Courses', '0010_llmcacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='modulemodel',
+            name='position',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lessonmodel',
+            name='position',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lessonmodel',
+            name='course',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to='Courses.coursemodel'),
+        ),
+        migrations.RunPython(fill_positions, migrations.RunPython.noop),
+    ]
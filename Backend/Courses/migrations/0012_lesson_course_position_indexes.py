@@ -0,0 +1,25 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Courses', '0011_lesson_module_position'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lessonmodel',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to='Courses.coursemodel'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonmodel',
+            index=models.Index(fields=['course', 'position'], name='lesson_course_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='modulemodel',
+            index=models.Index(fields=['course', 'position'], name='module_course_position_idx'),
+        ),
+    ]
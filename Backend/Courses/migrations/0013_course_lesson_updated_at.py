@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Courses', '0012_lesson_course_position_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursemodel',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='lessonmodel',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_owners(apps, schema_editor):
+    """owner уроку/ДЗ = owner курсу — по одному UPDATE на таблицю."""
+    CourseModel = apps.get_model("Courses", "CourseModel")
+    ModuleModel = apps.get_model("Courses", "ModuleModel")
+    LessonModel = apps.get_model("Courses", "LessonModel")
+    HomeworkModel = apps.get_model("Courses", "HomeworkModel")
+
+    LessonModel.objects.update(owner_id=Subquery(
+        CourseModel.objects.filter(id=OuterRef("course_id")).values("owner_id")[:1]
+    ))
+    HomeworkModel.objects.update(owner_id=Subquery(
+        ModuleModel.objects.filter(id=OuterRef("module_id")).values("course__owner_id")[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Courses', '0015_chatprompt_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lessonmodel',
+            name='owner',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='homeworkmodel',
+            name='owner',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='homeworks', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(fill_owners, migrations.RunPython.noop),
+    ]
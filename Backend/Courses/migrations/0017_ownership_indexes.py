@@ -0,0 +1,36 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Courses', '0016_lesson_homework_owner'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lessonmodel',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='homeworkmodel',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='homeworks', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='coursemodel',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='course_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonmodel',
+            index=models.Index(fields=['module', 'position'], name='lesson_module_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='homeworkmodel',
+            index=models.Index(fields=['module', 'owner'], name='homework_module_owner_idx'),
+        ),
+    ]
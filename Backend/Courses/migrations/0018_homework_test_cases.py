@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Courses', '0017_ownership_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='homeworkmodel',
+            name='test_cases',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
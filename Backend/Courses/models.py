@@ -1,7 +1,15 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from Auth.models import CustomUser
 
 class ChatPrompt(models.Model):
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="prompts"
+    )
     user_input = models.TextField()
     input_tokens = models.IntegerField(blank=True, null=True)
     output_tokens = models.IntegerField(blank=True, null=True)
@@ -20,10 +28,55 @@ class CourseModel(models.Model):
     )
     topic = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Версія дерева курсу для ETag/Last-Modified — див. CourseModel.touch()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Список курсів: WHERE owner ORDER BY -created_at, -id — без сортування
+            models.Index(fields=["owner", "-created_at", "-id"], name="course_owner_created_idx"),
+        ]
 
     def __str__(self):
         return self.topic
 
+    @staticmethod
+    def touch(course_id):
+        """Позначає, що дерево курсу (модулі, уроки, ДЗ) змінилось."""
+        CourseModel.objects.filter(id=course_id).update(updated_at=timezone.now())
+
+    @staticmethod
+    def renumber(course_id):
+        """
+        Нумерація модулів і наскрізна нумерація уроків курсу знову 1..N без
+        "дірок" (після видалень, див. Courses/signals.py). Пише лише зсунуті рядки.
+        """
+        with transaction.atomic():
+            modules = ModuleModel.objects.filter(course_id=course_id).order_by("position", "id").only("id", "position")
+            moved_modules = []
+            for position, module in enumerate(modules, start=1):
+                if module.position != position:
+                    module.position = position
+                    moved_modules.append(module)
+
+            now = timezone.now()
+            lessons = (
+                LessonModel.objects
+                .filter(course_id=course_id)
+                .order_by("position", "id")
+                .only("id", "position")
+            )
+            moved_lessons = []
+            for position, lesson in enumerate(lessons, start=1):
+                if lesson.position != position:
+                    lesson.position = position
+                    lesson.updated_at = now
+                    moved_lessons.append(lesson)
+
+            ModuleModel.objects.bulk_update(moved_modules, ["position"])
+            LessonModel.objects.bulk_update(moved_lessons, ["position", "updated_at"])
+            CourseModel.touch(course_id)
+
 
 class ModuleModel(models.Model):
     course = models.ForeignKey(
@@ -34,6 +87,12 @@ class ModuleModel(models.Model):
     title = models.CharField(max_length=255)
     # Поле homework видалено, тепер це окрема сутність.
     # Менше сміття в таблиці модулів.
+    position = models.IntegerField(default=0)  # 1..N в межах курсу
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["course", "position"], name="module_course_position_idx"),
+        ]
 
     def __str__(self):
         return self.title
@@ -45,9 +104,32 @@ class LessonModel(models.Model):
         on_delete=models.CASCADE,
         related_name="lessons"
     )
+    # Дублюємо курс з module.course, щоб order_id був простим читанням колонки
+    course = models.ForeignKey(
+        CourseModel,
+        on_delete=models.CASCADE,
+        related_name="lessons"
+    )
+    # І власника з course.owner — перевірка доступу без join-у module -> course
+    owner = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="lessons"
+    )
     title = models.CharField(max_length=255)
     type = models.CharField(max_length=50)
     content = models.TextField()
+    # Наскрізний номер уроку в курсі (1..N) — це і є order_id на фронті
+    position = models.IntegerField(default=0)
+    # При save(update_fields=[...]) треба явно додавати "updated_at"
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["course", "position"], name="lesson_course_position_idx"),
+            # prefetch уроків модулів: WHERE module_id IN (...) ORDER BY position
+            models.Index(fields=["module", "position"], name="lesson_module_position_idx"),
+        ]
 
     def __str__(self):
         return self.title
@@ -59,6 +141,12 @@ class HomeworkModel(models.Model):
         on_delete=models.CASCADE,
         related_name="homeworks"
     )
+    # Дубль module.course.owner, як LessonModel.owner
+    owner = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="homeworks"
+    )
     title = models.CharField(max_length=255, default="Домашнє завдання")
     content = models.TextField(blank=True) # Саме завдання
     
@@ -66,10 +154,117 @@ class HomeworkModel(models.Model):
     user_submission = models.TextField(blank=True, null=True) # Що накльопав юзер
     ai_feedback = models.TextField(blank=True, null=True)     # Що про це думає AI
     grade = models.IntegerField(blank=True, null=True)        # Оцінка (0-100)
+    # Автотести [{"input": ..., "expected_output": ...}] — див. Teacher/sandbox.py
+    test_cases = models.JSONField(default=list, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Перевірка ДЗ: WHERE module_id = ? AND owner_id = ?
+            models.Index(fields=["module", "owner"], name="homework_module_owner_idx"),
+        ]
+
     def __str__(self):
         status = "✅" if self.grade else "❌"
-        return f"{status} HW: {self.title} ({self.module.title})"
\ No newline at end of file
+        return f"{status} HW: {self.title} ({self.module.title})"
+
+class GenerationJob(models.Model):
+    """
+    Фонове завдання на генерацію (курс / урок / ДЗ).
+    Сама таблиця і є чергою: воркери (manage.py run_generation_workers)
+    забирають queued-записи, тож окремий брокер не потрібен.
+    """
+    KIND_COURSE = "course"
+    KIND_LESSON = "lesson"
+    KIND_HOMEWORK = "homework"
+    KIND_WARM_COURSE = "warm_course"
+    KIND_CHOICES = [
+        (KIND_COURSE, "Course"),
+        (KIND_LESSON, "Lesson"),
+        (KIND_HOMEWORK, "Homework"),
+        (KIND_WARM_COURSE, "Warm course"),
+    ]
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+    ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+    owner = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="generation_jobs"
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    # sha256 від (kind, owner, payload) — однакові активні завдання не дублюються
+    dedupe_key = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    progress = models.IntegerField(default=0)  # 0-100
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    # Воркер живий: оновлюється при захопленні і на кожному кроці прогресу
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="genjob_status_created_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedupe_key"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="unique_active_generation_job",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+
+class LLMCacheEntry(models.Model):
+    """
+    Спільний для всіх юзерів кеш відповідей LLM (Courses/llm_cache.py).
+    key — sha256 від нормалізованих (model, messages, temperature, ...).
+    """
+    key = models.CharField(max_length=64, unique=True)
+    endpoint = models.CharField(max_length=50)
+    model = models.CharField(max_length=100)
+    response = models.JSONField()  # ChatCompletion.model_dump()
+    hits = models.IntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    last_used_at = models.DateTimeField(db_index=True)  # для LRU-витіснення
+
+    def __str__(self):
+        return f"{self.endpoint}: {self.key[:12]}… ({self.hits} hits)"
+
+
+class GenerationLease(models.Model):
+    """
+    Оренда на генерацію (Courses/singleflight.py): поки запис живий,
+    інші запити/процеси не запускають такий самий LLM-виклик, а чекають результат.
+    """
+    key = models.CharField(max_length=100, unique=True)  # "lesson:42", "homework:7"
+    holder = models.CharField(max_length=150)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.key} -> {self.holder}"
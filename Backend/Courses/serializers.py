@@ -1,8 +1,103 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import ChatPrompt
+from .models import ChatPrompt, CourseModel, GenerationJob, HomeworkModel, LessonModel, ModuleModel
 
 class ChatPromptSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChatPrompt
         fields = ['id', 'user_input', 'created_at']
         read_only_fields = ['id', 'created_at']
+
+
+class GenerationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GenerationJob
+        fields = [
+            'id', 'kind', 'status', 'progress', 'result', 'error',
+            'attempts', 'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = fields
+
+
+class GenerationJobRequestSerializer(serializers.Serializer):
+    """Тіло POST /jobs/: kind + поле, потрібне саме цьому kind."""
+    REQUIRED_FIELDS = {
+        GenerationJob.KIND_COURSE: "prompt",
+        GenerationJob.KIND_LESSON: "lesson_id",
+        GenerationJob.KIND_HOMEWORK: "module_id",
+        GenerationJob.KIND_WARM_COURSE: "course_id",
+    }
+
+    kind = serializers.ChoiceField(choices=GenerationJob.KIND_CHOICES)
+    prompt = serializers.CharField(required=False)
+    lesson_id = serializers.IntegerField(required=False, min_value=1)
+    module_id = serializers.IntegerField(required=False, min_value=1)
+    course_id = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, data):
+        field = self.REQUIRED_FIELDS[data["kind"]]
+        if data.get(field) is None:
+            raise serializers.ValidationError({field: "This field is required."})
+        return data
+
+
+# === Дерево курсу (курс -> модулі -> уроки + ДЗ) ===
+# Одне дерево для GET /courses/ і GET /courses/<id>/.
+# Серіалізатори читають лише prefetch-кеш, тому дерево будь-якого розміру —
+# це рівно 4 запити: курси, модулі, уроки, ДЗ.
+
+def prefetch_course_tree(queryset):
+    return queryset.prefetch_related(
+        Prefetch(
+            "modules",
+            queryset=ModuleModel.objects.only("id", "course_id", "title", "position").order_by("position", "id")
+        ),
+        Prefetch(
+            "modules__lessons",
+            queryset=LessonModel.objects.only("id", "module_id", "title", "type", "position").order_by("position")
+        ),
+        Prefetch(
+            "modules__homeworks",
+            queryset=HomeworkModel.objects.only("id", "module_id", "content").order_by("id")
+        ),
+    )
+
+
+class LessonSummarySerializer(serializers.ModelSerializer):
+    order_id = serializers.IntegerField(source="position")
+
+    class Meta:
+        model = LessonModel
+        fields = ['id', 'order_id', 'title', 'type']
+
+
+class ModuleTreeSerializer(serializers.ModelSerializer):
+    homework = serializers.SerializerMethodField()
+    lessons = LessonSummarySerializer(many=True)
+
+    class Meta:
+        model = ModuleModel
+        fields = ['id', 'title', 'homework', 'lessons']
+
+    def get_homework(self, module):
+        # .all() а не .first(): first() ігнорує prefetch і робить запит на кожен модуль
+        homeworks = module.homeworks.all()
+        return homeworks[0].content if homeworks else ""
+
+
+class CourseTreeSerializer(serializers.ModelSerializer):
+    modules = ModuleTreeSerializer(many=True)
+
+    class Meta:
+        model = CourseModel
+        fields = ['id', 'topic', 'created_at', 'modules']
+
+
+class CourseSummarySerializer(serializers.ModelSerializer):
+    # Анотуються в ChatAPIView.get (fields=summary)
+    modules_count = serializers.IntegerField()
+    lessons_count = serializers.IntegerField()
+
+    class Meta:
+        model = CourseModel
+        fields = ['id', 'topic', 'created_at', 'modules_count', 'lessons_count']
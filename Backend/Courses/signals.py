@@ -0,0 +1,56 @@
+"""
+Нумерація модулів і уроків після видалень.
+
+post_delete спрацьовує і для instance.delete(), і для QuerySet.delete(),
+і для каскаду з модуля чи адмінки (bulk delete), тож "дірки" в position
+не лишаються за жодного способу видалення. Якщо видаляють сам курс
+(чи юзера) — нумерувати нічого, пропускаємо.
+
+Перенумеровуємо один раз на курс після коміту: QuerySet.delete() чи
+каскад з модуля шлють сигнал на кожен рядок, а курс досить пройти раз.
+"""
+from django.db import models, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import CourseModel, LessonModel, ModuleModel
+
+
+def deleted_directly(origin):
+    """Видаляли модулі/уроки, а не курс чи юзера, з яким вони пішли каскадом."""
+    model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    return model in (ModuleModel, LessonModel)
+
+
+class RenumberOnCommit:
+    """on_commit-колбек транзакції: збирає курси і нумерує кожен один раз."""
+
+    def __init__(self):
+        self.course_ids = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        for course_id in sorted(self.course_ids):
+            CourseModel.renumber(course_id)
+
+
+def schedule_renumber(course_id, using):
+    # Колбек цієї транзакції вже є — лише додаємо курс. Після rollback Django
+    # сам викидає колбеки, тож застарілого набору курсів не лишиться;
+    # done — колбек уже виконали, а зі списку ще не прибрали (captureOnCommitCallbacks)
+    for _, callback, _ in transaction.get_connection(using).run_on_commit:
+        if isinstance(callback, RenumberOnCommit) and not callback.done:
+            callback.course_ids.add(course_id)
+            return
+    callback = RenumberOnCommit()
+    callback.course_ids.add(course_id)
+    transaction.on_commit(callback, using=using)
+
+
+@receiver(post_delete, sender=ModuleModel)
+@receiver(post_delete, sender=LessonModel)
+def _renumber_course(sender, instance, using, origin=None, **kwargs):
+    if origin is not None and not deleted_directly(origin):
+        return
+    schedule_renumber(instance.course_id, using)
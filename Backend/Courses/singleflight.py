@@ -0,0 +1,140 @@
+"""
+Single-flight для генерацій: один LLM-виклик на урок/ДЗ, скільки б
+запитів (подвійний клік, дві вкладки, воркер черги) не прийшло одночасно.
+
+Лідер бере оренду — рядок GenerationLease з унікальним key — і генерує.
+Решта чекають, поки результат з'явиться в БД, і віддають його.
+Оренда працює між потоками і між процесами; якщо лідер помер,
+вона протухає через SINGLE_FLIGHT_LEASE_TTL і її забирає наступний.
+"""
+import asyncio
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import GenerationLease
+
+# Лідер у цьому ж процесі будить своїх очікувачів одразу, без опитування БД
+_local_lock = threading.Lock()
+_local_events = {}
+
+
+class SingleFlightTimeout(Exception):
+    """Лідер ще генерує, а ми вже чекали SINGLE_FLIGHT_WAIT_TIMEOUT — клієнт повторить пізніше (503)."""
+    retry_after = 10  # секунд
+
+
+class SingleFlight:
+
+    def __init__(self, key):
+        self.key = key
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}"
+        self.acquired = False
+
+    def acquire(self):
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=settings.SINGLE_FLIGHT_LEASE_TTL)
+        try:
+            with transaction.atomic():
+                GenerationLease.objects.create(key=self.key, holder=self.holder, expires_at=expires_at)
+            self.acquired = True
+        except IntegrityError:
+            # Зайнято; забираємо, лише якщо попередній лідер не встиг за TTL
+            self.acquired = GenerationLease.objects.filter(
+                key=self.key, expires_at__lt=now
+            ).update(holder=self.holder, expires_at=expires_at) == 1
+
+        if self.acquired:
+            with _local_lock:
+                _local_events[self.key] = threading.Event()
+        return self.acquired
+
+    def release(self):
+        if not self.acquired:
+            return
+        GenerationLease.objects.filter(key=self.key, holder=self.holder).delete()
+        self.acquired = False
+        with _local_lock:
+            event = _local_events.pop(self.key, None)
+        if event:
+            event.set()
+
+    def is_held(self):
+        return GenerationLease.objects.filter(
+            key=self.key, expires_at__gte=timezone.now()
+        ).exists()
+
+    def wait(self, fetch_existing, timeout=None):
+        """
+        Чекає, поки лідер закінчить. Повертає fetch_existing() або None,
+        якщо лідер відпустив оренду без результату (помилка LLM).
+        """
+        deadline = time.monotonic() + (timeout or settings.SINGLE_FLIGHT_WAIT_TIMEOUT)
+        while time.monotonic() < deadline:
+            with _local_lock:
+                event = _local_events.get(self.key)
+            if event:
+                event.wait(settings.SINGLE_FLIGHT_POLL_INTERVAL)
+            else:
+                time.sleep(settings.SINGLE_FLIGHT_POLL_INTERVAL)
+
+            result = fetch_existing()
+            if result is not None:
+                return result
+            if not self.is_held():
+                return None
+        raise SingleFlightTimeout(f"Timed out waiting for {self.key}")
+
+
+def run_single_flight(key, produce, fetch_existing):
+    """
+    produce() — робить генерацію і зберігає результат;
+    fetch_existing() — дістає вже готовий результат з БД або None.
+    """
+    flight = SingleFlight(key)
+    while True:
+        if flight.acquire():
+            try:
+                # Поки ми чекали на оренду, попередній лідер міг уже все зробити
+                result = fetch_existing()
+                return result if result is not None else produce()
+            finally:
+                flight.release()
+
+        result = flight.wait(fetch_existing)
+        if result is not None:
+            return result
+        # Лідер впав без результату — пробуємо самі
+
+
+async def arun_single_flight(key, produce, fetch_existing):
+    """Async-версія для ASGI в'юх: produce — корутинна функція, fetch_existing — sync."""
+    flight = SingleFlight(key)
+    fetch = sync_to_async(fetch_existing)
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT_TIMEOUT
+
+    while True:
+        if await sync_to_async(flight.acquire)():
+            try:
+                result = await fetch()
+                return result if result is not None else await produce()
+            finally:
+                await sync_to_async(flight.release)()
+
+        while True:
+            if time.monotonic() > deadline:
+                raise SingleFlightTimeout(f"Timed out waiting for {key}")
+            await asyncio.sleep(settings.SINGLE_FLIGHT_POLL_INTERVAL)
+            result = await fetch()
+            if result is not None:
+                return result
+            if not await sync_to_async(flight.is_held)():
+                break
@@ -1,3 +1,771 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import close_old_connections, connection
+import httpx
+import openai
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from Auth.models import CustomUser, DailyTokenUsage, TokenTransaction
+from Teacher import sandbox
+from . import jobs, llm, llm_cache
+from .models import (
+    ChatPrompt, CourseModel, GenerationJob, GenerationLease, HomeworkModel, LessonModel, LLMCacheEntry,
+    ModuleModel,
+)
+from .singleflight import SingleFlightTimeout
+from .views import StreamLessonAPIView, create_course_from_json, generate_lesson_content
+
+
+def make_course_json(modules=3, lessons=4, topic="Python"):
+    return {
+        "meta": {"topic": topic},
+        "modules": [
+            {
+                "title": f"Модуль {m}",
+                "homework_topic": f"ДЗ {m}",
+                "lessons": [{"title": f"Урок {m}.{l}", "type": "lecture"} for l in range(1, lessons + 1)],
+            }
+            for m in range(1, modules + 1)
+        ],
+    }
+
+
+class CourseReadQueryCountTests(APITestCase):
+    """
+    Дерево курсу читається фіксованою кількістю запитів незалежно
+    від кількості модулів/уроків. Якщо тест впав — десь з'явився N+1.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="student", email="student@example.com", password="password123"
+        )
+        self.client.force_authenticate(self.user)
+        self.courses = [
+            create_course_from_json(self.user, make_course_json(modules=m, topic=f"Курс {m}"))
+            for m in (2, 5, 8)
+        ]
+        HomeworkModel.objects.filter(module__course=self.courses[0]).update(content="# ДЗ\nЗавдання")
+
+    def test_course_list_full(self):
+        # курси + модулі + уроки + ДЗ
+        with self.assertNumQueries(4):
+            response = self.client.get("/courses/", {"fields": "full"})
+        self.assertEqual(response.status_code, 200)
+        # Без limit/cursor — масив, як до пагінації
+        self.assertEqual([c["id"] for c in response.data], [c.id for c in reversed(self.courses)])
+
+    def test_course_list_summary(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/courses/", {"fields": "summary"})
+        self.assertEqual(response.status_code, 200)
+        counts = {c["id"]: (c["modules_count"], c["lessons_count"]) for c in response.data}
+        self.assertEqual(counts[self.courses[2].id], (8, 32))
+
+    def test_course_list_pagination(self):
+        response = self.client.get("/courses/", {"fields": "summary", "limit": 2})
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNotNone(response.data["next_cursor"])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                "/courses/", {"fields": "summary", "limit": 2, "cursor": response.data["next_cursor"]}
+            )
+        self.assertEqual([c["id"] for c in response.data["results"]], [self.courses[0].id])
+        self.assertIsNone(response.data["next_cursor"])
+
+    def test_course_detail(self):
+        course = self.courses[0]
+        with self.assertNumQueries(4):
+            response = self.client.get(f"/courses/{course.id}/")
+        self.assertEqual(response.status_code, 200)
+
+        modules = response.data["modules"]
+        self.assertEqual([m["title"] for m in modules], ["Модуль 1", "Модуль 2"])
+        self.assertEqual(modules[0]["homework"], "# ДЗ\nЗавдання")
+        order_ids = [l["order_id"] for m in modules for l in m["lessons"]]
+        self.assertEqual(order_ids, list(range(1, 9)))
+        self.assertIn('db;dur=', response["Server-Timing"])
+        self.assertIn('desc="4 queries"', response["Server-Timing"])
+
+    def test_course_detail_of_other_user(self):
+        other = CustomUser.objects.create_user(
+            username="other", email="other@example.com", password="password123"
+        )
+        self.client.force_authenticate(other)
+        response = self.client.get(f"/courses/{self.courses[0].id}/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_generated_lesson_is_a_single_query(self):
+        lesson = LessonModel.objects.filter(course=self.courses[1], position=7).get()
+        lesson.content = "# Урок\nВже згенерований текст"
+        lesson.save()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/courses/lessons/{lesson.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["order_id"], 7)
+
+
+class ConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="student", email="student@example.com", password="password123"
+        )
+        self.client.force_authenticate(self.user)
+        self.course = create_course_from_json(self.user, make_course_json())
+
+    def test_course_detail_not_modified(self):
+        response = self.client.get(f"/courses/{self.course.id}/")
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/courses/{self.course.id}/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_course_detail_changes_after_homework_generated(self):
+        etag = self.client.get(f"/courses/{self.course.id}/")["ETag"]
+        module = self.course.modules.order_by("position").first()
+        HomeworkModel.objects.filter(module=module).update(content="# Нове ДЗ")
+        CourseModel.touch(self.course.id)
+
+        response = self.client.get(f"/courses/{self.course.id}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_course_list_not_modified(self):
+        etag = self.client.get("/courses/", {"fields": "summary"})["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get("/courses/", {"fields": "summary"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        create_course_from_json(self.user, make_course_json(topic="Ще один"))
+        response = self.client.get("/courses/", {"fields": "summary"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_generated_lesson_not_modified(self):
+        lesson = LessonModel.objects.filter(course=self.course).order_by("position").first()
+        lesson.content = "# Урок\nВже згенерований текст"
+        lesson.save()
+
+        response = self.client.get(f"/courses/lessons/{lesson.id}/")
+        self.assertIn("max-age", response["Cache-Control"])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/courses/lessons/{lesson.id}/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+
+class PositionRenumberTests(APITestCase):
+    """Після будь-якого способу видалення position знову 1..N без дірок."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="student", email="student@example.com", password="password123"
+        )
+        self.course = create_course_from_json(self.user, make_course_json(modules=3, lessons=2))
+
+    def positions(self):
+        modules = list(ModuleModel.objects.filter(course=self.course).order_by("position").values_list("title", "position"))
+        lessons = list(LessonModel.objects.filter(course=self.course).order_by("position").values_list("title", "position"))
+        return modules, lessons
+
+    def test_instance_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            LessonModel.objects.get(course=self.course, title="Урок 1.2").delete()
+        modules, lessons = self.positions()
+        self.assertEqual([p for _, p in lessons], [1, 2, 3, 4, 5])
+        self.assertEqual(lessons[1][0], "Урок 2.1")
+
+    def test_queryset_delete_and_module_cascade(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            LessonModel.objects.filter(course=self.course, title__in=["Урок 1.1", "Урок 3.1"]).delete()
+        self.assertEqual([p for _, p in self.positions()[1]], [1, 2, 3, 4])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ModuleModel.objects.filter(course=self.course, title="Модуль 2").delete()
+        modules, lessons = self.positions()
+        self.assertEqual(modules, [("Модуль 1", 1), ("Модуль 3", 2)])
+        self.assertEqual(lessons, [("Урок 1.2", 1), ("Урок 3.2", 2)])
+
+    def test_course_renumbered_once_per_transaction(self):
+        other = create_course_from_json(self.user, make_course_json(modules=2, lessons=2))
+        with mock.patch.object(CourseModel, "renumber") as renumber:
+            with self.captureOnCommitCallbacks(execute=True):
+                ModuleModel.objects.filter(course=self.course, title__in=["Модуль 1", "Модуль 2"]).delete()
+                LessonModel.objects.filter(course__in=[self.course, other], title="Урок 1.1").delete()
+        self.assertEqual(sorted(c.args for c in renumber.call_args_list), [(self.course.id,), (other.id,)])
+
+    def test_course_delete_skips_renumbering(self):
+        with mock.patch.object(CourseModel, "renumber") as renumber, self.captureOnCommitCallbacks(execute=True):
+            self.course.delete()
+        renumber.assert_not_called()
+        self.assertFalse(LessonModel.objects.exists())
+
+
+@skipUnless(connection.vendor == "sqlite", "текст EXPLAIN QUERY PLAN специфічний для SQLite")
+class OwnershipIndexTests(APITestCase):
+    """Гарячі запити з фільтром по власнику йдуть по індексах, без сортувань і join-ів."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="owner", email="owner@example.com", password="password123"
+        )
+        self.course = create_course_from_json(self.user, make_course_json(modules=2, lessons=2))
+        self.lesson = LessonModel.objects.filter(course=self.course).first()
+        self.module_id = self.lesson.module_id
+
+    def test_owner_is_denormalized(self):
+        self.assertFalse(LessonModel.objects.filter(course=self.course).exclude(owner=self.user).exists())
+        self.assertFalse(HomeworkModel.objects.filter(module__course=self.course).exclude(owner=self.user).exists())
+
+    def test_course_list_uses_owner_created_index(self):
+        plan = CourseModel.objects.filter(owner=self.user).order_by("-created_at", "-id").explain()
+        self.assertIn("course_owner_created_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_lesson_ownership_check_has_no_join(self):
+        queryset = LessonModel.objects.filter(id=self.lesson.id, owner=self.user)
+        self.assertNotIn("JOIN", str(queryset.query))
+        self.assertIn("INTEGER PRIMARY KEY", queryset.explain())
+
+    def test_homework_lookup_uses_module_owner_index(self):
+        plan = HomeworkModel.objects.filter(module_id=self.module_id, owner=self.user).explain()
+        self.assertIn("homework_module_owner_idx", plan)
+
+    def test_lesson_prefetch_uses_module_position_index(self):
+        plan = LessonModel.objects.filter(module_id__in=[self.module_id]).order_by("position").explain()
+        self.assertIn("lesson_module_position_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
+class GenerationJobQueueTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="student", email="student@example.com", password="password123"
+        )
+        self.course = create_course_from_json(self.user, make_course_json(modules=1, lessons=1))
+        self.client.force_authenticate(self.user)
+
+    def enqueue(self, prompt="Python"):
+        return jobs.enqueue_job(self.user, GenerationJob.KIND_COURSE, {"prompt": prompt})
+
+    def test_invalid_ids_are_rejected(self):
+        for body in (
+            {"kind": "homework", "module_id": "x"},
+            {"kind": "lesson"},
+            {"kind": "warm_course", "course_id": -1},
+            {"kind": "unknown"},
+        ):
+            response = self.client.post("/courses/jobs/", body, format="json")
+            self.assertEqual(response.status_code, 400, body)
+        self.assertFalse(GenerationJob.objects.exists())
+
+    def test_foreign_module_is_not_found(self):
+        response = self.client.post("/courses/jobs/", {"kind": "homework", "module_id": 10**6}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+    def test_active_duplicate_is_not_enqueued_twice(self):
+        job, created = self.enqueue()
+        again, created_again = self.enqueue()
+        self.assertEqual((again.id, created, created_again), (job.id, True, False))
+
+        GenerationJob.objects.filter(id=job.id).update(status=GenerationJob.STATUS_DONE)
+        fresh, created = self.enqueue()
+        self.assertTrue(created)
+        self.assertNotEqual(fresh.id, job.id)
+
+    def test_claim_takes_oldest_queued_job_once(self):
+        first, _ = self.enqueue("Python")
+        second, _ = self.enqueue("Rust")
+
+        claimed = jobs.claim_next_job("worker-a")
+        self.assertEqual(claimed.id, first.id)
+        self.assertEqual((claimed.status, claimed.attempts, claimed.worker), ("running", 1, "worker-a"))
+        self.assertIsNotNone(claimed.heartbeat_at)
+        self.assertEqual(jobs.claim_next_job("worker-b").id, second.id)
+        self.assertIsNone(jobs.claim_next_job("worker-c"))
+
+    @override_settings(GENERATION_JOB_TIMEOUT=60, GENERATION_JOB_MAX_ATTEMPTS=2)
+    def test_only_jobs_without_heartbeat_are_requeued(self):
+        job, _ = self.enqueue()
+        jobs.claim_next_job("worker-a")
+        long_ago = timezone.now() - timedelta(minutes=10)
+
+        # Стартувало давно, але воркер досі б'є heartbeat — не чіпаємо
+        GenerationJob.objects.filter(id=job.id).update(started_at=long_ago)
+        jobs.heartbeat(job.id, progress=50)
+        self.assertEqual(jobs.requeue_stale_jobs(), (0, 0))
+
+        GenerationJob.objects.filter(id=job.id).update(heartbeat_at=long_ago)
+        self.assertEqual(jobs.requeue_stale_jobs(), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.progress), ("queued", "", 0))
+
+        jobs.claim_next_job("worker-b")
+        GenerationJob.objects.filter(id=job.id).update(heartbeat_at=long_ago)
+        self.assertEqual(jobs.requeue_stale_jobs(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ("failed", "Job timed out"))
+
+    def test_run_job_records_result_or_error(self):
+        ok, _ = self.enqueue("Python")
+        broken, _ = self.enqueue("Rust")
+        handlers = {GenerationJob.KIND_COURSE: lambda job: {"prompt": job.payload["prompt"]}}
+        with mock.patch.dict(jobs.JOB_HANDLERS, handlers):
+            jobs.run_job(jobs.claim_next_job("worker"))
+        with mock.patch.dict(jobs.JOB_HANDLERS, {GenerationJob.KIND_COURSE: mock.Mock(side_effect=ValueError("boom"))}):
+            jobs.run_job(jobs.claim_next_job("worker"))
+
+        ok.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertEqual((ok.status, ok.progress, ok.result), ("done", 100, {"prompt": "Python"}))
+        self.assertEqual((broken.status, broken.error), ("failed", "boom"))
+        self.assertIsNotNone(broken.finished_at)
+
+
+class WarmCourseTests(TransactionTestCase):
+    """warm_course генерує в потоках пулу зі своїми з'єднаннями — тож без обгортки в транзакцію."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="student", email="student@example.com", password="password123"
+        )
+        self.course = create_course_from_json(self.user, make_course_json(modules=2, lessons=2))
+
+    def fake_generate_lesson(self, lesson):
+        LessonModel.objects.filter(id=lesson.id).update(content="# Урок\nЗгенерований текст")
+
+    def fake_generate_homework(self, module, homework_obj):
+        if module.position == 2:
+            raise RuntimeError("LLM недоступний")
+        HomeworkModel.objects.filter(id=homework_obj.id).update(content="# ДЗ\nЗгенероване завдання")
+
+    def warm(self, **kwargs):
+        with mock.patch("Courses.views.generate_lesson_content", self.fake_generate_lesson), \
+                mock.patch("Courses.views.generate_homework_content", self.fake_generate_homework):
+            return jobs.warm_course(self.course.id, concurrency=2, **kwargs)
+
+    def test_generates_cold_content_and_reports_failures(self):
+        progress = []
+        result = self.warm(on_progress=lambda done, total: progress.append((done, total)))
+
+        self.assertEqual((result["generated"], result["failed"]), (5, 1))
+        self.assertEqual([done for done, _ in progress], [1, 2, 3, 4, 5, 6])
+        self.assertFalse(LessonModel.objects.filter(course=self.course, content="").exists())
+
+        # Повторний прогрів — лише те, що не вдалося
+        self.assertEqual(self.warm(), {"course_id": self.course.id, "generated": 0, "failed": 1})
+
+    def test_job_progress_refreshes_heartbeat(self):
+        job, _ = jobs.enqueue_job(self.user, GenerationJob.KIND_WARM_COURSE, {"course_id": self.course.id})
+        job = jobs.claim_next_job("worker")
+        long_ago = timezone.now() - timedelta(hours=1)
+        GenerationJob.objects.filter(id=job.id).update(heartbeat_at=long_ago)
+
+        with mock.patch("Courses.views.generate_lesson_content", self.fake_generate_lesson), \
+                mock.patch("Courses.views.generate_homework_content", self.fake_generate_homework):
+            jobs.run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result["generated"]), ("done", 5))
+        self.assertGreater(job.heartbeat_at, long_ago)
+
+
+@override_settings(LLM_CACHE_EVICT_INTERVAL=0)
+class LLMCacheTests(APITestCase):
+
+    def request(self, topic="Python basics", **overrides):
+        kwargs = dict(
+            model="test-model",
+            temperature=0.7,
+            messages=[
+                {"role": "system", "content": "You are a course architect."},
+                {"role": "user", "content": topic},
+            ],
+        )
+        kwargs.update(overrides)
+        return kwargs
+
+    def store(self, key, text="відповідь"):
+        llm_cache.store("course", key, llm_cache.completion_from_text("test-model", text))
+
+    def test_equivalent_requests_share_a_key(self):
+        key = llm_cache.make_cache_key(**self.request())
+        self.assertEqual(key, llm_cache.make_cache_key(**self.request("  Python   basics\n")))
+        self.assertNotEqual(key, llm_cache.make_cache_key(**self.request("PYTHON BASICS")))
+        self.assertEqual(key, llm_cache.make_cache_key(**self.request(), stream=True))
+        self.assertEqual(
+            llm_cache.make_cache_key(**self.request('{"topic": "Python",  "level": 1}')),
+            llm_cache.make_cache_key(**self.request('{"level": 1, "topic": "Python"}')),
+        )
+        self.assertNotEqual(key, llm_cache.make_cache_key(**self.request("Rust basics")))
+        self.assertNotEqual(key, llm_cache.make_cache_key(**self.request(temperature=0.2)))
+
+    def test_miss_then_hit_without_token_usage(self):
+        key = llm_cache.make_cache_key(**self.request())
+        self.assertIsNone(llm_cache.lookup("course", key))
+
+        self.store(key, "# Курс")
+        cached = llm_cache.lookup("course", key)
+        self.assertEqual(cached.choices[0].message.content, "# Курс")
+        self.assertEqual(cached.usage.total_tokens, 0)
+        self.assertEqual(LLMCacheEntry.objects.get(key=key).hits, 1)
+
+        # Повторний store — upsert того самого запису
+        self.store(key, "# Курс v2")
+        self.assertEqual(LLMCacheEntry.objects.count(), 1)
+        self.assertEqual(llm_cache.lookup("course", key).choices[0].message.content, "# Курс v2")
+
+    @override_settings(LLM_CACHE_TTL=60)
+    def test_expired_entry_is_a_miss(self):
+        self.store("expired")
+        LLMCacheEntry.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(llm_cache.lookup("course", "expired"))
+
+        # Наступний store прибирає прострочені записи
+        self.store("fresh")
+        self.assertEqual(list(LLMCacheEntry.objects.values_list("key", flat=True)), ["fresh"])
+
+    @override_settings(LLM_CACHE_MAX_ENTRIES=2)
+    def test_least_recently_used_entry_is_evicted(self):
+        self.store("a")
+        self.store("b")
+        LLMCacheEntry.objects.filter(key="a").update(last_used_at=timezone.now() - timedelta(minutes=5))
+        LLMCacheEntry.objects.filter(key="b").update(last_used_at=timezone.now() - timedelta(minutes=10))
+        llm_cache.lookup("course", "b")  # b щойно використали — тепер найстаріший a
+
+        self.store("c")
+        self.assertEqual(sorted(LLMCacheEntry.objects.values_list("key", flat=True)), ["b", "c"])
+
+    @override_settings(LLM_CACHE_EVICT_INTERVAL=60, LLM_CACHE_MAX_ENTRIES=1)
+    def test_eviction_runs_periodically(self):
+        with mock.patch.object(llm_cache, "_last_evict", float("-inf")):
+            self.store("a")
+            with self.assertNumQueries(1):  # лише upsert, без COUNT(*) і DELETE
+                self.store("b")
+            self.assertEqual(LLMCacheEntry.objects.count(), 2)
+
+            with mock.patch.object(llm_cache.time, "monotonic", return_value=llm_cache._last_evict + 60):
+                self.store("c")
+        self.assertEqual(list(LLMCacheEntry.objects.values_list("key", flat=True)), ["c"])
+
+
+class SingleFlightTests(TransactionTestCase):
+    """Паралельні запити на той самий урок роблять один LLM-виклик."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="student", email="student@example.com", password="password123"
+        )
+        self.course = create_course_from_json(self.user, make_course_json(modules=1, lessons=1))
+        self.lesson_id = LessonModel.objects.get(course=self.course).id
+        self.calls = 0
+
+    def fake_completion(self, endpoint, **kwargs):
+        self.calls += 1
+        time.sleep(0.5)
+        message = SimpleNamespace(content="# Урок\nЗгенерований текст")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def test_concurrent_generation_calls_llm_once(self):
+        results = []
+
+        def worker():
+            try:
+                lesson = LessonModel.objects.get(id=self.lesson_id)
+                results.append(generate_lesson_content(lesson))
+            finally:
+                connection.close()
+
+        with mock.patch("Courses.llm.chat_completion", self.fake_completion):
+            threads = [threading.Thread(target=worker) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ["# Урок\nЗгенерований текст"] * 4)
+        self.assertFalse(GenerationLease.objects.exists())
+
+    def test_lease_outlives_worst_case_leader(self):
+        retries = settings.LLM_MAX_RETRIES
+        lesson_worst = settings.LLM_TIMEOUTS["lesson"] * (retries + 1) + settings.LLM_RETRY_MAX_BACKOFF * retries
+        self.assertGreater(settings.SINGLE_FLIGHT_LEASE_TTL, lesson_worst)
+
+    @override_settings(SINGLE_FLIGHT_WAIT_TIMEOUT=0.3)
+    def test_wait_timeout_is_503_not_500(self):
+        GenerationLease.objects.create(
+            key=f"lesson:{self.lesson_id}", holder="busy-worker",
+            expires_at=timezone.now() + timedelta(minutes=5)
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch("Courses.llm.chat_completion", self.fake_completion):
+            response = client.get(f"/courses/lessons/{self.lesson_id}/")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response)
+        self.assertEqual(self.calls, 0)
+
+    def test_expired_lease_is_taken_over(self):
+        GenerationLease.objects.create(
+            key=f"lesson:{self.lesson_id}", holder="dead-worker",
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        with mock.patch("Courses.llm.chat_completion", self.fake_completion):
+            generate_lesson_content(LessonModel.objects.get(id=self.lesson_id))
+
+        self.assertEqual(self.calls, 1)
+        self.assertFalse(GenerationLease.objects.exists())
+
+
+@override_settings(LLM_RETRY_BACKOFF=0, LLM_MAX_RETRIES=2)
+class LLMGatewayTests(SimpleTestCase):
+
+    def setUp(self):
+        self.create = mock.Mock()
+        patches = [
+            mock.patch.object(llm, "get_backend", return_value=SimpleNamespace(create=self.create, model="m")),
+            mock.patch.object(llm, "breaker", llm.CircuitBreaker(failure_threshold=3, reset_timeout=60)),
+            mock.patch.object(llm, "metrics", llm.Metrics()),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def connection_error(self):
+        return openai.APIConnectionError(request=httpx.Request("POST", "https://openrouter.ai/api/v1"))
+
+    def test_retries_transient_errors(self):
+        self.create.side_effect = [self.connection_error(), self.connection_error(), "ok"]
+
+        self.assertEqual(llm.create("lesson", model="m", messages=[]), "ok")
+        self.assertEqual(self.create.call_count, 3)
+        stats = llm.metrics_snapshot()["endpoints"]["lesson"]
+        self.assertEqual((stats["calls"], stats["errors"], stats["retries"]), (3, 2, 2))
+
+    def test_circuit_opens_and_fails_fast(self):
+        self.create.side_effect = self.connection_error()
+
+        with self.assertRaises(openai.APIConnectionError):
+            llm.create("lesson", model="m", messages=[])
+        self.assertEqual(llm.breaker.state, "open")
+
+        with self.assertRaises(llm.LLMUnavailable):
+            llm.create("lesson", model="m", messages=[])
+        self.assertEqual(self.create.call_count, 3)
+
+
+STUB_BACKENDS = {"stub": {"BACKEND": "Courses.llm_backends.StubBackend", "LATENCY": 0, "JITTER": 0}}
+
+
+@override_settings(LLM_BACKEND="stub", LLM_BACKENDS=STUB_BACKENDS, TOKEN_LEDGER_FLUSH_INTERVAL=0)
+class StubBackendTests(APITestCase):
+    """Повний цикл курс -> урок -> ДЗ -> перевірка без мережі й ключа OpenRouter."""
+
+    def setUp(self):
+        # Відра лімітів живуть у кеші і пережили б попередні тести
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username="student", email="student@example.com", password="password123"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_generation_flow(self):
+        response = self.client.post("/courses/", {"prompt": "Rust"}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        course = CourseModel.objects.get(owner=self.user)
+        self.assertEqual(course.topic, "Rust")
+        self.assertEqual(LessonModel.objects.filter(course=course).count(), 20)
+
+        lesson = LessonModel.objects.filter(course=course).first()
+        response = self.client.get(f"/courses/lessons/{lesson.id}/")
+        self.assertTrue(response.data["content"].startswith(f"# {lesson.title}"))
+        self.assertIn('llm;dur=', response["Server-Timing"])
+
+        module_id = lesson.module_id
+        self.assertEqual(self.client.get(f"/courses/modules/{module_id}/generate_homework/").status_code, 200)
+
+        # Stub генерує до ДЗ автотести "сума двох чисел"
+        self.assertEqual(len(HomeworkModel.objects.get(module_id=module_id).test_cases), 3)
+        solution = "a, b = map(int, input().split())\nprint(a + b)"
+        response = self.client.post(f"/teacher/homeworks/{module_id}/check/", {"submission": solution}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        if sandbox.is_available():
+            self.assertTrue(all(case["passed"] for case in response.data["tests"]))
+            self.assertIn(response.data["grade"], range(70, 101))
+
+        usage = {row.endpoint: row for row in DailyTokenUsage.objects.filter(user=self.user)}
+        self.assertEqual(sorted(usage), ["course", "homework", "homework_tests", "lesson", "review"])
+        self.assertTrue(all(row.calls == 1 and row.total_tokens > 0 for row in usage.values()))
+        self.assertEqual(ChatPrompt.objects.get().user, self.user)
+
+    def test_stream_records_usage(self):
+        course = create_course_from_json(self.user, make_course_json(modules=1, lessons=1))
+        lesson = LessonModel.objects.get(course=course)
+
+        response = self.client.get(f"/courses/lessons/{lesson.id}/stream/")
+        b"".join(response.streaming_content)
+
+        entry = TokenTransaction.objects.get(user=self.user)
+        self.assertEqual(entry.endpoint, "lesson")
+        self.assertGreater(entry.output_tokens, 0)
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0)
+    def test_stream_is_timed_to_the_last_chunk(self):
+        course = create_course_from_json(self.user, make_course_json(modules=1, lessons=1))
+        lesson = LessonModel.objects.get(course=course)
+
+        with self.assertNoLogs("Backend.middleware", "WARNING"):
+            response = self.client.get(f"/courses/lessons/{lesson.id}/stream/")
+        with self.assertLogs("Backend.middleware", "WARNING") as logs:
+            body = b"".join(response.streaming_content)
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record["response_bytes"], len(body))
+        self.assertEqual(record["llm_calls"], 1)
+        self.assertGreater(record["db_queries"], 0)
+
+    def test_disconnected_stream_records_partial_usage(self):
+        course = create_course_from_json(self.user, make_course_json(modules=1, lessons=1))
+        lesson = LessonModel.objects.get(course=course)
+
+        # Напряму, без test client: його обгортка стріму сама закриває відповідь
+        request = APIRequestFactory().get(f"/courses/lessons/{lesson.id}/stream/")
+        force_authenticate(request, self.user)
+        response = StreamLessonAPIView.as_view()(request, lesson_id=lesson.id)
+        chunks = iter(response.streaming_content)
+        next(chunks), next(chunks)  # meta + перший шматок уроку
+        # Клієнт закрив вкладку. close_old_connections закрив би БД тесту, що йде в транзакції
+        request_finished.disconnect(close_old_connections)
+        try:
+            response.close()
+        finally:
+            request_finished.connect(close_old_connections)
+
+        entry = TokenTransaction.objects.get(user=self.user)
+        self.assertEqual(entry.endpoint, "lesson")
+        self.assertGreater(entry.input_tokens, 0)
+        self.assertGreater(entry.output_tokens, 0)
+        self.assertEqual(LessonModel.objects.get(id=lesson.id).content, "")
+
+
+def bearer(user):
+    return {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+
+
+@override_settings(LLM_BACKEND="stub", LLM_BACKENDS=STUB_BACKENDS, TOKEN_LEDGER_FLUSH_INTERVAL=0)
+class AsyncViewTests(TransactionTestCase):
+    """ASGI-в'юхи з Courses/async_views.py: JWT, 404, 429 і генерація через stub."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username="student", email="student@example.com", password="password123"
+        )
+        self.headers = bearer(self.user)
+        course = create_course_from_json(self.user, make_course_json(modules=1, lessons=1))
+        self.lesson = LessonModel.objects.get(course=course)
+        self.module = ModuleModel.objects.get(course=course)
+
+    async def test_requests_without_token_are_unauthorized(self):
+        for method, url in (
+            ("post", "/courses/async/"),
+            ("get", f"/courses/async/lessons/{self.lesson.id}/"),
+            ("get", f"/courses/async/modules/{self.module.id}/generate_homework/"),
+        ):
+            response = await getattr(self.async_client, method)(url)
+            self.assertEqual(response.status_code, 401, url)
+
+    async def test_course_generation(self):
+        response = await self.async_client.post(
+            "/courses/async/", {"prompt": "Rust", "warm": False},
+            content_type="application/json", headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()["meta"]["topic"], "Rust")
+        self.assertTrue(await CourseModel.objects.filter(owner=self.user, topic="Rust").aexists())
+        self.assertGreater((await ChatPrompt.objects.aget(user=self.user)).total_tokens, 0)
+
+    async def test_course_prompt_is_required(self):
+        response = await self.async_client.post(
+            "/courses/async/", {}, content_type="application/json", headers=self.headers
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(RATE_LIMITS={"course": {"capacity": 1, "per_minute": 1}})
+    async def test_course_generation_is_throttled(self):
+        for _ in range(2):
+            response = await self.async_client.post(
+                "/courses/async/", {"prompt": "Rust", "warm": False},
+                content_type="application/json", headers=self.headers,
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(int(response["Retry-After"]) > 0)
+        self.assertEqual(await ChatPrompt.objects.acount(), 1)
+
+    async def test_lesson_generation(self):
+        response = await self.async_client.get(f"/courses/async/lessons/{self.lesson.id}/", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["order_id"], 1)
+        self.assertTrue(response.json()["content"].startswith(f"# {self.lesson.title}"))
+        self.assertEqual((await LessonModel.objects.aget(id=self.lesson.id)).content, response.json()["content"])
+
+    async def test_foreign_lesson_is_not_found(self):
+        other = await CustomUser.objects.acreate(username="other", email="other@example.com")
+        response = await self.async_client.get(f"/courses/async/lessons/{self.lesson.id}/", headers=bearer(other))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(RATE_LIMITS={"lesson": {"capacity": 1, "per_minute": 1}})
+    async def test_lesson_generation_is_throttled(self):
+        await LessonModel.objects.filter(id=self.lesson.id).aupdate(content="")
+        await self.async_client.get(f"/courses/async/lessons/{self.lesson.id}/", headers=self.headers)
+        await LessonModel.objects.filter(id=self.lesson.id).aupdate(content="")
+        response = await self.async_client.get(f"/courses/async/lessons/{self.lesson.id}/", headers=self.headers)
+        self.assertEqual(response.status_code, 429)
+
+    async def test_generation_in_progress_is_503(self):
+        with mock.patch("Courses.async_views.arun_single_flight", side_effect=SingleFlightTimeout):
+            response = await self.async_client.get(f"/courses/async/lessons/{self.lesson.id}/", headers=self.headers)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], str(SingleFlightTimeout.retry_after))
+
+    async def test_homework_generation(self):
+        url = f"/courses/async/modules/{self.module.id}/generate_homework/"
+        response = await self.async_client.get(url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        homework = await HomeworkModel.objects.aget(module_id=self.module.id)
+        self.assertEqual(response.json(), homework.content)
+        self.assertEqual(len(homework.test_cases), 3)
+
+    async def test_foreign_module_is_not_found(self):
+        response = await self.async_client.get(
+            f"/courses/async/modules/{self.module.id + 1}/generate_homework/", headers=self.headers
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(RATE_LIMITS={"homework": {"capacity": 1, "per_minute": 1}})
+    async def test_homework_generation_is_throttled(self):
+        url = f"/courses/async/modules/{self.module.id}/generate_homework/"
+        await self.async_client.get(url, headers=self.headers)
+        await HomeworkModel.objects.filter(module_id=self.module.id).aupdate(content="")
+        response = await self.async_client.get(url, headers=self.headers)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual((await HomeworkModel.objects.aget(module_id=self.module.id)).content, "")
@@ -1,12 +1,23 @@
 # courses/urls.py
 from django.urls import path
-from .views import ChatAPIView, GetCourseAPIView, GenerateLessonAPIView, GenerateHomeworkAPIView
+from .views import ChatAPIView, GetCourseAPIView, GenerateLessonAPIView, GenerateHomeworkAPIView, StreamLessonAPIView, GenerationJobAPIView, LLMCacheStatsAPIView, LLMMetricsAPIView
+from .async_views import AsyncChatAPIView, AsyncGenerateLessonAPIView, AsyncGenerateHomeworkAPIView
 
 urlpatterns = [
     path('', ChatAPIView.as_view(), name='generate_course'),
     path('<int:course_id>/', GetCourseAPIView.as_view()),
     path("lessons/<int:lesson_id>/", GenerateLessonAPIView.as_view()),
+    path("lessons/<int:lesson_id>/stream/", StreamLessonAPIView.as_view()),
     path("modules/<module_id>/generate_homework/", GenerateHomeworkAPIView.as_view()),
+    path("jobs/", GenerationJobAPIView.as_view()),
+    path("jobs/<int:job_id>/", GenerationJobAPIView.as_view()),
+    path("llm-cache/stats/", LLMCacheStatsAPIView.as_view()),
+    path("llm/metrics/", LLMMetricsAPIView.as_view()),
+
+    # ASGI (uvicorn/daphne + Backend.asgi): не тримають потік, поки чекаємо LLM
+    path("async/", AsyncChatAPIView.as_view()),
+    path("async/lessons/<int:lesson_id>/", AsyncGenerateLessonAPIView.as_view()),
+    path("async/modules/<int:module_id>/generate_homework/", AsyncGenerateHomeworkAPIView.as_view()),
     
 
 ]
@@ -1,28 +1,255 @@
-import os
-from pathlib import Path
-from dotenv import load_dotenv
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from openai import OpenAI
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+import base64
+import hashlib
 import json
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
 from django.db import transaction
-
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from Auth import token_ledger
+from Auth.throttling import enforce_generation_limits
+from Backend import tracing
 from .models import *
-from .serializers import ChatPromptSerializer
+from .serializers import (
+    ChatPromptSerializer,
+    CourseSummarySerializer,
+    CourseTreeSerializer,
+    GenerationJobSerializer,
+    GenerationJobRequestSerializer,
+    prefetch_course_tree,
+)
+from .jobs import enqueue_job
+from . import llm, llm_cache
+from .singleflight import SingleFlight, SingleFlightTimeout, run_single_flight
 
-# Load .env
-env_path = Path(__file__).resolve().parent.parent / '.env'
-load_dotenv(dotenv_path=env_path)
-api_key = os.environ.get("OPENROUTER_API_KEY")
+logger = logging.getLogger(__name__)
 
-if not api_key:
-    raise ValueError("OpenRouter API key not found.")
 
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=api_key,
-)
+COURSE_SYSTEM_PROMPT = """
+You are a Lead Technical Educator.
+Your goal is to design a high-quality, pragmatic curriculum based on the User's Request.
+
+OUTPUT MUST BE VALID JSON IN UKRAINIAN.
+
+INPUT FORMAT (JSON):
+{ "topic": "string" }
+
+OUTPUT FORMAT (strict JSON, Ukrainian only):
+{
+    "meta": { "topic": "Course Name (Concise & Professional)" },
+    "modules": [
+        {
+            "title": "Module Title",
+            "homework_topic": "Task title",
+            "lessons": [
+                { "title": "Lesson Title", "type": "lecture" }
+            ]
+        }
+    ]
+}
+
+LOGIC & ADAPTIVITY:
+1. ANALYZE THE REQUEST: 
+   - If user asks for "Basics" or generic "Python", cover fundamentals (Types, Loops, Functions) but with professional context.
+   - If user asks for "Advanced", go deep (Memory, Concurrency, Architecture).
+   - If specific (e.g., "Django"), focus only on that.
+2. NO MARKETING FLUFF: Avoid "Welcome to the world of...", "Magic of code". Be dry and technical.
+3. STRUCTURE: Logical progression. From simple to complex.
+4. ACTION ORIENTED: Lesson titles should sound like skills (e.g., "Working with Strings" instead of "What is a String").
+
+RULES:
+1. Topic: IT related only.
+2. Structure: Minimum 5 modules.
+3. Lessons: 3-5 per module.
+4. Language: Ukrainian ONLY.
+5. Output: JSON only.
+"""
+
+HOMEWORK_SYSTEM_PROMPT = """
+You are a strict technical mentor. Generate a practical homework task in Ukrainian using Markdown.
+
+STRICT CONSTRAINTS:
+1. SCOPE LIMIT: You must ONLY use concepts and tools explicitly mentioned in the 'lessons_list'.
+2. NO ASSUMPTIONS: Do NOT assume the student knows functions, loops, or input if those words are not in 'lessons_list'.
+3. EXAMPLE: If lessons are about "Print", the task must ONLY involve printing. Do NOT ask for "Input".
+4. Focus strictly on 'homework_focus' topic but limit implementation details to 'lessons_list'.
+
+OUTPUT STRUCTURE:
+# Домашнє завдання
+## Завдання
+...
+**Критерії:**
+...
+"""
+
+LESSON_SYSTEM_PROMPT = """
+You are an expert educator. Generate a detailed lesson in Ukrainian using Markdown.
+Structure:
+- # Title
+- ## Sections
+- **Key terms**
+- Code blocks (if IT related)
+"""
+
+HOMEWORK_TESTS_SYSTEM_PROMPT = """
+You write automated tests for a Python homework task.
+The student's program reads stdin and prints to stdout.
+
+OUTPUT JSON FORMAT:
+{"cases": [{"input": "stdin text", "expected_output": "exact stdout of a correct solution"}]}
+
+RULES:
+1. 3-8 cases, from a simple one to edge cases, strictly within the task.
+2. If the program takes no input, use "" as input.
+3. If the task cannot be checked by exact stdout (free-form text, drawing, randomness), return {"cases": []}.
+"""
+
+
+def build_course_messages(user_input):
+    return [
+        {"role": "system", "content": COURSE_SYSTEM_PROMPT},
+        {"role": "user", "content": json.dumps({"topic": user_input})}
+    ]
+
+
+def build_homework_messages(module, homework_obj):
+    lessons_titles = [l.title for l in module.lessons.all()]
+
+    payload = {
+        "course_topic": module.course.topic,
+        "module_title": module.title,
+        "homework_focus": homework_obj.title,
+        "lessons_list": lessons_titles
+    }
+    return [
+        {"role": "system", "content": HOMEWORK_SYSTEM_PROMPT},
+        {"role": "user", "content": json.dumps(payload, ensure_ascii=False)}
+    ]
+
+
+def build_homework_tests_messages(homework_obj):
+    return [
+        {"role": "system", "content": HOMEWORK_TESTS_SYSTEM_PROMPT},
+        {"role": "user", "content": json.dumps({"task_description": homework_obj.content}, ensure_ascii=False)}
+    ]
+
+
+def mentions_python(*texts):
+    """Автотести і перевірка синтаксису — лише для Python-курсів."""
+    return any("python" in (text or "").casefold() for text in texts)
+
+
+def should_generate_tests(module, homework_obj):
+    return settings.HOMEWORK_TESTS_ENABLED and mentions_python(module.course.topic, homework_obj.content)
+
+
+def parse_test_cases(text):
+    """Відповідь LLM -> [{"input", "expected_output"}]; все некоректне відкидаємо."""
+    cases = safe_json_parse(text).get("cases", [])
+    if not isinstance(cases, list):
+        return []
+    return [
+        {"input": case["input"], "expected_output": case["expected_output"]}
+        for case in cases
+        if isinstance(case, dict)
+        and isinstance(case.get("input"), str)
+        and isinstance(case.get("expected_output"), str)
+    ][:settings.HOMEWORK_TESTS_MAX_CASES]
+
+
+def build_lesson_messages(lesson):
+    payload = {
+        "lesson_type": lesson.type,
+        "lesson_title": lesson.title,
+        "course_topic": lesson.module.course.topic
+    }
+    return [
+        {"role": "system", "content": LESSON_SYSTEM_PROMPT},
+        {"role": "user", "content": json.dumps(payload, ensure_ascii=False)}
+    ]
+
+
+def parse_bool(value):
+    return str(value).lower() in ("1", "true", "yes", "on")
+
+
+def encode_cursor(course):
+    raw = f"{course.created_at.isoformat()}|{course.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, course_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(course_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def count_subquery(model):
+    """COUNT(*) дочірніх рядків курсу підзапитом — без JOIN-ів модулі x уроки."""
+    return Coalesce(
+        Subquery(
+            model.objects
+            .filter(course=OuterRef("pk"))
+            .order_by()
+            .values("course")
+            .annotate(count=Count("id"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+def has_conditional_headers(request):
+    return "HTTP_IF_NONE_MATCH" in request.META or "HTTP_IF_MODIFIED_SINCE" in request.META
+
+
+def make_etag(*parts):
+    raw = "|".join(str(part) for part in parts)
+    return quote_etag(hashlib.sha1(raw.encode("utf-8")).hexdigest())
+
+
+def not_modified(request, etag, last_modified):
+    """304, якщо в клієнта вже ця версія (If-None-Match / If-Modified-Since), інакше None."""
+    return get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp())
+    )
+
+
+def set_cache_headers(response, etag, last_modified, max_age=0):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified.timestamp())
+    if max_age:
+        patch_cache_control(response, private=True, max_age=max_age)
+    else:
+        # Кешувати можна, але кожен раз перепитувати (дешевий 304)
+        patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["Authorization"])
+    return response
+
+
+def course_list_version(fields, versions):
+    """versions — [(id, updated_at), ...] курсів сторінки (+1 наступний)."""
+    etag = make_etag("courses", fields, *(f"{course_id}:{updated_at.isoformat()}" for course_id, updated_at in versions))
+    last_modified = max((updated_at for _, updated_at in versions), default=datetime(2000, 1, 1, tzinfo=dt_timezone.utc))
+    return etag, last_modified
+
+
+def lesson_version(lesson_id, position, updated_at):
+    return make_etag("lesson", lesson_id, position, updated_at.isoformat()), updated_at
 
 
 def safe_json_parse(text):
@@ -50,37 +277,209 @@ def create_course_from_json(user, course_json):
     topic = course_json["meta"]["topic"]
     modules_data = course_json["modules"]
 
+    # Три пакетні INSERT-и (модулі, ДЗ, уроки) замість одного на кожен рядок:
+    # менше round-trip-ів, і SQLite тримає write-lock значно менше.
+    modules = [
+        ModuleModel(title=module_data.get("title", "Модуль"), position=index)
+        for index, module_data in enumerate(modules_data, start=1)
+    ]
+
     with transaction.atomic():
         course = CourseModel.objects.create(topic=topic, owner=user)
 
-        for module_data in modules_data:
-            module = ModuleModel.objects.create(
-                title=module_data.get("title", "Модуль"),
-                course=course
-            )
-            
-            hw_topic = module_data.get("homework_topic", f"ДЗ: {module.title}")
-            
-            HomeworkModel.objects.create(
-                module=module,
-                title=hw_topic, 
-                content="" 
-            )
+        for module in modules:
+            module.course = course
+        ModuleModel.objects.bulk_create(modules)
 
+        homeworks = []
+        lessons = []
+        for module, module_data in zip(modules, modules_data):
+            homeworks.append(HomeworkModel(
+                module=module,
+                owner=user,
+                title=module_data.get("homework_topic", f"ДЗ: {module.title}"),
+                content=""
+            ))
             for lesson_data in module_data.get("lessons", []):
-                LessonModel.objects.create(
+                lessons.append(LessonModel(
                     module=module,
+                    course=course,
+                    owner=user,
+                    position=len(lessons) + 1,
                     title=lesson_data.get("title", "Урок"),
                     type=lesson_data.get("type", "lecture"),
-                )
+                ))
+
+        HomeworkModel.objects.bulk_create(homeworks)
+        LessonModel.objects.bulk_create(lessons)
 
     return course
 
 
+# *_request: параметри LLM-запитів, спільні для sync- і async-в'юх (Courses/async_views.py)
+def course_request(user, user_input):
+    return dict(
+        user_id=user.id,
+        temperature=0.7,
+        max_tokens=4000,
+        response_format={ "type": "json_object" },
+        messages=build_course_messages(user_input)
+    )
+
+
+def lesson_request(lesson):
+    return dict(
+        user_id=lesson.owner_id,
+        temperature=0.7,
+        max_tokens=4000,
+        messages=build_lesson_messages(lesson)
+    )
+
+
+def homework_request(module, homework_obj):
+    return dict(
+        user_id=module.course.owner_id,
+        temperature=0.5,
+        messages=build_homework_messages(module, homework_obj)
+    )
+
+
+def homework_tests_request(module, homework_obj):
+    return dict(
+        user_id=module.course.owner_id,
+        temperature=0.2,
+        response_format={"type": "json_object"},
+        messages=build_homework_tests_messages(homework_obj)
+    )
+
+
+def generate_course(user, user_input):
+    """
+    Генерує структуру курсу через LLM і одразу зберігає її в БД.
+    Повертає (parsed_json, course).
+    """
+    chat_entry = ChatPrompt.objects.create(user=user, user_input=user_input)
+    response = llm.chat_completion("course", **course_request(user, user_input))
+    return save_generated_course(user, chat_entry, response)
+
+
+def save_generated_course(user, chat_entry, response):
+    """Відповідь LLM і токени — в ChatPrompt, структуру курсу — в БД. Повертає (parsed_json, course)."""
+    model_output = response.choices[0].message.content
+    usage = response.usage
+
+    chat_entry.model_response = model_output
+    chat_entry.input_tokens = getattr(usage, "prompt_tokens", 0)
+    chat_entry.output_tokens = getattr(usage, "completion_tokens", 0)
+    chat_entry.total_tokens = getattr(usage, "total_tokens", 0)
+    chat_entry.save()
+
+    parsed = safe_json_parse(model_output)
+    course = create_course_from_json(user, parsed)
+    return parsed, course
+
+
+def warm_up_if_requested(user, data, parsed, course):
+    """"Прогрів": уроки та ДЗ генеруються у фоні, поки юзер дивиться на структуру."""
+    if parse_bool(data.get("warm", settings.COURSE_WARMUP_DEFAULT)):
+        warm_job, _ = enqueue_job(user, GenerationJob.KIND_WARM_COURSE, {"course_id": course.id})
+        parsed["warmup_job_id"] = warm_job.id
+
+
+def lesson_flight_key(lesson_id):
+    return f"lesson:{lesson_id}"
+
+
+def homework_flight_key(module_id):
+    return f"homework:{module_id}"
+
+
+def fetch_generated_lesson(lesson):
+    """Перечитує урок з БД; якщо його вже хтось згенерував — оновлює lesson і повертає текст."""
+    row = LessonModel.objects.filter(id=lesson.id).values("content", "updated_at").first()
+    if row and row["content"] and len(row["content"]) > 10:
+        lesson.content, lesson.updated_at = row["content"], row["updated_at"]
+        return lesson.content
+    return None
+
+
+def fetch_generated_homework(module, homework_obj):
+    """Те саме для ДЗ модуля: підтягує id/текст, які міг зберегти інший запит."""
+    row = HomeworkModel.objects.filter(module_id=module.id).values("id", "content").first()
+    if row and row["content"] and len(row["content"]) > 10:
+        homework_obj.pk, homework_obj.content = row["id"], row["content"]
+        return homework_obj.content
+    return None
+
+
+def generation_in_progress_response(error, make_response=Response):
+    """
+    Чужа генерація йде довше, ніж ми готові чекати — це не збій: 503 + Retry-After.
+    make_response — Response для DRF-в'юх, json_response для async.
+    """
+    response = make_response(
+        {"error": "Generation is still in progress. Try again later."},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+    response["Retry-After"] = str(error.retry_after)
+    return response
+
+
+def generate_lesson_content(lesson):
+    """
+    Генерує Markdown уроку і зберігає його в lesson.content.
+    Паралельні виклики для того самого уроку чекають на один LLM-запит.
+    """
+    def produce():
+        response = llm.chat_completion("lesson", **lesson_request(lesson))
+
+        lesson.content = response.choices[0].message.content
+        lesson.save()
+        return lesson.content
+
+    return run_single_flight(
+        lesson_flight_key(lesson.id), produce, lambda: fetch_generated_lesson(lesson)
+    )
+
+
+def generate_homework_tests(module, homework_obj):
+    """Набір тестів до ДЗ (Teacher/sandbox.py). Тести — бонус: помилка не ламає генерацію ДЗ."""
+    try:
+        response = llm.chat_completion("homework_tests", **homework_tests_request(module, homework_obj))
+        return parse_test_cases(response.choices[0].message.content)
+    except Exception:
+        logger.exception("Test generation failed for module %s", module.id)
+        return []
+
+
+def save_homework(module, homework_obj):
+    homework_obj.save()
+    # ДЗ входить у дерево курсу — нова версія для ETag
+    CourseModel.touch(module.course_id)
+
+
+def generate_homework_content(module, homework_obj):
+    """Генерує Markdown ДЗ модуля і зберігає його в homework_obj.content (теж single-flight)."""
+    def produce():
+        response = llm.chat_completion("homework", **homework_request(module, homework_obj))
+
+        homework_obj.content = response.choices[0].message.content
+        if should_generate_tests(module, homework_obj):
+            homework_obj.test_cases = generate_homework_tests(module, homework_obj)
+        save_homework(module, homework_obj)
+        return homework_obj.content
+
+    return run_single_flight(
+        homework_flight_key(module.id), produce, lambda: fetch_generated_homework(module, homework_obj)
+    )
+
+
 class ChatAPIView(APIView):
     """
     POST endpoint to generate a course structure.
-    No limits, no economy. Pure creation.
+    Limited per user (RATE_LIMITS["course"], DAILY_TOKEN_QUOTA) — 429 + Retry-After.
+    Body: { "prompt": "...", "warm": true } — warm (optional) queues
+    background generation of every lesson and homework of the new course.
     """
 
     def post(self, request):
@@ -93,126 +492,97 @@ class ChatAPIView(APIView):
         if not user_input:
             return Response({"error": "Prompt is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        chat_entry = ChatPrompt.objects.create(user_input=user_input)
+        enforce_generation_limits(user, "course")
 
         try:
-            response = client.chat.completions.create(
-                model="openai/gpt-4o-mini",  # Або gpt-3.5-turbo, якщо економиш
-                temperature=0.7,
-                max_tokens=4000, 
-                response_format={ "type": "json_object" }, 
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """
-You are a Lead Technical Educator.
-Your goal is to design a high-quality, pragmatic curriculum based on the User's Request.
-
-OUTPUT MUST BE VALID JSON IN UKRAINIAN.
-
-INPUT FORMAT (JSON):
-{ "topic": "string" }
-
-OUTPUT FORMAT (strict JSON, Ukrainian only):
-{
-    "meta": { "topic": "Course Name (Concise & Professional)" },
-    "modules": [
-        {
-            "title": "Module Title",
-            "homework_topic": "Task title",
-            "lessons": [
-                { "title": "Lesson Title", "type": "lecture" }
-            ]
-        }
-    ]
-}
-
-LOGIC & ADAPTIVITY:
-1. ANALYZE THE REQUEST: 
-   - If user asks for "Basics" or generic "Python", cover fundamentals (Types, Loops, Functions) but with professional context.
-   - If user asks for "Advanced", go deep (Memory, Concurrency, Architecture).
-   - If specific (e.g., "Django"), focus only on that.
-2. NO MARKETING FLUFF: Avoid "Welcome to the world of...", "Magic of code". Be dry and technical.
-3. STRUCTURE: Logical progression. From simple to complex.
-4. ACTION ORIENTED: Lesson titles should sound like skills (e.g., "Working with Strings" instead of "What is a String").
-
-RULES:
-1. Topic: IT related only.
-2. Structure: Minimum 5 modules.
-3. Lessons: 3-5 per module.
-4. Language: Ukrainian ONLY.
-5. Output: JSON only.
-                        """
-                    },
-                    {"role": "user", "content": json.dumps({"topic": user_input})}
-                ]
-            )
-
-            model_output = response.choices[0].message.content
-            usage = response.usage
-
-            chat_entry.model_response = model_output
-            chat_entry.input_tokens = getattr(usage, "prompt_tokens", 0)
-            chat_entry.output_tokens = getattr(usage, "completion_tokens", 0)
-            chat_entry.total_tokens = getattr(usage, "total_tokens", 0)
-            chat_entry.save()
-            
-
-            parsed = safe_json_parse(model_output)
-            create_course_from_json(request.user, parsed)
-
+            parsed, course = generate_course(request.user, user_input)
+            warm_up_if_requested(user, request.data, parsed, course)
             return Response(parsed, status=status.HTTP_200_OK)
 
         except Exception as e:
-            print(f"ERROR: {str(e)}")
+            logger.exception("Course generation failed for user %s", user.id)
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def get(self, request):
+        """
+        GET /courses/?fields=summary|full
+        Курси юзера від нових до старих — масивом, як і раніше.
+        summary — без модулів/уроків, лише лічильники; full — з деревом курсу.
+        Вміст уроків (content) не читається з БД у жодному режимі.
+
+        Сторінки — за бажанням клієнта: з ?limit= чи ?cursor= відповідь
+        {"results": [...], "next_cursor": ...} (курсор по created_at).
+        """
         user = request.user
         if not user.is_authenticated:
             return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
 
+        fields = request.query_params.get("fields", "full")
+        if fields not in ("summary", "full"):
+            return Response({"error": "fields must be summary or full"}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginate = "limit" in request.query_params or "cursor" in request.query_params
+        limit = None
+        if paginate:
+            try:
+                limit = int(request.query_params.get("limit", settings.COURSE_LIST_PAGE_SIZE))
+            except ValueError:
+                return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            limit = max(1, min(limit, settings.COURSE_LIST_MAX_PAGE_SIZE))
+
         courses = (
             CourseModel.objects
             .filter(owner=user)
-            .prefetch_related("modules__lessons", "modules__homeworks")
-            .order_by('-created_at')
+            .only("id", "topic", "created_at", "updated_at")
+            .order_by('-created_at', '-id')
         )
 
-        data = []
-        for course in courses:
-            course_data = {
-                "id": course.id,
-                "topic": course.topic,
-                "modules": []
-            }
-            
-            global_lesson_index = 1 
-
-            for module in course.modules.all():
-                hw_obj = module.homeworks.first() 
-                homework_content = hw_obj.content if hw_obj else ""
-                
-                lessons_data = []
-                for lesson in module.lessons.all():
-                    lessons_data.append({
-                        "id": lesson.id,
-                        "order_id": global_lesson_index,
-                        "title": lesson.title,
-                        "type": lesson.type
-                    })
-                    global_lesson_index += 1
-
-                module_data = {
-                    "id": module.id,
-                    "title": module.title,
-                    "homework": homework_content, 
-                    "lessons": lessons_data
-                }
-                course_data["modules"].append(module_data)
-            data.append(course_data)
-
-        return Response(data, status=status.HTTP_200_OK)
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            try:
+                created_at, course_id = decode_cursor(cursor)
+            except ValueError:
+                return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+            courses = courses.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=course_id)
+            )
+
+        # Клієнт вже має якусь версію — перевіряємо її одним легким запитом
+        if has_conditional_headers(request):
+            versions = courses.values_list("id", "updated_at")
+            versions = list(versions[:limit + 1] if paginate else versions)
+            etag, last_modified = course_list_version(fields, versions)
+            cached = not_modified(request, etag, last_modified)
+            if cached:
+                return set_cache_headers(cached, etag, last_modified)
+
+        if fields == "summary":
+            courses = courses.annotate(
+                modules_count=count_subquery(ModuleModel),
+                lessons_count=count_subquery(LessonModel),
+            )
+            serializer_class = CourseSummarySerializer
+        else:
+            courses = prefetch_course_tree(courses)
+            serializer_class = CourseTreeSerializer
+
+        if not paginate:
+            page = list(courses)
+            etag, last_modified = course_list_version(fields, [(c.id, c.updated_at) for c in page])
+            with tracing.span("serialize"):
+                data = serializer_class(page, many=True).data
+            return set_cache_headers(Response(data, status=status.HTTP_200_OK), etag, last_modified)
+
+        # +1 запис, щоб знати, чи є наступна сторінка
+        page = list(courses[:limit + 1])
+        etag, last_modified = course_list_version(fields, [(c.id, c.updated_at) for c in page])
+        next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+        page = page[:limit]
+
+        with tracing.span("serialize"):
+            data = serializer_class(page, many=True).data
+        response = Response({"results": data, "next_cursor": next_cursor}, status=status.HTTP_200_OK)
+        return set_cache_headers(response, etag, last_modified)
 
 
 class GetCourseAPIView(APIView):
@@ -222,45 +592,32 @@ class GetCourseAPIView(APIView):
             return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
 
         if course_id:
-            course = (
+            if has_conditional_headers(request):
+                updated_at = (
+                    CourseModel.objects
+                    .filter(id=course_id, owner=user)
+                    .values_list("updated_at", flat=True)
+                    .first()
+                )
+                if updated_at:
+                    etag = make_etag("course", course_id, updated_at.isoformat())
+                    cached = not_modified(request, etag, updated_at)
+                    if cached:
+                        return set_cache_headers(cached, etag, updated_at)
+
+            course = prefetch_course_tree(
                 CourseModel.objects
                 .filter(id=course_id, owner=user)
-                .prefetch_related("modules__lessons", "modules__homeworks")
-                .first()
-            )
+                .only("id", "topic", "created_at", "updated_at")
+            ).first()
             if not course:
                 return Response({"error": "Course not found"}, status=status.HTTP_404_NOT_FOUND)
-            
-            modules_result = []
-            global_lesson_index = 1
-
-            for m in course.modules.all():
-                hw_obj = m.homeworks.first()
-                hw_content = hw_obj.content if hw_obj else ""
-                
-                lessons_result = []
-                for l in m.lessons.all():
-                    lessons_result.append({
-                        "id": l.id, 
-                        "order_id": global_lesson_index,
-                        "title": l.title, 
-                        "type": l.type
-                    })
-                    global_lesson_index += 1
-
-                modules_result.append({
-                    "id": m.id,
-                    "title": m.title,
-                    "homework": hw_content,
-                    "lessons": lessons_result
-                })
-
-            result = {
-                "id": course.id,
-                "topic": course.topic,
-                "modules": modules_result
-            }
-            return Response(result, status=status.HTTP_200_OK)
+
+            with tracing.span("serialize"):
+                data = CourseTreeSerializer(course).data
+            response = Response(data, status=status.HTTP_200_OK)
+            etag = make_etag("course", course.id, course.updated_at.isoformat())
+            return set_cache_headers(response, etag, course.updated_at)
         else:
             return Response({"error": "ID required"}, status=status.HTTP_400_BAD_REQUEST)
         
@@ -289,6 +646,15 @@ class GetCourseAPIView(APIView):
         )
 
 
+def get_owned_lesson(user, lesson_id):
+    return (
+        LessonModel.objects
+        .filter(id=lesson_id, owner=user)
+        .select_related("module__course")
+        .first()
+    )
+
+
 class GenerateLessonAPIView(APIView):
     """
     GET /lessons/<lesson_id>/generate/
@@ -300,84 +666,205 @@ class GenerateLessonAPIView(APIView):
         if not user.is_authenticated:
             return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
 
+        # 0. Згенерований урок не змінюється — якщо він вже є в клієнта, віддаємо 304
+        if has_conditional_headers(request):
+            version = (
+                LessonModel.objects
+                .filter(id=lesson_id, owner=user)
+                .values_list("id", "position", "updated_at")
+                .first()
+            )
+            if version:
+                etag, last_modified = lesson_version(*version)
+                cached = not_modified(request, etag, last_modified)
+                if cached:
+                    return set_cache_headers(cached, etag, last_modified, settings.LESSON_CACHE_MAX_AGE)
+
         # 1. Спочатку дістаємо сам урок
-        target_lesson = (
-            LessonModel.objects
-            .filter(id=lesson_id, module__course__owner=user)
-            .select_related("module__course")
-            .first()
-        )
+        target_lesson = get_owned_lesson(user, lesson_id)
 
         if not target_lesson:
             return Response({"error": "Lesson not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        course = target_lesson.module.course
-        
-        all_lessons_in_course = LessonModel.objects.filter(
-            module__course=course
-        ).order_by('module__id', 'id').values_list('id', flat=True)
-        
-        try:
-            lesson_list = list(all_lessons_in_course)
-            order_id = lesson_list.index(target_lesson.id) + 1
-        except ValueError:
-            order_id = 1
+
+        order_id = target_lesson.position
 
         def build_response(text_content):
-            return Response({
+            response = Response({
                 "id": target_lesson.id,
                 "order_id": order_id,
                 "content": text_content
             }, status=status.HTTP_200_OK)
+            etag, last_modified = lesson_version(target_lesson.id, order_id, target_lesson.updated_at)
+            return set_cache_headers(response, etag, last_modified, settings.LESSON_CACHE_MAX_AGE)
 
         
         if target_lesson.content and len(target_lesson.content) > 10:
             return build_response(target_lesson.content)
 
-        
-        payload = {
-            "lesson_type": target_lesson.type,
-            "lesson_title": target_lesson.title,
-            "course_topic": course.topic
-        }
+        enforce_generation_limits(user, "lesson")
 
         try:
-            response = client.chat.completions.create(
-                model="openai/gpt-4o-mini",
-                temperature=0.7,
-                max_tokens=4000, 
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """
-You are an expert educator. Generate a detailed lesson in Ukrainian using Markdown.
-Structure:
-- # Title
-- ## Sections
-- **Key terms**
-- Code blocks (if IT related)
-"""
-                    },
-                    {
-                        "role": "user",
-                        "content": json.dumps(payload, ensure_ascii=False)
-                    }
-                ]
-            )
-
-            md_output = response.choices[0].message.content
-            
-            target_lesson.content = md_output
-            target_lesson.save()
-
+            md_output = generate_lesson_content(target_lesson)
             return build_response(md_output)
 
+        except SingleFlightTimeout as e:
+            return generation_in_progress_response(e)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF content negotiation accept `Accept: text/event-stream`
+    (EventSource sends it). Errors are still rendered as JSON.
+    """
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+def sse_event(data, event=None):
+    message = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    if event:
+        message = f"event: {event}\n{message}"
+    return message
+
+
+class StreamLessonAPIView(APIView):
+    """
+    GET /lessons/<lesson_id>/stream/
+    Same as GenerateLessonAPIView, but streams Markdown as Server-Sent Events
+    while the model is still writing it:
+
+        event: meta   -> {"id": ..., "order_id": ...}
+        data          -> {"delta": "..."}   (repeated)
+        event: done   -> {"id": ..., "order_id": ...}
+        event: error  -> {"error": "..."}
+
+    The full text is saved to LessonModel.content only after the stream
+    finishes, so an aborted stream never leaves a half-written lesson.
+    """
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    def get(self, request, lesson_id: int):
+        user = request.user
+        if not user.is_authenticated:
+            return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        target_lesson = get_owned_lesson(user, lesson_id)
+
+        if not target_lesson:
+            return Response({"error": "Lesson not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        order_id = target_lesson.position
+        meta = {"id": target_lesson.id, "order_id": order_id}
+
+        if not (target_lesson.content and len(target_lesson.content) > 10):
+            enforce_generation_limits(user, "lesson")
+
+        def event_stream():
+            yield sse_event(meta, event="meta")
+
+            # Урок вже згенерований — віддаємо одним шматком
+            if target_lesson.content and len(target_lesson.content) > 10:
+                yield sse_event({"delta": target_lesson.content})
+                yield sse_event(meta, event="done")
+                return
+
+            # Цей урок вже генерує інший запит — чекаємо і віддаємо його результат
+            flight = SingleFlight(lesson_flight_key(target_lesson.id))
+            try:
+                while not flight.acquire():
+                    content = flight.wait(lambda: fetch_generated_lesson(target_lesson))
+                    if content is not None:
+                        yield sse_event({"delta": content})
+                        yield sse_event(meta, event="done")
+                        return
+            except Exception as e:
+                yield sse_event({"error": str(e)}, event="error")
+                return
+
+            try:
+                yield from stream_lesson()
+            finally:
+                flight.release()
+
+        def stream_lesson():
+            if fetch_generated_lesson(target_lesson) is not None:
+                yield sse_event({"delta": target_lesson.content})
+                yield sse_event(meta, event="done")
+                return
+
+            request_kwargs = dict(
+                model=llm.default_model(),
+                temperature=0.7,
+                max_tokens=4000,
+                messages=build_lesson_messages(target_lesson)
+            )
+            started = time.perf_counter()
+            cache_key = None
+            if llm_cache.is_enabled("lesson"):
+                cache_key = llm_cache.make_cache_key(**request_kwargs)
+                cached = llm_cache.lookup("lesson", cache_key)
+                if cached is not None:
+                    target_lesson.content = cached.choices[0].message.content
+                    target_lesson.save(update_fields=["content", "updated_at"])
+                    token_ledger.record(
+                        user.id, "lesson", request_kwargs["model"],
+                        latency=time.perf_counter() - started, cache_hit=True
+                    )
+                    yield sse_event({"delta": target_lesson.content})
+                    yield sse_event(meta, event="done")
+                    return
+
+            parts = []
+            usage = None
+            stream = None
+            try:
+                stream = llm.stream_chat_completion("lesson", **request_kwargs)
+                for chunk in stream:
+                    if chunk.usage:
+                        usage = chunk.usage
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield sse_event({"delta": delta})
+
+                target_lesson.content = "".join(parts)
+                target_lesson.save(update_fields=["content", "updated_at"])
+                if cache_key:
+                    llm_cache.store(
+                        "lesson", cache_key,
+                        llm_cache.completion_from_text(request_kwargs["model"], target_lesson.content)
+                    )
+            except Exception as e:
+                yield sse_event({"error": str(e)}, event="error")
+                return
+            finally:
+                # Клієнт відключився (GeneratorExit на yield) чи стрім обірвався —
+                # токени вже витрачені, тож запис у журнал і квоту є завжди
+                if stream is not None:
+                    stream.close()
+                    token_ledger.record_usage(
+                        user.id, "lesson", request_kwargs["model"],
+                        usage or llm.estimate_usage(request_kwargs["messages"], "".join(parts)),
+                        latency=time.perf_counter() - started
+                    )
+
+            yield sse_event(meta, event="done")
+
+        response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Щоб nginx не буферизував відповідь і токени йшли одразу
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
 class GenerateHomeworkAPIView(APIView):
     """
     GET /modules/<module_id>/generate_homework/
@@ -406,52 +893,113 @@ class GenerateHomeworkAPIView(APIView):
              return Response(homework_obj.content, status=status.HTTP_200_OK)
 
         if not homework_obj:
-            homework_obj = HomeworkModel(module=module, title=f"ДЗ: {module.title}")
+            homework_obj = HomeworkModel(module=module, owner=user, title=f"ДЗ: {module.title}")
 
-        lessons_titles = [l.title for l in module.lessons.all()]
-        
-        payload = {
-            "course_topic": module.course.topic,
-            "module_title": module.title,
-            "homework_focus": homework_obj.title,
-            "lessons_list": lessons_titles
-        }
+        enforce_generation_limits(user, "homework")
 
         try:
-            response = client.chat.completions.create(
-                model="openai/gpt-4o-mini",
-                temperature=0.5, 
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """
-You are a strict technical mentor. Generate a practical homework task in Ukrainian using Markdown.
+            md_output = generate_homework_content(module, homework_obj)
+            return Response(md_output, status=status.HTTP_200_OK)
 
-STRICT CONSTRAINTS:
-1. SCOPE LIMIT: You must ONLY use concepts and tools explicitly mentioned in the 'lessons_list'.
-2. NO ASSUMPTIONS: Do NOT assume the student knows functions, loops, or input if those words are not in 'lessons_list'.
-3. EXAMPLE: If lessons are about "Print", the task must ONLY involve printing. Do NOT ask for "Input".
-4. Focus strictly on 'homework_focus' topic but limit implementation details to 'lessons_list'.
+        except SingleFlightTimeout as e:
+            return generation_in_progress_response(e)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-OUTPUT STRUCTURE:
-# Домашнє завдання
-## Завдання
-...
-**Критерії:**
-...
-"""
-                    },
-                    {"role": "user", "content": json.dumps(payload, ensure_ascii=False)}
-                ]
-            )
 
-            md_output = response.choices[0].message.content
-            
-            homework_obj.content = md_output
-            homework_obj.save()
+# warm_course — це генерація всього курсу, рахуємо як course
+JOB_RATE_LIMIT_SCOPES = {
+    GenerationJob.KIND_COURSE: "course",
+    GenerationJob.KIND_LESSON: "lesson",
+    GenerationJob.KIND_HOMEWORK: "homework",
+    GenerationJob.KIND_WARM_COURSE: "course",
+}
 
-            return Response(md_output, status=status.HTTP_200_OK)
 
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
+class GenerationJobAPIView(APIView):
+    """
+    POST /jobs/
+    Body: { "kind": "course", "prompt": "...", "warm": false }
+          { "kind": "lesson", "lesson_id": 1 }
+          { "kind": "homework", "module_id": 1 }
+          { "kind": "warm_course", "course_id": 1 }
+    Одразу повертає 202 з id завдання, генерацію робить воркер.
+    Однакове завдання, яке ще в роботі, не дублюється.
+
+    GET /jobs/<job_id>/
+    Статус і прогрес завдання, в result — id створених об'єктів.
+    """
+
+    def post(self, request):
+        user = request.user
+        if not user.is_authenticated:
+            return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        serializer = GenerationJobRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        kind = serializer.validated_data["kind"]
+        fields = serializer.validated_data
+
+        if kind == GenerationJob.KIND_COURSE:
+            payload = {"prompt": fields["prompt"]}
+            if parse_bool(request.data.get("warm", settings.COURSE_WARMUP_DEFAULT)):
+                payload["warm"] = True
+
+        elif kind == GenerationJob.KIND_LESSON:
+            if not LessonModel.objects.filter(id=fields["lesson_id"], owner=user).exists():
+                return Response({"error": "Lesson not found"}, status=status.HTTP_404_NOT_FOUND)
+            payload = {"lesson_id": fields["lesson_id"]}
+
+        elif kind == GenerationJob.KIND_WARM_COURSE:
+            if not CourseModel.objects.filter(id=fields["course_id"], owner=user).exists():
+                return Response({"error": "Course not found"}, status=status.HTTP_404_NOT_FOUND)
+            payload = {"course_id": fields["course_id"]}
+
+        else:
+            if not ModuleModel.objects.filter(id=fields["module_id"], course__owner=user).exists():
+                return Response({"error": "Module not found"}, status=status.HTTP_404_NOT_FOUND)
+            payload = {"module_id": fields["module_id"]}
+
+        enforce_generation_limits(user, JOB_RATE_LIMIT_SCOPES[kind])
+        job, created = enqueue_job(user, kind, payload)
+
+        data = GenerationJobSerializer(job).data
+        data["deduplicated"] = not created
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+    def get(self, request, job_id=None):
+        user = request.user
+        if not user.is_authenticated:
+            return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        if not job_id:
+            return Response({"error": "Job ID required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = GenerationJob.objects.filter(id=job_id, owner=user).first()
+        if not job:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response(GenerationJobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+class LLMCacheStatsAPIView(APIView):
+    """
+    GET /llm-cache/stats/
+    Лічильники hit/miss кешу LLM по ендпоінтах (з моменту старту процесу).
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(llm_cache.cache_stats(), status=status.HTTP_200_OK)
+
+
+class LLMMetricsAPIView(APIView):
+    """
+    GET /llm/metrics/
+    Стан circuit breaker і latency/помилки викликів LLM по ендпоінтах (на процес).
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(llm.metrics_snapshot(), status=status.HTTP_200_OK)
@@ -1,6 +1,21 @@
+import logging
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 
 class TeacherConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Teacher'
+
+    def ready(self):
+        # Без ізоляції автотести не запускаються і все оцінює LLM — це має бути видно одразу, а не з кожного запиту
+        from . import sandbox
+
+        if settings.HOMEWORK_TESTS_ENABLED and not sandbox.is_available():
+            logger.error(
+                "Homework tests are enabled, but the sandbox is unavailable (user namespaces are disabled?): "
+                "submissions will be graded without running tests."
+            )
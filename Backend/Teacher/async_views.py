@@ -0,0 +1,93 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from Auth.throttling import enforce_generation_limits
+from Courses.async_views import AsyncAPIView, json_response
+from Courses.llm import achat_completion
+from Courses.models import *
+from . import precheck, review_cache
+from .models import Submission
+from .views import (
+    find_cached_review,
+    parse_review,
+    review_request,
+    review_task_hash,
+    save_review,
+    with_tests,
+)
+
+
+async def aai_review(user, homework, submission, report):
+    """Async-версія ai_review."""
+    response = await achat_completion("review", **review_request(user, homework, submission, report))
+    return parse_review(report, response)
+
+
+def precheck_in_worker(homework, submission):
+    """
+    precheck в окремому потоці (thread_sensitive=False): автотести в пісочниці
+    йдуть секунди, і спільний sync-потік за цей час не обслужив би нікого.
+    З'єднання з БД цього потоку закриваємо, як і після запиту.
+    """
+    try:
+        return precheck.precheck(homework, submission)
+    finally:
+        close_old_connections()
+
+
+class AsyncCheckHomeworkAPIView(AsyncAPIView):
+    """
+    POST /teacher/async/homeworks/<module_id>/check/
+    Async-версія CheckHomeworkAPIView.
+    """
+
+    async def post(self, request, module_id):
+        user = request.user
+
+        homework = await HomeworkModel.objects.filter(
+            module_id=module_id,
+            owner=user
+        ).afirst()
+
+        if not homework:
+            return json_response(
+                {"error": "Homework for this module not found. Generate it first."},
+                status=404
+            )
+
+        new_submission = (request.data.get("submission") or "").strip()
+        if not new_submission:
+            return json_response({"error": "Submission is empty. Write some code."}, status=400)
+
+        started = time.perf_counter()
+        code_hash = review_cache.code_hash(new_submission)
+        task_hash = review_task_hash(homework)
+        cached = await sync_to_async(find_cached_review)(homework, task_hash, code_hash)
+        if cached:
+            return json_response(await sync_to_async(save_review)(
+                user, homework, new_submission, code_hash, *cached, Submission.STATUS_CACHED, started
+            ))
+
+        await sync_to_async(enforce_generation_limits)(user, "review")
+
+        report = await sync_to_async(precheck_in_worker, thread_sensitive=False)(homework, new_submission)
+        if report["failed"]:
+            data = await sync_to_async(save_review)(
+                user, homework, new_submission, code_hash, report["grade"], report["feedback"],
+                report["status"], started
+            )
+            return json_response(with_tests(data, report))
+
+        try:
+            grade, feedback = await aai_review(user, homework, new_submission, report)
+            await sync_to_async(review_cache.store)(task_hash, code_hash, grade, feedback)
+
+            data = await sync_to_async(save_review)(
+                user, homework, new_submission, code_hash, grade, feedback, Submission.STATUS_FRESH, started
+            )
+            return json_response(with_tests(data, report))
+
+        except Exception as e:
+            return json_response({"error": f"AI Check failed: {str(e)}"}, status=500)
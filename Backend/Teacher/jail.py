@@ -0,0 +1,210 @@
+"""
+Ізолятор пісочниці: окремий маленький процес, що садить код студента в jail.
+
+Запускається з Teacher/sandbox.py як
+
+    python -I -S -B jail.py '<spec json>'
+
+і тому не імпортує Django і не залежить від нашого коду: свіжий
+однопотоковий процес, без preexec_fn у багатопотоковому веб-сервері.
+
+Root не потрібен — усе через непривілейований user namespace:
+    1. unshare(USER | NS | NET | IPC | UTS | PID); у namespace код бачить
+       себе як JAIL_UID, а ззовні це наш uid (чи nobody, якщо нас
+       запустили від root: root не обмежується RLIMIT_NPROC);
+    2. "/" робимо private, у spec["root"] read-only bind системних тек і
+       префікса Python; spec["root"]/work лишається записуваною;
+    3. chroot(root), chdir("/work");
+    4. fork -> PID 1 нового PID namespace (init): лише збирає зомбі і
+       чекає на RUNNER. Коли init виходить, ядро вбиває все, що лишилось
+       у namespace, — fork + setsid не допоможе пережити здачу;
+    5. fork -> rlimit-и (в т.ч. RLIMIT_NPROC), no_new_privs, setresuid у
+       JAIL_UID і execve інтерпретатора з RUNNER. uid ненульовий, тож
+       execve скидає всі capabilities: ні mount, ні chroot, ні мережі.
+
+Протокол з батьком: після успішного кроку 3 у дескриптор spec["status_fd"]
+пишеться "ok"; що завгодно інше (чи нічого) — ізоляції немає і код не
+запускався. Статус RUNNER повертається як власний: exit code або той
+самий сигнал.
+"""
+import ctypes
+import json
+import os
+import resource
+import signal
+import sys
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWUTS = 0x04000000
+CLONE_NEWIPC = 0x08000000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWPID = 0x20000000
+CLONE_NEWNET = 0x40000000
+MS_RDONLY = 0x1
+MS_NOSUID = 0x2
+MS_NODEV = 0x4
+MS_NOEXEC = 0x8
+MS_REMOUNT = 0x20
+MS_NOATIME = 0x400
+MS_NODIRATIME = 0x800
+MS_BIND = 0x1000
+MS_REC = 0x4000
+MS_PRIVATE = 0x40000
+MS_RELATIME = 0x200000
+PR_SET_NO_NEW_PRIVS = 38
+
+# Під цим uid/gid код бачить себе в namespace; ззовні це uid Django
+JAIL_UID = 1000
+# ...або nobody, якщо Django працює від root (sandbox.prepare_jail віддає йому root і work/)
+ROOT_FALLBACK_UID = 65534
+WORKDIR = "/work"
+
+# statvfs -> mount: у user namespace перемонтування мусить зберегти "замкнені" прапори джерела
+STATVFS_FLAGS = (
+    (os.ST_NOSUID, MS_NOSUID), (os.ST_NODEV, MS_NODEV), (os.ST_NOEXEC, MS_NOEXEC),
+    (os.ST_NOATIME, MS_NOATIME), (os.ST_NODIRATIME, MS_NODIRATIME), (os.ST_RELATIME, MS_RELATIME),
+)
+
+libc = ctypes.CDLL(None, use_errno=True)
+
+
+def check(result, what):
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"{what}: {os.strerror(errno)}")
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def bind_readonly(source, target):
+    check(libc.mount(source.encode(), target.encode(), None, MS_BIND, None), f"bind {source}")
+    flags = MS_BIND | MS_REMOUNT | MS_RDONLY | MS_NOSUID | MS_NODEV
+    source_flags = os.statvfs(source).f_flag
+    for statvfs_flag, mount_flag in STATVFS_FLAGS:
+        if source_flags & statvfs_flag:
+            flags |= mount_flag
+    check(libc.mount(None, target.encode(), None, flags, None), f"remount {source}")
+
+
+def outer_ids():
+    """Кому ззовні належить JAIL_UID: нам самим, а root-у — nobody."""
+    if os.geteuid() == 0:
+        return ROOT_FALLBACK_UID, ROOT_FALLBACK_UID
+    return os.geteuid(), os.getegid()
+
+
+def map_ids(pid, ready_r):
+    """
+    Дочірній процес у батьківському namespace пише карти uid/gid за pid:
+    з нового namespace root не зміг би відобразити чужий uid.
+    """
+    uid, gid = outer_ids()
+    try:
+        if not os.read(ready_r, 1):  # unshare не вдався
+            os._exit(1)
+        write(f"/proc/{pid}/setgroups", "deny")
+        write(f"/proc/{pid}/uid_map", f"{JAIL_UID} {uid} 1")
+        write(f"/proc/{pid}/gid_map", f"{JAIL_UID} {gid} 1")
+    except OSError:
+        os._exit(1)
+    os._exit(0)
+
+
+def enter_jail(spec):
+    if os.geteuid() == 0:
+        os.setgroups([])  # додаткові групи root лишились би і в namespace
+    ready_r, ready_w = os.pipe()
+    mapper = os.fork()
+    if mapper == 0:
+        map_ids(os.getppid(), ready_r)
+    os.close(ready_r)
+    try:
+        check(libc.unshare(
+            CLONE_NEWUSER | CLONE_NEWNS | CLONE_NEWNET | CLONE_NEWIPC | CLONE_NEWUTS | CLONE_NEWPID
+        ), "unshare")
+        os.write(ready_w, b"x")
+    finally:
+        os.close(ready_w)
+        _, status = os.waitpid(mapper, 0)
+    if status != 0:
+        raise OSError(0, "writing uid_map/gid_map failed")
+
+    # Монтування не протікають назад у систему
+    check(libc.mount(b"none", b"/", None, MS_REC | MS_PRIVATE, None), "make-private")
+    root = spec["root"]
+    for source, target in spec["mounts"]:
+        bind_readonly(source, root + target)
+    os.chroot(root)
+    os.chdir(WORKDIR)
+
+
+def run_code(spec):
+    limits = spec["limits"]
+    resource.setrlimit(resource.RLIMIT_CPU, (limits["cpu_seconds"], limits["cpu_seconds"] + 1))
+    resource.setrlimit(resource.RLIMIT_AS, (limits["memory_bytes"], limits["memory_bytes"]))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (limits["output_bytes"], limits["output_bytes"]))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NPROC, (limits["max_processes"], limits["max_processes"]))
+    check(libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0), "no_new_privs")
+    os.setresgid(JAIL_UID, JAIL_UID, JAIL_UID)
+    os.setresuid(JAIL_UID, JAIL_UID, JAIL_UID)
+    argv = spec["argv"]
+    os.execve(argv[0], argv, spec["env"])
+
+
+def init(code_pid, status_w):
+    """PID 1 у namespace: збирає осиротілих нащадків, поки не завершиться RUNNER."""
+    while True:
+        try:
+            pid, status = os.waitpid(-1, 0)
+        except ChildProcessError:
+            os._exit(1)
+        if pid == code_pid:
+            os.write(status_w, str(status).encode())
+            os._exit(0)
+
+
+def main():
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))  # сигнал RUNNER передаємо собі — без core dump
+    spec = json.loads(sys.argv[1])
+    status_fd = spec["status_fd"]
+    try:
+        enter_jail(spec)
+    except OSError as e:
+        os.write(status_fd, f"error: {e}".encode())
+        os._exit(1)
+    os.write(status_fd, b"ok")
+    os.close(status_fd)
+
+    status_r, status_w = os.pipe()
+    init_pid = os.fork()
+    if init_pid == 0:
+        os.close(status_r)
+        code_pid = os.fork()
+        if code_pid == 0:
+            os.close(status_w)
+            try:
+                run_code(spec)
+            finally:
+                os._exit(127)
+        init(code_pid, status_w)
+
+    os.close(status_w)
+    os.waitpid(init_pid, 0)
+    with os.fdopen(status_r) as f:
+        raw = f.read()
+    status = int(raw) if raw else (signal.SIGKILL & 0x7F)  # init вбили ззовні (таймаут)
+    if os.WIFSIGNALED(status):
+        sig = os.WTERMSIG(status)
+        signal.signal(sig, signal.SIG_DFL)
+        os.kill(os.getpid(), sig)
+        os._exit(128 + sig)
+    os._exit(os.waitstatus_to_exitcode(status))
+
+
+if __name__ == "__main__":
+    main()
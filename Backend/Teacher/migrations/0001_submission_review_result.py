@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('Courses', '0017_ownership_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_hash', models.CharField(max_length=64)),
+                ('code_hash', models.CharField(max_length=64)),
+                ('grade', models.IntegerField()),
+                ('feedback', models.TextField()),
+                ('hits', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('task_hash', 'code_hash'), name='unique_review_result')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Submission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.TextField()),
+                ('code_hash', models.CharField(max_length=64)),
+                ('grade', models.IntegerField(blank=True, null=True)),
+                ('feedback', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('fresh', 'Fresh'), ('cached', 'Cached')], max_length=10)),
+                ('latency_ms', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('homework', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='Courses.homeworkmodel')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['homework', '-created_at'], name='submission_homework_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Teacher', '0001_submission_review_result'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='submission',
+            name='status',
+            field=models.CharField(choices=[('fresh', 'Fresh'), ('cached', 'Cached'), ('precheck', 'Precheck')], max_length=10),
+        ),
+    ]
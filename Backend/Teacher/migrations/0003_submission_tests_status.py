@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Teacher', '0002_submission_precheck_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='submission',
+            name='status',
+            field=models.CharField(choices=[('fresh', 'Fresh'), ('cached', 'Cached'), ('precheck', 'Precheck'), ('tests', 'Tests')], max_length=10),
+        ),
+    ]
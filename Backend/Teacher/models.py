@@ -1,3 +1,67 @@
 from django.db import models
 
-# Create your models here.
+from Auth.models import CustomUser
+from Courses.models import HomeworkModel
+
+
+class Submission(models.Model):
+    """Кожна спроба здачі ДЗ — з оцінкою, фідбеком і часом перевірки."""
+    STATUS_FRESH = "fresh"    # перевірено LLM
+    STATUS_CACHED = "cached"  # взято з ReviewResult
+    STATUS_PRECHECK = "precheck"  # оцінено локально, без LLM (Teacher/precheck.py)
+    STATUS_TESTS = "tests"        # не пройшли автотести, без LLM
+    STATUS_CHOICES = [
+        (STATUS_FRESH, "Fresh"),
+        (STATUS_CACHED, "Cached"),
+        (STATUS_PRECHECK, "Precheck"),
+        (STATUS_TESTS, "Tests"),
+    ]
+
+    homework = models.ForeignKey(
+        HomeworkModel,
+        on_delete=models.CASCADE,
+        related_name="submissions"
+    )
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="submissions"
+    )
+    code = models.TextField()
+    code_hash = models.CharField(max_length=64)  # див. Teacher/review_cache.py
+    grade = models.IntegerField(blank=True, null=True)
+    feedback = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    latency_ms = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["homework", "-created_at"], name="submission_homework_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} HW {self.homework_id}: {self.grade} ({self.status})"
+
+
+class ReviewResult(models.Model):
+    """
+    Спільний для всіх студентів кеш рев'ю: однакова задача + та сама
+    нормалізована програма (без коментарів і форматування) = та сама оцінка.
+    """
+    task_hash = models.CharField(max_length=64)
+    code_hash = models.CharField(max_length=64)
+    grade = models.IntegerField()
+    feedback = models.TextField()
+    hits = models.IntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["task_hash", "code_hash"], name="unique_review_result"),
+        ]
+
+    def __str__(self):
+        return f"{self.task_hash[:8]}/{self.code_hash[:8]}: {self.grade} ({self.hits} hits)"
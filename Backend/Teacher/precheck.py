@@ -0,0 +1,204 @@
+"""
+Локальна перевірка здачі перед AI-рев'ю.
+
+    1. ast.parse — код, що не парситься, одразу отримує FAIL_GRADE і
+       фідбек з місцем помилки, без запиту в LLM;
+    2. метрики з AST (рядки, функції, складність, вкладеність, ...);
+    3. автотести ДЗ (HomeworkModel.test_cases) у Teacher/sandbox.py:
+       хоч один кейс не пройдено — оцінка з частки пройдених, без LLM;
+       усі пройдено — LLM лише оцінює стиль (не нижче TESTS_PASSED_MIN_GRADE);
+    4. якщо тестів немає, за PRECHECK_SANDBOX_RUN і доступної пісочниці —
+       пробний запуск (у промпт — лише чи пройшов і тип винятку).
+
+Метрики, тести і результат запуску йдуть у промпт рев'юера
+(static_analysis), тож він не витрачає токени на те, що ми вже знаємо.
+
+Синтаксис перевіряємо лише для Python-задач (див. is_python_task):
+курси бувають і про інші мови, і там ast.parse нічого не доводить.
+"""
+import ast
+import logging
+
+from django.conf import settings
+
+from Courses.models import CourseModel
+from Courses.views import mentions_python
+from . import sandbox
+from .models import Submission
+
+FAIL_GRADE = 0
+# Не пройдено хоч один тест — максимум 49 ("код не працює")
+TESTS_FAILED_MAX_GRADE = 49
+LONG_LINE = 100
+SHOWN_FAILURES = 3
+
+logger = logging.getLogger(__name__)
+
+BRANCH_NODES = (
+    ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try, ast.With, ast.AsyncWith,
+    ast.IfExp, ast.BoolOp, ast.comprehension, ast.ExceptHandler, ast.match_case,
+)
+BLOCK_NODES = (
+    ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.If, ast.For, ast.AsyncFor,
+    ast.While, ast.Try, ast.With, ast.AsyncWith, ast.Match,
+)
+
+
+def is_python_task(homework):
+    if mentions_python(homework.content):
+        return True
+    topic = CourseModel.objects.filter(modules__id=homework.module_id).values_list("topic", flat=True).first()
+    return mentions_python(topic)
+
+
+def max_depth(node, depth=0):
+    children = [max_depth(child, depth + isinstance(child, BLOCK_NODES)) for child in ast.iter_child_nodes(node)]
+    return max(children, default=depth)
+
+
+def is_trivial(tree):
+    """Немає жодної інструкції, крім pass, ... і рядків-коментарів."""
+    for stmt in tree.body:
+        if isinstance(stmt, ast.Pass):
+            continue
+        if isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant):
+            continue
+        return False
+    return True
+
+
+def lint_metrics(code, tree):
+    lines = code.splitlines()
+    nodes = list(ast.walk(tree))
+    return {
+        "lines": sum(1 for line in lines if line.strip()),
+        "comment_lines": sum(1 for line in lines if line.strip().startswith("#")),
+        "functions": sum(isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef)) for n in nodes),
+        "classes": sum(isinstance(n, ast.ClassDef) for n in nodes),
+        "complexity": 1 + sum(isinstance(n, BRANCH_NODES) for n in nodes),
+        "max_depth": max_depth(tree),
+        "long_lines": sum(1 for line in lines if len(line) > LONG_LINE),
+        "bare_excepts": sum(isinstance(n, ast.ExceptHandler) and n.type is None for n in nodes),
+        "imports": sorted({
+            alias.name.split(".")[0]
+            for n in nodes if isinstance(n, ast.Import) for alias in n.names
+        } | {
+            n.module.split(".")[0]
+            for n in nodes if isinstance(n, ast.ImportFrom) and n.module
+        }),
+    }
+
+
+def syntax_error_feedback(error):
+    line = (error.text or "").rstrip("\n")
+    caret = " " * max((error.offset or 1) - 1, 0) + "^"
+    return (
+        f"**Синтаксична помилка** у рядку {error.lineno}: `{error.msg}`\n\n"
+        f"```\n{line}\n{caret}\n```\n\n"
+        "Код не запускається, тож AI-перевірку пропущено. Виправте помилку і надішліть ще раз."
+    )
+
+
+def summarize_run(run):
+    """
+    Для промпта: чи завершився запуск успішно і тип винятку.
+    Ні stdout, ні текст помилки в LLM не йдуть — там може бути що завгодно.
+    """
+    stderr = run["stderr"].strip().splitlines()
+    error = ""
+    if run["timed_out"]:
+        error = "timeout"
+    elif run["returncode"] != 0 and stderr:
+        name = stderr[-1].split(":", 1)[0].strip()
+        error = name if name.isidentifier() else "error"
+    return {
+        "passed": run["returncode"] == 0 and not run["timed_out"],
+        "timed_out": run["timed_out"],
+        "error": error,
+    }
+
+
+def tests_feedback(results):
+    failed = [r for r in results if not r["passed"]]
+    lines = [f"**Автотести: пройдено {len(results) - len(failed)} з {len(results)}.**", ""]
+    for r in failed[:SHOWN_FAILURES]:
+        lines.append(f"- Вхід: `{r['input'].strip() or '(порожньо)'}`")
+        lines.append(f"  - очікувано: `{r['expected_output'].strip()}`")
+        if r["error"]:
+            lines.append(f"  - помилка: `{r['error']}`")
+        else:
+            lines.append(f"  - отримано: `{r['actual_output'].strip()[:200]}`")
+    if len(failed) > SHOWN_FAILURES:
+        lines.append(f"- ...і ще {len(failed) - SHOWN_FAILURES}")
+    lines += ["", "Виправте рішення так, щоб усі тести проходили — тоді його перевірить AI-рев'юер."]
+    return "\n".join(lines)
+
+
+def precheck(homework, code):
+    """
+    Повертає dict:
+        failed       — True, якщо оцінку виставлено локально (grade/feedback/status заповнені)
+        static_analysis — для промпта рев'юера (None, якщо задача не на Python)
+        tests        — результати автотестів по кейсах (None, якщо тестів немає)
+    """
+    report = {
+        "failed": False, "grade": None, "feedback": None, "status": None,
+        "static_analysis": None, "tests": None,
+    }
+    if not settings.PRECHECK_ENABLED or not is_python_task(homework):
+        return report
+
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        report.update(
+            failed=True, grade=FAIL_GRADE, feedback=syntax_error_feedback(e), status=Submission.STATUS_PRECHECK
+        )
+        return report
+    except (ValueError, RecursionError, MemoryError):
+        # Нульові байти чи надто глибока вкладеність — хай дивиться рев'юер
+        return report
+
+    if is_trivial(tree):
+        report.update(
+            failed=True, grade=FAIL_GRADE,
+            feedback="У рішенні немає жодного коду, лише `pass`, `...` чи коментарі. Спробуйте розв'язати задачу.",
+            status=Submission.STATUS_PRECHECK,
+        )
+        return report
+
+    analysis = {"syntax": "ok", "metrics": lint_metrics(code, tree)}
+    results = None
+    if homework.test_cases:
+        try:
+            results = sandbox.run_tests(code, homework.test_cases)
+        except sandbox.SandboxUnavailable:
+            # Без ізоляції код не запускаємо: оцінює лише рев'юер
+            logger.warning("Sandbox unavailable, skipping tests for homework %s", homework.id)
+    if results is not None:
+        passed = sum(r["passed"] for r in results)
+        report["tests"] = results
+        if passed < len(results):
+            report.update(
+                failed=True,
+                grade=round(TESTS_FAILED_MAX_GRADE * passed / len(results)),
+                feedback=tests_feedback(results),
+                status=Submission.STATUS_TESTS,
+            )
+            return report
+        analysis["tests"] = {"passed": passed, "total": len(results)}
+    elif not homework.test_cases and settings.PRECHECK_SANDBOX_RUN and sandbox.is_available():
+        try:
+            analysis["run"] = summarize_run(sandbox.run_python(code))
+        except sandbox.SandboxUnavailable:
+            logger.warning("Sandbox unavailable, skipping trial run for homework %s", homework.id)
+    report["static_analysis"] = analysis
+    return report
+
+
+def final_grade(report, llm_grade):
+    """Усі автотести пройдено — код робочий, LLM оцінює лише стиль."""
+    analysis = report["static_analysis"] or {}
+    if "tests" in analysis:
+        return max(int(llm_grade), settings.TESTS_PASSED_MIN_GRADE)
+    return llm_grade
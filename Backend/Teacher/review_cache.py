@@ -0,0 +1,102 @@
+"""
+Кеш результатів code review.
+
+Ключ — (хеш задачі, хеш нормалізованого коду). Код нормалізуємо так,
+щоб пробіли, порожні рядки і коментарі не впливали на хеш:
+    - Python, що парситься   -> ast.dump() (без коментарів і форматування)
+    - Python з помилкою      -> потік токенів tokenize без COMMENT/NL
+    - все інше               -> рядки без кінцевих пробілів, без порожніх
+Тож повторна здача з іншим відступом чи новим коментарем, як і
+ідентична відповідь іншого студента, не йде в LLM вдруге.
+"""
+import ast
+import hashlib
+import io
+import json
+import tokenize
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ReviewResult
+
+SKIP_TOKENS = {tokenize.COMMENT, tokenize.NL, tokenize.ENDMARKER}
+# INDENT/DEDENT несуть структуру, а не конкретну ширину відступу
+TOKEN_MARKERS = {tokenize.INDENT: "<INDENT>", tokenize.DEDENT: "<DEDENT>", tokenize.NEWLINE: "<NEWLINE>"}
+
+
+def is_enabled():
+    return settings.REVIEW_CACHE_ENABLED
+
+
+def normalize_code(code):
+    try:
+        return "ast:" + ast.dump(ast.parse(code))
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        pass
+
+    try:
+        tokens = [
+            TOKEN_MARKERS.get(tok.type, tok.string)
+            for tok in tokenize.generate_tokens(io.StringIO(code).readline)
+            if tok.type not in SKIP_TOKENS
+        ]
+        return "tok:" + " ".join(tokens)
+    except (tokenize.TokenError, SyntaxError):
+        pass
+
+    return "txt:" + "\n".join(line.rstrip() for line in code.splitlines() if line.strip())
+
+
+def code_hash(code):
+    return hashlib.sha256(normalize_code(code).encode("utf-8")).hexdigest()
+
+
+def task_hash(task, *context):
+    """context — все, від чого ще залежить оцінка (system prompt, модель)."""
+    raw = json.dumps([" ".join(task.split()), *context], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def lookup(task_hash, code_hash):
+    if not is_enabled():
+        return None
+    result = ReviewResult.objects.filter(task_hash=task_hash, code_hash=code_hash).first()
+    if result:
+        ReviewResult.objects.filter(id=result.id).update(hits=F("hits") + 1, last_used_at=timezone.now())
+    return result
+
+
+def lookup_many(keys):
+    """lookup() для пакета: {(task_hash, code_hash): ReviewResult} одним запитом."""
+    if not is_enabled() or not keys:
+        return {}
+    query = Q()
+    for task, code in keys:
+        query |= Q(task_hash=task, code_hash=code)
+    results = {(r.task_hash, r.code_hash): r for r in ReviewResult.objects.filter(query)}
+    if results:
+        ReviewResult.objects.filter(id__in=[r.id for r in results.values()]).update(
+            hits=F("hits") + 1, last_used_at=timezone.now()
+        )
+    return results
+
+
+def store(task_hash, code_hash, grade, feedback):
+    if not is_enabled():
+        return
+    # Один INSERT ... ON CONFLICT, як у Courses/llm_cache.py: update_or_create
+    # робить read-then-write, і паралельні рев'ю на SQLite ловлять "database is locked"
+    ReviewResult.objects.bulk_create(
+        [ReviewResult(
+            task_hash=task_hash,
+            code_hash=code_hash,
+            grade=grade,
+            feedback=feedback,
+            last_used_at=timezone.now(),
+        )],
+        update_conflicts=True,
+        unique_fields=["task_hash", "code_hash"],
+        update_fields=["grade", "feedback", "last_used_at"],
+    )
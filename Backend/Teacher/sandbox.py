@@ -0,0 +1,338 @@
+"""
+Запуск студентського Python-коду в окремому процесі з лімітами.
+
+Кожна здача — свіжий інтерпретатор (-I -S -B: без site, env і
+user-пакетів) у тимчасовій теці, з rlimit-ами на CPU, пам'ять, розмір
+файлів і кількість дескрипторів, плюс wall-clock таймаут, після якого
+вбивається вся група процесів. stdout/stderr пишуться у файли, тож
+RLIMIT_FSIZE обрізає і нескінченний print.
+
+Автотести (run_tests): старт інтерпретатора коштує десятки мс, тому на
+здачу він один — RUNNER компілює код раз і для кожного кейсу робить
+fork з власними stdin/stdout і таймером. Кейс коштує мілісекунди.
+
+Ізоляція — Teacher/jail.py, окремий процес-ізолятор: непривілейований
+user namespace (root не потрібен) з власними mount/network/IPC/UTS/PID
+namespace, chroot у тимчасову теку, де змонтовано лише /usr і префікс
+Python (read-only) та work/ з файлами здачі. Ні коду Django, ні .env,
+ні бази, ні мережі звідти не видно; RLIMIT_NPROC і no_new_privs, а
+PID namespace гарантує, що після здачі не лишиться жодного процесу.
+
+Якщо ядро не дає user namespace, пісочниця не запускає код взагалі
+(SandboxUnavailable), а не деградує до запуску без ізоляції. Доступність
+перевіряється раз на процес (is_available), при старті — див. TeacherConfig.
+
+Одночасних здач — не більше SANDBOX_WORKERS (спільний пул на процес
+Django), решта чекає в черзі.
+"""
+import json
+import logging
+import os
+import signal
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from . import jail
+
+# Що видно з jail (read-only). /bin, /lib, /lib64 на сучасних системах —
+# симлінки в /usr, їх відтворюємо як симлінки
+SYSTEM_DIRS = ("/usr", "/bin", "/lib", "/lib64")
+WORKDIR = "work"
+JAIL = jail.__file__
+
+logger = logging.getLogger(__name__)
+
+
+class SandboxUnavailable(Exception):
+    """Ізоляцію не вдалося зібрати (немає user namespace) — код не запускався."""
+
+
+# python -c RUNNER main.py [cases.json] — у jail, cwd = /work
+# Без cases.json — просто виконує main.py; з ним — fork на кожен кейс, results.json
+RUNNER = r"""
+import json, os, signal, sys, time, traceback
+script = sys.argv[1]
+with open(script, encoding="utf-8") as f:
+    code = compile(f.read(), "main.py", "exec")
+
+def run():
+    status = 0
+    try:
+        exec(code, {"__name__": "__main__", "__file__": "main.py", "__builtins__": __builtins__})
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            status = e.code
+        elif e.code is not None:
+            print(e.code, file=sys.stderr)
+            status = 1
+    except BaseException:
+        traceback.print_exc()
+        status = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except BaseException:
+        status = status or 1
+    os._exit(status & 0xFF)
+
+if len(sys.argv) < 3:
+    run()
+
+with open(sys.argv[2], encoding="utf-8") as f:
+    spec = json.load(f)
+results = []
+for i in range(spec["cases"]):
+    sys.stdout.flush()
+    sys.stderr.flush()
+    started = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        # Попередній кейс міг заздалегідь підкласти out{i} (чи симлінк на нього) — створюємо заново
+        write = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW
+        for fd, name, flags in ((0, f"in{i}", os.O_RDONLY), (1, f"out{i}", write), (2, f"err{i}", write)):
+            if fd:
+                try:
+                    os.unlink(name)
+                except FileNotFoundError:
+                    pass
+            target = os.open(name, flags, 0o600)
+            os.dup2(target, fd)
+            os.close(target)
+        signal.setitimer(signal.ITIMER_REAL, spec["timeout"])
+        run()
+    _, status = os.waitpid(pid, 0)
+    results.append({
+        "returncode": os.waitstatus_to_exitcode(status),
+        "timed_out": os.WIFSIGNALED(status) and os.WTERMSIG(status) in (signal.SIGALRM, signal.SIGXCPU),
+        "duration_ms": int((time.perf_counter() - started) * 1000),
+    })
+with open("results.json", "w") as f:
+    json.dump(results, f)
+"""
+
+_pool = None
+_pool_lock = threading.Lock()
+_available = None
+
+
+def is_available():
+    """Чи збирається jail на цьому ядрі. Пробний запуск — раз на процес."""
+    global _available
+    if _available is None:
+        try:
+            execute("pass")
+            _available = True
+        except SandboxUnavailable as e:
+            logger.warning("Sandbox unavailable: %s", e)
+            _available = False
+    return _available
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.SANDBOX_WORKERS, thread_name_prefix="sandbox")
+        return _pool
+
+
+@receiver(setting_changed)
+def _reset_pool(setting, **kwargs):
+    global _pool
+    if setting == "SANDBOX_WORKERS":
+        with _pool_lock:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = None
+
+
+def jail_mounts():
+    """(джерело, шлях у jail) для read-only bind: системні теки і префікс Python."""
+    mounts = [(path, path) for path in SYSTEM_DIRS if os.path.isdir(path) and not os.path.islink(path)]
+    prefix = sys.base_prefix
+    if not any(prefix == path or prefix.startswith(path + "/") for path, _ in mounts):
+        mounts.append((os.path.realpath(prefix), prefix))
+    return mounts
+
+
+def prepare_jail(root):
+    """Порожні точки монтування і work/ у root. У namespace власник root — код студента."""
+    if os.geteuid() == 0:
+        # Від root код піде як nobody (jail.ROOT_FALLBACK_UID) — йому й тека
+        os.chown(root, jail.ROOT_FALLBACK_UID, jail.ROOT_FALLBACK_UID)
+    for path in SYSTEM_DIRS:
+        if os.path.islink(path):
+            os.symlink(os.readlink(path), root + path)
+    for _, target in jail_mounts():
+        os.makedirs(root + target, exist_ok=True)
+    workdir = os.path.join(root, WORKDIR)
+    os.mkdir(workdir, 0o700)
+    if os.geteuid() == 0:
+        os.chown(workdir, jail.ROOT_FALLBACK_UID, jail.ROOT_FALLBACK_UID)
+    return workdir
+
+
+def read_output(path):
+    """Читає файл, що лишив код студента: не йдемо за симлінками і не відкриваємо FIFO."""
+    try:
+        fd = os.open(path, os.O_RDONLY | os.O_NOFOLLOW | os.O_NONBLOCK)
+    except (FileNotFoundError, OSError):
+        return ""
+    with open(fd, "rb") as f:
+        if not stat.S_ISREG(os.fstat(fd).st_mode):
+            return ""
+        return f.read(settings.SANDBOX_MAX_OUTPUT).decode("utf-8", errors="replace")
+
+
+def spawn(root, args, stdin, stdout, stderr, timeout):
+    """Запускає RUNNER через jail.py з коренем root. Повертає (returncode, timed_out)."""
+    status_r, status_w = os.pipe()
+    spec = {
+        "root": root,
+        "mounts": jail_mounts(),
+        "status_fd": status_w,
+        "argv": [sys.executable, "-I", "-S", "-B", "-c", RUNNER, *args],
+        "env": {"PYTHONIOENCODING": "utf-8"},
+        "limits": {
+            "cpu_seconds": settings.SANDBOX_CPU_SECONDS,
+            "memory_bytes": settings.SANDBOX_MEMORY_MB * 1024 * 1024,
+            "output_bytes": settings.SANDBOX_MAX_OUTPUT,
+            "max_processes": settings.SANDBOX_MAX_PROCESSES,
+        },
+    }
+    try:
+        process = subprocess.Popen(
+            [sys.executable, "-I", "-S", "-B", JAIL, json.dumps(spec)],
+            stdin=subprocess.PIPE if stdin is not None else subprocess.DEVNULL,
+            stdout=stdout,
+            stderr=stderr,
+            env={},
+            pass_fds=(status_w,),
+            start_new_session=True,  # своя група — таймаут вбиває ізолятор, init і RUNNER разом
+        )
+    finally:
+        os.close(status_w)
+
+    timed_out = False
+    try:
+        process.communicate(stdin.encode("utf-8") if stdin is not None else None, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+        timed_out = True
+    except BrokenPipeError:
+        # Програма завершилась, не дочитавши stdin
+        process.wait()
+
+    with os.fdopen(status_r, "rb") as f:
+        status = f.read(1024).decode("utf-8", errors="replace")
+    if status != "ok":
+        raise SandboxUnavailable(status or f"jail exited with {process.returncode}")
+    return process.returncode, timed_out
+
+
+def write_file(workdir, name, text):
+    with open(os.path.join(workdir, name), "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def execute(code, stdin="", timeout=None):
+    """
+    Запускає код і чекає завершення (блокує потік).
+    Повертає dict: returncode, stdout, stderr, timed_out, duration_ms.
+    """
+    with tempfile.TemporaryDirectory(prefix="sandbox-") as root:
+        workdir = prepare_jail(root)
+        write_file(workdir, "main.py", code)
+        # stdout/stderr — поза work/: файли відкриває батьківський процес
+        stdout_path = os.path.join(root, "stdout")
+        stderr_path = os.path.join(root, "stderr")
+
+        started = time.perf_counter()
+        with open(stdout_path, "wb") as stdout, open(stderr_path, "wb") as stderr:
+            returncode, timed_out = spawn(
+                root, ["main.py"], stdin, stdout, stderr, timeout or settings.SANDBOX_TIMEOUT
+            )
+
+        return {
+            "returncode": returncode,
+            "stdout": read_output(stdout_path),
+            "stderr": read_output(stderr_path),
+            "timed_out": timed_out,
+            "duration_ms": int((time.perf_counter() - started) * 1000),
+        }
+
+
+def run_python(code, stdin="", timeout=None):
+    """execute() через спільний пул: не більше SANDBOX_WORKERS процесів одночасно."""
+    if not is_available():
+        raise SandboxUnavailable("user namespaces are not available")
+    return get_pool().submit(execute, code, stdin, timeout).result()
+
+
+def normalize_output(text):
+    """Кінцеві пробіли в рядках і порожні рядки в кінці не рахуються."""
+    return "\n".join(line.rstrip() for line in text.strip("\n").splitlines())
+
+
+def execute_tests(code, cases):
+    """Один інтерпретатор на здачу, fork на кейс. Результати — у порядку кейсів."""
+    timeout = settings.SANDBOX_TIMEOUT
+    with tempfile.TemporaryDirectory(prefix="sandbox-") as root:
+        workdir = prepare_jail(root)
+        write_file(workdir, "main.py", code)
+        for i, case in enumerate(cases):
+            write_file(workdir, f"in{i}", case["input"])
+        # Очікувані відповіді в jail не потрапляють — лише кількість кейсів і таймаут
+        write_file(workdir, "cases.json", json.dumps({"cases": len(cases), "timeout": timeout}))
+
+        # Старт інтерпретатора + кожен кейс до таймауту
+        # Коли spawn повернувся, PID namespace вже знищено — ніхто не перепише файли, поки ми їх читаємо
+        spawn(
+            root, ["main.py", "cases.json"], None, subprocess.DEVNULL, subprocess.DEVNULL,
+            timeout * len(cases) + settings.SANDBOX_TIMEOUT,
+        )
+        try:
+            runs = [
+                {"returncode": int(r["returncode"]), "timed_out": bool(r["timed_out"]),
+                 "duration_ms": int(r["duration_ms"])}
+                for r in json.loads(read_output(os.path.join(workdir, "results.json")))
+            ][:len(cases)]
+        except (ValueError, TypeError, KeyError):
+            runs = []
+        # Раннер не дійшов до кінця (вбитий по wall-clock) — решта кейсів теж таймаут
+        runs += [{"returncode": -signal.SIGKILL, "timed_out": True, "duration_ms": 0}] * (len(cases) - len(runs))
+
+        results = []
+        for i, (case, run) in enumerate(zip(cases, runs)):
+            stdout = read_output(os.path.join(workdir, f"out{i}"))
+            stderr = read_output(os.path.join(workdir, f"err{i}")).strip().splitlines()
+            results.append({
+                "input": case["input"],
+                "expected_output": case["expected_output"],
+                "actual_output": stdout,
+                "passed": (
+                    run["returncode"] == 0
+                    and normalize_output(stdout) == normalize_output(case["expected_output"])
+                ),
+                "timed_out": run["timed_out"],
+                "error": "timeout" if run["timed_out"] else (stderr[-1] if stderr else ""),
+                "duration_ms": run["duration_ms"],
+            })
+        return results
+
+
+def run_tests(code, cases):
+    """execute_tests() через спільний пул."""
+    if not is_available():
+        raise SandboxUnavailable("user namespaces are not available")
+    return get_pool().submit(execute_tests, code, cases).result()
@@ -1,3 +1,415 @@
-from django.test import TestCase
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+import json
+import os
+
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from Auth.models import ActivityEvent, CustomUser
+from Courses import llm
+from Courses.models import HomeworkModel
+from Courses.views import create_course_from_json
+from . import jail, precheck, review_cache, sandbox
+from .models import ReviewResult, Submission
+
+STUB_BACKENDS = {"stub": {"BACKEND": "Courses.llm_backends.StubBackend", "LATENCY": 0, "JITTER": 0}}
+
+
+def make_student(username, topic="Python"):
+    user = CustomUser.objects.create_user(
+        username=username, email=f"{username}@example.com", password="password123"
+    )
+    course = create_course_from_json(user, {
+        "meta": {"topic": topic},
+        "modules": [{"title": "Модуль", "homework_topic": "ДЗ", "lessons": []}],
+    })
+    HomeworkModel.objects.filter(module__course=course).update(content="# ДЗ\nВідсортуйте список.")
+    return user
+
+
+class CodeHashTests(SimpleTestCase):
+
+    def test_formatting_and_comments_do_not_change_hash(self):
+        original = "def solve(items):\n    return sorted(items)\n"
+        reformatted = "# рішення\ndef solve( items ):  # сортуємо\n\n  return sorted(items)   \n"
+        self.assertEqual(review_cache.code_hash(original), review_cache.code_hash(reformatted))
+
+    def test_logic_change_changes_hash(self):
+        self.assertNotEqual(
+            review_cache.code_hash("def solve(items):\n    return sorted(items)\n"),
+            review_cache.code_hash("def solve(items):\n    return sorted(items)[::-1]\n"),
+        )
+
+    def test_broken_python_falls_back_to_tokens(self):
+        broken = "def solve(items)\n    return sorted(items)  # todo"
+        self.assertTrue(review_cache.normalize_code(broken).startswith("tok:"))
+        self.assertEqual(
+            review_cache.code_hash(broken),
+            review_cache.code_hash("def solve( items )\n\n  return sorted(items)"),
+        )
+
+
+@override_settings(LLM_BACKEND="stub", LLM_BACKENDS=STUB_BACKENDS, TOKEN_LEDGER_FLUSH_INTERVAL=0)
+class CheckHomeworkCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.student = make_student("student")
+        self.module_id = HomeworkModel.objects.get(owner=self.student).module_id
+        self.client.force_authenticate(self.student)
+
+    def check(self, submission):
+        return self.client.post(
+            f"/teacher/homeworks/{self.module_id}/check/", {"submission": submission}, format="json"
+        )
+
+    def test_equivalent_resubmission_is_served_from_cache(self):
+        with mock.patch("Teacher.views.chat_completion", wraps=llm.chat_completion) as completion:
+            first = self.check("def solve(items):\n    return sorted(items)")
+            second = self.check("def solve(items):\n    # готово\n    return sorted(items)   ")
+        self.assertEqual(completion.call_count, 1)
+        self.assertEqual((first.data["status"], second.data["status"]), ("fresh", "cached"))
+        self.assertEqual(first.data["grade"], second.data["grade"])
+
+        history = self.client.get(f"/teacher/homeworks/{self.module_id}/submissions/").data
+        self.assertEqual([s["status"] for s in history], ["cached", "fresh"])
+        self.assertIn("# готово", history[0]["code"])
+        self.assertEqual(CustomUser.objects.get(id=self.student.id).streak_days, 1)
+
+    def test_other_students_identical_answer_hits_cache(self):
+        self.check("def solve(items):\n    return sorted(items)")
+
+        other = make_student("other")
+        self.client.force_authenticate(other)
+        self.module_id = HomeworkModel.objects.get(owner=other).module_id
+        with mock.patch("Teacher.views.chat_completion") as completion:
+            response = self.check("def solve(items): return sorted(items)")
+        completion.assert_not_called()
+        self.assertEqual(response.data["status"], "cached")
+        self.assertEqual(ReviewResult.objects.get().hits, 1)
+        self.assertEqual(Submission.objects.filter(user=other).count(), 1)
+
+    def test_store_upserts_existing_result(self):
+        review_cache.store("task", "code", 40, "Погано")
+        review_cache.store("task", "code", 90, "Добре")
+        self.assertEqual(list(ReviewResult.objects.values_list("grade", "feedback")), [(90, "Добре")])
+
+    def test_syntax_error_is_graded_without_llm(self):
+        with mock.patch("Teacher.views.chat_completion") as completion:
+            response = self.check("def solve(items)\n    return sorted(items)")
+        completion.assert_not_called()
+        self.assertEqual((response.data["status"], response.data["grade"]), ("precheck", precheck.FAIL_GRADE))
+        self.assertIn("рядку 1", response.data["feedback"])
+
+    def test_static_analysis_goes_to_reviewer(self):
+        with mock.patch("Teacher.views.chat_completion", wraps=llm.chat_completion) as completion:
+            self.check("def solve(items):\n    return sorted(items)")
+        payload = completion.call_args.kwargs["messages"][1]["content"]
+        self.assertIn('"static_analysis"', payload)
+        self.assertIn('"functions": 1', payload)
+
+    @override_settings(RATE_LIMITS={"review": {"capacity": 1, "per_minute": 1}})
+    def test_throttled_check_does_not_run_precheck(self):
+        self.check("def solve(items)\n    return sorted(items)")
+        with mock.patch.object(precheck, "precheck", wraps=precheck.precheck) as checked:
+            response = self.check("def solve(items)\n    return items")
+        self.assertEqual(response.status_code, 429)
+        checked.assert_not_called()
+
+    def test_run_summary_hides_output(self):
+        run = {"returncode": 1, "timed_out": False, "stdout": "SECRET\n", "stderr": "Traceback ...\nValueError: SECRET"}
+        self.assertEqual(precheck.summarize_run(run), {"passed": False, "timed_out": False, "error": "ValueError"})
+
+    @skipUnless(sandbox.is_available(), "пісочниця потребує user namespaces")
+    @override_settings(PRECHECK_SANDBOX_RUN=True)
+    def test_trial_run_sends_only_status_to_reviewer(self):
+        with mock.patch("Teacher.views.chat_completion", wraps=llm.chat_completion) as completion:
+            self.check("print('printed-' + 'output')\nraise ValueError('error-' + 'text')")
+        payload = json.loads(completion.call_args.kwargs["messages"][1]["content"])
+        self.assertEqual(payload["static_analysis"]["run"], {"passed": False, "timed_out": False, "error": "ValueError"})
+
+    @skipUnless(sandbox.is_available(), "пісочниця потребує user namespaces")
+    def test_failing_tests_are_graded_without_llm(self):
+        HomeworkModel.objects.filter(owner=self.student).update(test_cases=[
+            {"input": "2 3\n", "expected_output": "5\n"},
+            {"input": "1 1\n", "expected_output": "2\n"},
+        ])
+        with mock.patch("Teacher.views.chat_completion") as completion:
+            response = self.check("a, b = map(int, input().split())\nprint(a * b if a > 1 else a + b)")
+        completion.assert_not_called()
+        self.assertEqual(response.data["status"], "tests")
+        self.assertEqual([case["passed"] for case in response.data["tests"]], [False, True])
+        self.assertEqual(response.data["grade"], round(precheck.TESTS_FAILED_MAX_GRADE / 2))
+        self.assertIn("очікувано: `5`", response.data["feedback"])
+
+    def test_tests_are_skipped_without_sandbox(self):
+        HomeworkModel.objects.filter(owner=self.student).update(test_cases=[
+            {"input": "2 3\n", "expected_output": "5\n"},
+        ])
+        with mock.patch.object(sandbox, "is_available", return_value=False), \
+                mock.patch("Teacher.views.chat_completion", wraps=llm.chat_completion) as completion:
+            response = self.check("a, b = map(int, input().split())\nprint(a * b)")
+        completion.assert_called_once()
+        self.assertEqual(response.data["status"], "fresh")
+        self.assertIsNone(response.data.get("tests"))
+
+    def test_non_python_task_skips_syntax_check(self):
+        other = make_student("rustacean", topic="Rust")
+        self.client.force_authenticate(other)
+        self.module_id = HomeworkModel.objects.get(owner=other).module_id
+        response = self.check("fn main() { println!(\"hi\"); }")
+        self.assertEqual(response.data["status"], "fresh")
+
+
+@override_settings(LLM_BACKEND="stub", LLM_BACKENDS=STUB_BACKENDS, TOKEN_LEDGER_FLUSH_INTERVAL=0)
+class BatchCheckHomeworkTests(TransactionTestCase):
+    """Рев'ю йдуть у потоках пулу зі своїми з'єднаннями — тож без обгортки в транзакцію."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.teacher = CustomUser.objects.create_user(
+            username="teacher", email="teacher@example.com", password="password123", is_staff=True
+        )
+        self.students = [make_student(name) for name in ("anna", "bohdan", "clara")]
+        self.modules = [HomeworkModel.objects.get(owner=s).module_id for s in self.students]
+
+    def check_batch(self, items, user=None):
+        self.client.force_authenticate(user or self.teacher)
+        response = self.client.post("/teacher/homeworks/check_batch/", {"items": items}, format="json")
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        return lines[:-1], lines[-1]
+
+    def test_identical_submissions_are_reviewed_once(self):
+        with mock.patch("Teacher.views.chat_completion", wraps=llm.chat_completion) as completion:
+            results, summary = self.check_batch([
+                {"module_id": self.modules[0], "submission": "def solve(items):\n    return sorted(items)"},
+                {"module_id": self.modules[1], "submission": "def solve(items):  # моє\n  return sorted(items)"},
+                {"module_id": self.modules[2], "submission": "def solve(items):\n    return items"},
+            ])
+        self.assertEqual(completion.call_count, 2)
+        self.assertEqual(sorted(r["index"] for r in results), [0, 1, 2])
+        self.assertEqual((summary["unique"], summary["errors"]), (2, 0))
+
+        by_index = {r["index"]: r for r in results}
+        self.assertEqual(by_index[0]["grade"], by_index[1]["grade"])
+        for index, student in enumerate(self.students):
+            homework = HomeworkModel.objects.get(owner=student)
+            self.assertEqual(homework.grade, by_index[index]["grade"])
+            self.assertEqual(Submission.objects.get(homework=homework).user_id, student.id)
+
+        # Повторний пакет — усе з кешу рев'ю
+        with mock.patch("Teacher.views.chat_completion") as completion:
+            results, summary = self.check_batch([
+                {"module_id": self.modules[2], "submission": "def solve(items):\n    return items"},
+            ])
+        completion.assert_not_called()
+        self.assertEqual((results[0]["status"], summary["cached"]), ("cached", 1))
+
+    @override_settings(RATE_LIMITS={"review": {"capacity": 12, "per_minute": 1}})
+    def test_batch_takes_review_token_per_fresh_review(self):
+        items = [
+            {"module_id": self.modules[n % 3], "submission": f"def solve(items):\n    return sorted(items)[:{n}]"}
+            for n in range(12)
+        ]
+        results, summary = self.check_batch(items)
+        self.assertEqual((summary["unique"], summary["errors"]), (12, 0))
+        self.assertFalse([r for r in results if "error" in r])
+
+        # 12 рев'ю з'їли відро "review" — наступна нова здача отримує 429 ще до стріму
+        self.client.force_authenticate(self.teacher)
+        response = self.client.post("/teacher/homeworks/check_batch/", {"items": [
+            {"module_id": self.modules[0], "submission": "print('new')"},
+        ]}, format="json")
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(response.streaming)
+        self.assertIn("Retry-After", response)
+
+        # Пакет цілком з кешу токенів не потребує
+        results, summary = self.check_batch(items[:1])
+        self.assertEqual((summary["cached"], summary["errors"]), (1, 0))
+
+    @override_settings(RATE_LIMITS={"review": {"capacity": 2, "per_minute": 1}})
+    def test_batch_larger_than_bucket_is_rejected(self):
+        self.client.force_authenticate(self.students[0])
+        response = self.client.post("/teacher/homeworks/check_batch/", {"items": [
+            {"module_id": self.modules[0], "submission": f"print({n})"} for n in range(3)
+        ]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("at most 2", response.data["error"])
+        self.assertFalse(Submission.objects.exists())
+
+    def test_batch_streak_counts_only_own_homework(self):
+        # Викладач перевіряє групу — студентам днів не додається
+        self.check_batch([
+            {"module_id": module_id, "submission": f"print({n})"} for n, module_id in enumerate(self.modules)
+        ])
+        for student in self.students:
+            student.refresh_from_db()
+            self.assertEqual(student.streak_days, 0)
+        self.assertFalse(ActivityEvent.objects.exists())
+
+        # Студент здає свої ДЗ пакетом — як і в check/, подія на кожну здачу
+        self.check_batch([
+            {"module_id": self.modules[0], "submission": "print(41)"},
+            {"module_id": self.modules[0], "submission": "print(42)"},
+        ], user=self.students[0])
+        self.students[0].refresh_from_db()
+        self.assertEqual(self.students[0].streak_days, 1)
+        self.assertEqual(ActivityEvent.objects.filter(user=self.students[0]).count(), 2)
+
+    def test_students_batch_only_their_own_homeworks(self):
+        results, summary = self.check_batch([
+            {"module_id": self.modules[1], "submission": "print(1)"},
+            {"module_id": self.modules[0], "submission": "   "},
+            {"submission": "print(1)"},
+        ], user=self.students[0])
+        self.assertEqual(summary["errors"], 3)
+        self.assertIn("not found", results[0]["error"])
+        self.assertIn("empty", results[1]["error"])
+        self.assertIn("Invalid item", results[2]["error"])
+        self.assertFalse(Submission.objects.exists())
+
+    def test_rejects_empty_batch(self):
+        self.client.force_authenticate(self.teacher)
+        response = self.client.post("/teacher/homeworks/check_batch/", {"items": []}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(LLM_BACKEND="stub", LLM_BACKENDS=STUB_BACKENDS, TOKEN_LEDGER_FLUSH_INTERVAL=0)
+class AsyncCheckHomeworkTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.student = make_student("student")
+        self.module_id = HomeworkModel.objects.get(owner=self.student).module_id
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.student)}"}
+
+    def check(self, submission, module_id=None, headers=None):
+        return self.async_client.post(
+            f"/teacher/async/homeworks/{module_id or self.module_id}/check/", {"submission": submission},
+            content_type="application/json", headers=self.headers if headers is None else headers,
+        )
+
+    async def test_requires_token(self):
+        response = await self.check("print(1)", headers={})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_foreign_homework_is_not_found(self):
+        other = await sync_to_async(make_student)("other")
+        other_module_id = (await HomeworkModel.objects.aget(owner=other)).module_id
+        response = await self.check("print(1)", module_id=other_module_id)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_review_then_cache(self):
+        first = await self.check("def solve(items):\n    return sorted(items)")
+        second = await self.check("def solve(items):\n    # готово\n    return sorted(items)")
+        self.assertEqual([first.status_code, second.status_code], [200, 200])
+        self.assertEqual((first.json()["status"], second.json()["status"]), ("fresh", "cached"))
+        self.assertEqual(await Submission.objects.filter(user=self.student).acount(), 2)
+
+    async def test_syntax_error_is_graded_without_llm(self):
+        with mock.patch("Teacher.async_views.achat_completion") as completion:
+            response = await self.check("def solve(items)\n    return sorted(items)")
+        completion.assert_not_called()
+        self.assertEqual(response.json()["status"], "precheck")
+
+    @override_settings(RATE_LIMITS={"review": {"capacity": 1, "per_minute": 1}})
+    async def test_throttled_before_precheck(self):
+        await self.check("print(1)")
+        with mock.patch.object(precheck, "precheck") as checked:
+            response = await self.check("print(2)")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+        checked.assert_not_called()
+
+
+@override_settings(SANDBOX_TIMEOUT=1, SANDBOX_CPU_SECONDS=1, SANDBOX_MEMORY_MB=256)
+@skipUnless(sandbox.is_available(), "пісочниця потребує user namespaces")
+class SandboxTests(SimpleTestCase):
+
+    def test_runs_code_with_stdin(self):
+        result = sandbox.run_python("print(int(input()) * 2)", stdin="21\n")
+        self.assertEqual((result["returncode"], result["stdout"]), (0, "42\n"))
+
+    def test_infinite_loop_is_killed(self):
+        result = sandbox.run_python("while True:\n    pass")
+        self.assertNotEqual(result["returncode"], 0)
+        self.assertLess(result["duration_ms"], 3000)
+
+    def test_network_is_blocked(self):
+        result = sandbox.run_python("import urllib.request\nurllib.request.urlopen('http://example.com', timeout=1)")
+        self.assertNotEqual(result["returncode"], 0)
+
+    def test_run_tests_reports_each_case(self):
+        results = sandbox.run_tests("print(input()[::-1])", [
+            {"input": "abc\n", "expected_output": "cba\n"},
+            {"input": "xy\n", "expected_output": "xy"},
+        ])
+        self.assertEqual([r["passed"] for r in results], [True, False])
+        self.assertEqual(results[1]["actual_output"], "yx\n")
+
+    def test_memory_limit(self):
+        result = sandbox.run_python("data = bytearray(1024 * 1024 * 1024)")
+        self.assertIn("MemoryError", result["stderr"])
+
+    def test_project_files_are_not_visible(self):
+        result = sandbox.run_python(f"print(open({__file__!r}).read())")
+        self.assertIn("FileNotFoundError", result["stderr"])
+        self.assertEqual(result["stdout"], "")
+
+    def test_runs_without_privileges(self):
+        result = sandbox.run_python("import os\nprint(os.getuid(), os.getgid())\nos.chroot('/')")
+        self.assertEqual(result["stdout"], f"{jail.JAIL_UID} {jail.JAIL_UID}\n")
+        self.assertIn("PermissionError", result["stderr"])
+
+    def test_socket_module_cannot_be_reimported(self):
+        code = (
+            "import sys\nsys.modules.pop('_socket', None)\nsys.modules.pop('socket', None)\n"
+            "import socket\nsocket.create_connection(('1.1.1.1', 80), timeout=1)"
+        )
+        result = sandbox.run_python(code)
+        self.assertIn("Network is unreachable", result["stderr"])
+
+    def test_fork_is_limited_and_escapees_are_killed(self):
+        code = (
+            "import os, time\n"
+            "if os.fork() == 0:\n    os.setsid()\n    time.sleep(60)\n"
+            "for _ in range(20):\n    os.fork()\n"
+        )
+        result = sandbox.run_python(code)
+        self.assertIn("BlockingIOError", result["stderr"])
+        # Разом з PID namespace зникає і процес, що відв'язався через setsid
+        own = os.readlink("/proc/self/ns/pid")
+        jailed = []
+        for pid in filter(str.isdigit, os.listdir("/proc")):
+            try:
+                if os.readlink(f"/proc/{pid}/ns/pid") != own:
+                    jailed.append(pid)
+            except OSError:
+                pass
+        self.assertEqual(jailed, [])
+
+    def test_planted_output_file_is_replaced(self):
+        # Перший кейс підкладає відповідь другого — раннер має відкрити out1 з нуля
+        code = "import os\nif input() == 'a':\n    os.symlink('/usr', 'out1')\n    print('a')\n"
+        results = sandbox.run_tests(code, [
+            {"input": "a\n", "expected_output": "a\n"},
+            {"input": "b\n", "expected_output": "b\n"},
+        ])
+        self.assertEqual([r["passed"] for r in results], [True, False])
+        self.assertEqual(results[1]["actual_output"], "")
+
+    def test_fails_closed_without_isolation(self):
+        with mock.patch.object(sandbox, "jail_mounts", return_value=[("/nonexistent", "/nonexistent")]):
+            with self.assertRaises(sandbox.SandboxUnavailable):
+                sandbox.run_python("print('hi')")
+        with mock.patch.object(sandbox, "is_available", return_value=False):
+            with self.assertRaises(sandbox.SandboxUnavailable):
+                sandbox.run_tests("print('hi')", [{"input": "", "expected_output": "hi"}])
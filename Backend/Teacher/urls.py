@@ -1,6 +1,10 @@
 from django.urls import path
-from .views import CheckHomeworkAPIView
+from .views import BatchCheckHomeworkAPIView, CheckHomeworkAPIView, SubmissionHistoryAPIView
+from .async_views import AsyncCheckHomeworkAPIView
 
 urlpatterns = [
     path("homeworks/<int:module_id>/check/", CheckHomeworkAPIView.as_view()),
+    path("homeworks/check_batch/", BatchCheckHomeworkAPIView.as_view()),
+    path("homeworks/<int:module_id>/submissions/", SubmissionHistoryAPIView.as_view()),
+    path("async/homeworks/<int:module_id>/check/", AsyncCheckHomeworkAPIView.as_view()),
 ]
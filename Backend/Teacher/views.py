@@ -1,28 +1,141 @@
-import os
-from pathlib import Path
-from dotenv import load_dotenv
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 import json
+import time
 
+from Auth.streaks import record_activity, record_activity_many
+from Auth.throttling import bucket_capacity, enforce_generation_limits
+from Courses import llm
+from Courses.llm import chat_completion
 from Courses.views import safe_json_parse
 from Courses.models import *
+from . import precheck, review_cache
+from .models import Submission
 
-# Load .env
-env_path = Path(__file__).resolve().parent.parent / '.env'
-load_dotenv(dotenv_path=env_path)
-api_key = os.environ.get("OPENROUTER_API_KEY")
 
-if not api_key:
-    raise ValueError("OpenRouter API key not found.")
+REVIEW_SYSTEM_PROMPT = """
+You are a strict Senior Code Reviewer. 
+Your goal is to grade the student's submission based strictly on the provided Task Description.
+
+OUTPUT JSON FORMAT:
+{
+    "grade": 0-100 (integer),
+    "feedback": "Detailed explanation in Ukrainian. Use Markdown. Criticize bad practices, praise good ones. Be constructive but professional."
+}
+
+CRITERIA:
+1. If code does not work or misses the point -> Low score (<50).
+2. If logic is correct but style is bad -> Medium score (50-80).
+3. If clean and correct -> High score (80-100).
+4. Language: Ukrainian.
+
+If "static_analysis" is present, the syntax is already verified and the metrics
+(and sample run, if any) are computed locally. Trust them, do not recount them.
+If it has "tests", all automated tests passed: the code is correct, grade style and readability (70-100).
+Keep feedback concise: logic and correctness first, metrics only when they reveal a problem.
+"""
+
+
+SUBMISSION_HISTORY_LIMIT = 50
+
+
+def build_review_messages(homework, submission, static_analysis=None):
+    payload = {
+        "task_description": homework.content,
+        "student_code": submission
+    }
+    if static_analysis:
+        payload["static_analysis"] = static_analysis
+    return [
+        {"role": "system", "content": REVIEW_SYSTEM_PROMPT},
+        {"role": "user", "content": json.dumps(payload, ensure_ascii=False)}
+    ]
+
+
+def review_task_hash(homework):
+    return review_cache.task_hash(homework.content, REVIEW_SYSTEM_PROMPT, llm.default_model())
+
+
+def previous_review(homework, code_hash):
+    """(grade, feedback) останньої перевіреної здачі цього ДЗ, якщо код той самий."""
+    if (
+        homework.grade is not None
+        and homework.user_submission
+        and review_cache.code_hash(homework.user_submission) == code_hash
+    ):
+        return homework.grade, homework.ai_feedback
+    return None
+
+
+def find_cached_review(homework, task_hash, code_hash):
+    """(grade, feedback) з кешу рев'ю або з останньої перевіреної здачі цього ДЗ."""
+    cached = review_cache.lookup(task_hash, code_hash)
+    if cached:
+        return cached.grade, cached.feedback
+    return previous_review(homework, code_hash)
 
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=api_key,
-)
 
+def save_review(user, homework, submission, code_hash, grade, feedback, review_status, started):
+    """Остання здача — в HomeworkModel, кожна спроба — в історію Submission, день — у стрік."""
+    homework.user_submission = submission
+    homework.grade = grade
+    homework.ai_feedback = feedback
+    homework.save()
+
+    Submission.objects.create(
+        homework=homework,
+        user=user,
+        code=submission,
+        code_hash=code_hash,
+        grade=grade,
+        feedback=feedback,
+        status=review_status,
+        latency_ms=int((time.perf_counter() - started) * 1000),
+    )
+    record_activity(user)
+    return {"grade": grade, "feedback": feedback, "status": review_status}
+
+
+def review_request(user, homework, submission, report):
+    """Параметри LLM-запиту рев'ю — спільні для sync- і async-в'юхи."""
+    return dict(
+        user_id=user.id,
+        temperature=0.3,
+        response_format={ "type": "json_object" },
+        messages=build_review_messages(homework, submission, report["static_analysis"])
+    )
+
+
+def parse_review(report, response):
+    """Відповідь рев'юера -> (grade, feedback)."""
+    ai_raw = response.choices[0].message.content
+    parsed_feedback = safe_json_parse(ai_raw)
+
+    grade = precheck.final_grade(report, parsed_feedback.get("grade", 0))
+    feedback = parsed_feedback.get("feedback", "No feedback generated.")
+    return grade, feedback
+
+
+def ai_review(user, homework, submission, report):
+    """LLM-рев'ю здачі, що пройшла precheck. Повертає (grade, feedback)."""
+    response = chat_completion("review", **review_request(user, homework, submission, report))
+    return parse_review(report, response)
+
+
+def with_tests(data, report):
+    """Відповідь + результати автотестів по кейсах, якщо вони запускались."""
+    if report["tests"] is not None:
+        data["tests"] = [
+            {key: case[key] for key in ("passed", "timed_out", "error", "duration_ms")}
+            for case in report["tests"]
+        ]
+    return data
 
 
 class CheckHomeworkAPIView(APIView):
@@ -37,16 +150,15 @@ class CheckHomeworkAPIView(APIView):
 
     def post(self, request, module_id):
         user = request.user
-        request.user.update_streak()
         if not user.is_authenticated:
             return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
 
         # === ЗМІНА ТУТ ===
         # Ми шукаємо домашку, яка прив'язана до конкретного модуля (module__id=module_id)
-        # І перевіряємо власника через ланцюжок module -> course -> owner
+        # І перевіряємо власника (owner продубльований на ДЗ — без join-ів)
         homework = HomeworkModel.objects.filter(
-            module__id=module_id, 
-            module__course__owner=user
+            module_id=module_id,
+            owner=user
         ).first()
 
         if not homework:
@@ -61,65 +173,263 @@ class CheckHomeworkAPIView(APIView):
             return Response({"error": "Submission is empty. Write some code."}, status=status.HTTP_400_BAD_REQUEST)
 
         # === Оптимізація/Кешування ===
-        if homework.user_submission == new_submission and homework.grade is not None:
-            return Response({
-                "grade": homework.grade,
-                "feedback": homework.ai_feedback,
-                "status": "cached"
-            }, status=status.HTTP_200_OK)
+        # Той самий код з точністю до пробілів і коментарів (в т.ч. від інших студентів) — без LLM
+        started = time.perf_counter()
+        code_hash = review_cache.code_hash(new_submission)
+        task_hash = review_task_hash(homework)
+        cached = find_cached_review(homework, task_hash, code_hash)
+        if cached:
+            return Response(
+                save_review(user, homework, new_submission, code_hash, *cached, Submission.STATUS_CACHED, started),
+                status=status.HTTP_200_OK
+            )
+
+        # === Ліміти: 429 + Retry-After, якщо юзер перевіряє занадто часто ===
+        # До precheck: автотести запускають пісочницю, це теж недешево
+        enforce_generation_limits(user, "review")
+
+        # === Локальна перевірка: код, що не парситься, не йде в LLM ===
+        report = precheck.precheck(homework, new_submission)
+        if report["failed"]:
+            data = save_review(user, homework, new_submission, code_hash, report["grade"], report["feedback"],
+                               report["status"], started)
+            return Response(with_tests(data, report), status=status.HTTP_200_OK)
 
         # === AI Code Review ===
-        payload = {
-            "task_description": homework.content,
-            "student_code": new_submission
-        }
+        try:
+            grade, feedback = ai_review(user, homework, new_submission, report)
+            review_cache.store(task_hash, code_hash, grade, feedback)
+
+            data = save_review(user, homework, new_submission, code_hash, grade, feedback, Submission.STATUS_FRESH, started)
+            return Response(with_tests(data, report), status=status.HTTP_200_OK)
+
+        except Exception as e:
+            return Response({"error": f"AI Check failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class SubmissionHistoryAPIView(APIView):
+    """
+    GET /homeworks/<module_id>/submissions/
+    Історія спроб по ДЗ модуля, новіші першими.
+    """
+
+    def get(self, request, module_id):
+        user = request.user
+        if not user.is_authenticated:
+            return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
 
+        homework = HomeworkModel.objects.filter(module_id=module_id, owner=user).only("id").first()
+        if not homework:
+            return Response({"error": "Homework not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        submissions = (
+            Submission.objects
+            .filter(homework=homework)
+            .order_by("-created_at", "-id")
+            .values("id", "code", "grade", "feedback", "status", "latency_ms", "created_at")
+            [:SUBMISSION_HISTORY_LIMIT]
+        )
+        return Response(list(submissions), status=status.HTTP_200_OK)
+
+
+def ndjson_line(data):
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+
+def parse_batch_items(items):
+    """[(module_id, submission)] з тіла пакетного запиту; module_id=None — елемент зіпсований."""
+    parsed = []
+    for item in items:
         try:
-            response = client.chat.completions.create(
-                model="openai/gpt-4o-mini",
-                temperature=0.3,
-                response_format={ "type": "json_object" },
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """
-You are a strict Senior Code Reviewer. 
-Your goal is to grade the student's submission based strictly on the provided Task Description.
+            parsed.append((int(item["module_id"]), (item.get("submission") or "").strip()))
+        except (TypeError, KeyError, ValueError, AttributeError):
+            parsed.append((None, ""))
+    return parsed
 
-OUTPUT JSON FORMAT:
-{
-    "grade": 0-100 (integer),
-    "feedback": "Detailed explanation in Ukrainian. Use Markdown. Criticize bad practices, praise good ones. Be constructive but professional."
-}
 
-CRITERIA:
-1. If code does not work or misses the point -> Low score (<50).
-2. If logic is correct but style is bad -> Medium score (50-80).
-3. If clean and correct -> High score (80-100).
-4. Language: Ukrainian.
-"""
-                    },
-                    {
-                        "role": "user",
-                        "content": json.dumps(payload, ensure_ascii=False)
-                    }
-                ]
+def review_unique(user, homework, submission, task_hash, code_hash):
+    """
+    Рев'ю однієї унікальної здачі з пакета: precheck, LLM.
+    Ліміти вже списано на весь пакет у BatchCheckHomeworkAPIView.post.
+    Виконується в потоці пулу, тож з'єднання з БД закриваємо самі.
+    """
+    try:
+        report = precheck.precheck(homework, submission)
+        if report["failed"]:
+            return with_tests(
+                {"grade": report["grade"], "feedback": report["feedback"], "status": report["status"]}, report
             )
 
-            ai_raw = response.choices[0].message.content
-            parsed_feedback = safe_json_parse(ai_raw)
+        grade, feedback = ai_review(user, homework, submission, report)
+        review_cache.store(task_hash, code_hash, grade, feedback)
+        return with_tests({"grade": grade, "feedback": feedback, "status": Submission.STATUS_FRESH}, report)
+    except Exception as e:
+        return {"error": f"AI Check failed: {str(e)}"}
+    finally:
+        connection.close()
+
+
+def save_batch_reviews(user, reviews):
+    """
+    reviews — [(index, homework, submission, code_hash, data, latency_ms)].
+    Одне ДЗ могло трапитись у пакеті кілька разів: в HomeworkModel лишається
+    остання за порядком у запиті здача, в історію йдуть усі. У стрік, як і
+    в save_review, іде лише активність самого user: викладач, що перевіряє
+    групу, не додає студентам днів.
+    """
+    homeworks = {}
+    submissions = []
+    now = timezone.now()
+    for index, homework, submission, code_hash, data, latency_ms in sorted(reviews, key=lambda r: r[0]):
+        homework.user_submission = submission
+        homework.grade = data["grade"]
+        homework.ai_feedback = data["feedback"]
+        homework.updated_at = now
+        homeworks[homework.id] = homework
+        submissions.append(Submission(
+            homework=homework,
+            user_id=homework.owner_id,
+            code=submission,
+            code_hash=code_hash,
+            grade=data["grade"],
+            feedback=data["feedback"],
+            status=data["status"],
+            latency_ms=latency_ms,
+        ))
 
-            homework.user_submission = new_submission
-            homework.grade = parsed_feedback.get("grade", 0)
-            homework.ai_feedback = parsed_feedback.get("feedback", "No feedback generated.")
-            
-            homework.save()
+    if not submissions:
+        return
+    with transaction.atomic():
+        HomeworkModel.objects.bulk_update(
+            list(homeworks.values()), ["user_submission", "grade", "ai_feedback", "updated_at"]
+        )
+        Submission.objects.bulk_create(submissions)
+    record_activity_many([submission.user_id for submission in submissions if submission.user_id == user.id])
 
-            return Response({
-                "grade": homework.grade,
-                "feedback": homework.ai_feedback,
-                "status": "fresh"
-            }, status=status.HTTP_200_OK)
 
-        except Exception as e:
-            return Response({"error": f"AI Check failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+class BatchCheckHomeworkAPIView(APIView):
+    """
+    POST /teacher/homeworks/check_batch/
+    Body: { "items": [{"module_id": 1, "submission": "print('hello world')"}, ...] }
+
+    Перевірка всієї групи одним запитом замість сотні викликів check/.
+    Однакові здачі (та сама задача + нормалізований код) рев'юються раз,
+    унікальні — паралельно, не більше REVIEW_BATCH_CONCURRENCY одночасно.
+
+    Відповідь — NDJSON: рядок {"index", "module_id", ...} на кожну здачу,
+    щойно вона готова (у порядку готовності), і {"done": true, ...} у кінці.
+    HomeworkModel і історія Submission пишуться пачкою після останнього рев'ю.
+
+    Викладач (is_staff) перевіряє ДЗ будь-якого студента, решта — лише свої.
+
+    Ліміти ті самі, що в check/: токен RATE_LIMITS["review"] на кожну
+    унікальну некешовану здачу, списуються разом до початку стріму —
+    429 + Retry-After, а не помилка посеред пакета. Нових здач більше,
+    ніж вміщує відро, — 400: такий пакет не пройде ніколи.
+    """
+
+    def post(self, request):
+        user = request.user
+        if not user.is_authenticated:
+            return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        items = request.data.get("items") if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({"error": "Expected a non-empty list of items."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.REVIEW_BATCH_MAX_ITEMS:
+            return Response(
+                {"error": f"Too many items: at most {settings.REVIEW_BATCH_MAX_ITEMS} per batch."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        parsed = parse_batch_items(items)
+        homeworks = HomeworkModel.objects.filter(module_id__in={m for m, _ in parsed if m is not None})
+        if not user.is_staff:
+            homeworks = homeworks.filter(owner=user)
+        homeworks = {homework.module_id: homework for homework in homeworks}
+
+        # Здачі з однаковим (task_hash, code_hash) — одна група, одне рев'ю
+        errors = []
+        groups = {}
+        task_hashes = {}
+        for index, (module_id, submission) in enumerate(parsed):
+            homework = homeworks.get(module_id)
+            if module_id is None:
+                errors.append({"index": index, "error": "Invalid item: expected module_id and submission."})
+            elif not homework:
+                errors.append({"index": index, "module_id": module_id,
+                               "error": "Homework for this module not found. Generate it first."})
+            elif not submission:
+                errors.append({"index": index, "module_id": module_id, "error": "Submission is empty. Write some code."})
+            else:
+                if homework.id not in task_hashes:
+                    task_hashes[homework.id] = review_task_hash(homework)
+                key = (task_hashes[homework.id], review_cache.code_hash(submission))
+                groups.setdefault(key, []).append((index, homework, submission))
+
+        cached_results = review_cache.lookup_many(list(groups))
+        cached = {}
+        for key, group in groups.items():
+            if key in cached_results:
+                cached[key] = (cached_results[key].grade, cached_results[key].feedback)
+                continue
+            for _, homework, _ in group:
+                previous = previous_review(homework, key[1])
+                if previous:
+                    cached[key] = previous
+                    break
+
+        # === Ліміти: токен на кожне майбутнє рев'ю, одним списанням, поки ще можна віддати 429 ===
+        fresh = len(groups) - len(cached)
+        capacity = bucket_capacity("review")
+        if capacity is not None and fresh > capacity:
+            return Response(
+                {"error": f"Too many new submissions: at most {capacity} uncached reviews per batch."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if fresh:
+            enforce_generation_limits(user, "review", fresh)
+
+        def stream():
+            started = time.perf_counter()
+            reviews = []
+            summary = {"done": True, "total": len(items), "unique": len(groups), "cached": 0, "errors": len(errors)}
+
+            def results(key, data):
+                latency_ms = int((time.perf_counter() - started) * 1000)
+                for index, homework, submission in groups[key]:
+                    if "error" in data:
+                        summary["errors"] += 1
+                    else:
+                        reviews.append((index, homework, submission, key[1], data, latency_ms))
+                    yield ndjson_line({"index": index, "module_id": homework.module_id, **data})
+
+            pool = ThreadPoolExecutor(max_workers=settings.REVIEW_BATCH_CONCURRENCY)
+            try:
+                for error in errors:
+                    yield ndjson_line(error)
+
+                futures = {}
+                for key, group in groups.items():
+                    if key in cached:
+                        grade, feedback = cached[key]
+                        summary["cached"] += len(group)
+                        yield from results(key, {"grade": grade, "feedback": feedback, "status": Submission.STATUS_CACHED})
+                    else:
+                        _, homework, submission = group[0]
+                        futures[pool.submit(review_unique, user, homework, submission, *key)] = key
+
+                for future in as_completed(futures):
+                    yield from results(futures[future], future.result())
+            finally:
+                # Клієнт відключився посеред пакета — зберігаємо те, що встигли віддати
+                pool.shutdown(wait=False, cancel_futures=True)
+                save_batch_reviews(user, reviews)
+
+            yield ndjson_line(summary)
+
+        response = StreamingHttpResponse(stream(), content_type="application/x-ndjson")
+        response["Cache-Control"] = "no-cache"
+        # Щоб nginx не буферизував відповідь і результати йшли одразу
+        response["X-Accel-Buffering"] = "no"
+        return response
@@ -0,0 +1,246 @@
+"""
+Наскрізний бенчмарк API: сідує N юзерів з курсами і ганяє основні
+ендпоінти через повний Django-стек (middleware, JWT, DRF) проти
+LLM_BACKEND=stub. Для кожного ендпоінта — p50/p95/p99, requests/sec,
+помилки і середня кількість SQL-запитів на запит.
+
+    python -m benchmarks.bench_api --users 20 --requests 200 --threads 8 --json bench.json
+    python -m benchmarks.bench_api --compare bench.json   # порівняти з попереднім прогоном
+"""
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from benchmarks.common import (
+    auth_header,
+    create_test_database,
+    create_user,
+    destroy_test_database,
+    print_table,
+    setup_django,
+    summarize,
+    write_json,
+)
+
+PASSWORD = "bench-password-1"
+SUBMISSION = "def solve(items):\n    return sorted(items)[:{n}]\n"
+
+
+def seed(users, courses, modules, lessons):
+    """Юзери з курсами; половина уроків кожного курсу вже згенерована."""
+    from Courses.models import CourseModel, HomeworkModel, LessonModel, ModuleModel
+
+    content = "# Урок\n\n" + "Текст уроку. " * 300
+    seeded = []
+    for u in range(users):
+        user = create_user(f"bench{u}", PASSWORD)
+        data = {"user": user, "headers": auth_header(user), "courses": [], "modules": [], "cold": [], "warm": []}
+        for c in range(courses):
+            course = CourseModel.objects.create(owner=user, topic=f"Курс {c}")
+            module_objs = ModuleModel.objects.bulk_create(
+                ModuleModel(course=course, title=f"Модуль {m}", position=m + 1) for m in range(modules)
+            )
+            HomeworkModel.objects.bulk_create(
+                HomeworkModel(module=module, owner=user, title=f"ДЗ {module.title}", content="# ДЗ\n\nНапишіть функцію.")
+                for module in module_objs
+            )
+            lesson_objs = LessonModel.objects.bulk_create(
+                LessonModel(
+                    module=module, course=course, owner=user, position=m * lessons + l + 1,
+                    title=f"Урок {u}.{c}.{m}.{l}", type="lecture",
+                    content=content if l % 2 else "",
+                )
+                for m, module in enumerate(module_objs) for l in range(lessons)
+            )
+            data["courses"].append(course.id)
+            data["modules"].extend(module.id for module in module_objs)
+            for lesson in lesson_objs:
+                data["warm" if lesson.content else "cold"].append(lesson.id)
+        seeded.append(data)
+    return seeded
+
+
+def scenarios(seeded):
+    """
+    Кожен сценарій — (назва, генератор запитів). Запит — (method, path, body, headers).
+    Холодні уроки і перевірки ДЗ щоразу різні, щоб справді йти в LLM.
+    """
+    users = itertools.cycle(seeded)
+    counter = itertools.count()
+
+    def register():
+        n = next(counter)
+        return "post", "/auth/register/", {
+            "username": f"new{n}", "email": f"new{n}@bench.local", "password": PASSWORD,
+        }, {}
+
+    def login():
+        user = next(users)["user"]
+        return "post", "/auth/login/", {"email": user.email, "password": PASSWORD}, {}
+
+    def course_list(fields):
+        def make():
+            return "get", f"/courses/?fields={fields}", None, next(users)["headers"]
+        return make
+
+    def course_detail():
+        data = next(users)
+        return "get", f"/courses/{data['courses'][next(counter) % len(data['courses'])]}/", None, data["headers"]
+
+    # itertools.cycle потокобезпечний, а генератор — ні
+    cold = itertools.cycle([(data, lesson_id) for data in seeded for lesson_id in data["cold"]])
+
+    def lesson_cold():
+        data, lesson_id = next(cold)
+        return "get", f"/courses/lessons/{lesson_id}/", None, data["headers"]
+
+    def lesson_cached():
+        data = next(users)
+        return "get", f"/courses/lessons/{data['warm'][next(counter) % len(data['warm'])]}/", None, data["headers"]
+
+    def homework_check():
+        data = next(users)
+        module_id = data["modules"][next(counter) % len(data["modules"])]
+        return "post", f"/teacher/homeworks/{module_id}/check/", {
+            "submission": SUBMISSION.format(n=next(counter)),
+        }, data["headers"]
+
+    return [
+        ("register", register),
+        ("login", login),
+        ("course_list summary", course_list("summary")),
+        ("course_list full", course_list("full")),
+        ("course_detail", course_detail),
+        ("lesson cold (LLM)", lesson_cold),
+        ("lesson cached", lesson_cached),
+        ("homework_check (LLM)", homework_check),
+    ]
+
+
+def run_scenario(name, make_request, requests, threads, warmup):
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    def one(_):
+        method, path, body, headers = make_request()
+        client = Client(headers=headers)
+        start = time.perf_counter()
+        # connection — своє для кожного потоку, тож рахуємо лише запити цього HTTP-виклику
+        with CaptureQueriesContext(connection) as queries:
+            if method == "post":
+                response = client.post(path, body, content_type="application/json")
+            else:
+                response = client.get(path)
+        elapsed = time.perf_counter() - start
+        return elapsed, len(queries), response.status_code < 400
+
+    def worker(chunk):
+        try:
+            return [one(i) for i in chunk]
+        finally:
+            connection.close()
+
+    # Перші запити платять за імпорти і прогрів резолвера URL — їх не міряємо
+    for i in range(warmup):
+        one(i)
+
+    chunks = [range(i, requests, threads) for i in range(threads)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = [r for part in pool.map(worker, chunks) for r in part]
+    elapsed = time.perf_counter() - start
+
+    row = {"endpoint": name}
+    row.update(summarize(
+        [r[0] for r in results], elapsed,
+        errors=sum(1 for r in results if not r[2]),
+        queries=round(sum(r[1] for r in results) / len(results), 1),
+    ))
+    return row
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, rows):
+    with open(old_path, encoding="utf-8") as f:
+        old = {row["endpoint"]: row for row in json.load(f)["results"]}
+
+    def delta(new, before):
+        return f"{(new - before) / before * 100:+.0f}%" if before else "n/a"
+
+    table = []
+    for row in rows:
+        before = old.get(row["endpoint"])
+        if not before:
+            continue
+        table.append({
+            "endpoint": row["endpoint"],
+            "p95_ms": f"{before['p95_ms']} -> {row['p95_ms']} ({delta(row['p95_ms'], before['p95_ms'])})",
+            "rps": f"{before['rps']} -> {row['rps']} ({delta(row['rps'], before['rps'])})",
+            "queries": f"{before['queries']} -> {row['queries']}",
+        })
+    print(f"\nvs {old_path}:")
+    print_table(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--courses", type=int, default=3, help="курсів на юзера")
+    parser.add_argument("--modules", type=int, default=5)
+    parser.add_argument("--lessons", type=int, default=4, help="уроків у модулі")
+    parser.add_argument("--requests", type=int, default=200, help="запитів на ендпоінт")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=3, help="невраховані запити перед кожним ендпоінтом")
+    parser.add_argument("--latency", type=float, default=0.2, help="затримка stub-LLM, с")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--only", help="лише ендпоінти, що містять цей рядок")
+    parser.add_argument("--json", help="зберегти результати у файл")
+    parser.add_argument("--compare", help="JSON попереднього прогону для порівняння")
+    args = parser.parse_args()
+
+    # PERF_LOG_LEVEL=ERROR: під навантаженням кожен запит "повільний", а WARNING на кожен заважає і вимірам
+    setup_django(
+        LLM_BACKEND="stub", LLM_STUB_LATENCY=args.latency, LLM_STUB_JITTER=args.jitter, PERF_LOG_LEVEL="ERROR"
+    )
+    db_name = create_test_database()
+    try:
+        seeded = seed(args.users, args.courses, args.modules, args.lessons)
+        rows = [
+            run_scenario(name, make_request, args.requests, args.threads, args.warmup)
+            for name, make_request in scenarios(seeded)
+            if not args.only or args.only in name
+        ]
+    finally:
+        destroy_test_database(db_name)
+
+    print_table(rows)
+    if args.compare:
+        compare(args.compare, rows)
+    if args.json:
+        import django
+        write_json(args.json, {
+            "meta": {
+                "commit": git_commit(),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "args": vars(args),
+            },
+            "results": rows,
+        })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Sync (WSGI) vs async (ASGI) генерація уроків проти мок-LLM.
+
+Кожен запит бере новий "холодний" урок, тож кожен запит реально
+йде в LLM. Sync-режим — пул потоків, як WSGI-воркер з N тредами;
+async-режим — один event loop (один ASGI-воркер) з N одночасних запитів.
+
+    python -m benchmarks.bench_async_vs_sync --requests 200 --threads 8 --concurrency 200
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import (
+    auth_header,
+    create_test_database,
+    create_user,
+    destroy_test_database,
+    print_table,
+    setup_django,
+    summarize,
+    write_json,
+)
+from benchmarks.mock_llm import start_mock_llm
+
+
+def seed_lessons(user, count):
+    from Courses.models import CourseModel, LessonModel, ModuleModel
+
+    course = CourseModel.objects.create(owner=user, topic="Benchmark")
+    module = ModuleModel.objects.create(course=course, title="Module")
+    lessons = LessonModel.objects.bulk_create(
+        LessonModel(module=module, course=course, owner=user, position=i + 1, title=f"Lesson {i}", type="lecture")
+        for i in range(count)
+    )
+    return [lesson.id for lesson in lessons]
+
+
+def run_sync(lesson_ids, headers, threads):
+    from django.db import connection
+    from django.test import Client
+
+    def one(lesson_id):
+        start = time.perf_counter()
+        response = Client().get(f"/courses/lessons/{lesson_id}/", headers=headers)
+        connection.close()
+        assert response.status_code == 200, response.content
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(one, lesson_ids))
+    return summarize(latencies, time.perf_counter() - start, mode=f"sync/wsgi x{threads} threads")
+
+
+def run_async(lesson_ids, headers, concurrency):
+    from django.test import AsyncClient
+
+    async def main():
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(lesson_id):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(f"/courses/async/lessons/{lesson_id}/", headers=headers)
+                assert response.status_code == 200, response.content
+                return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one(i) for i in lesson_ids))
+        return summarize(latencies, time.perf_counter() - start, mode=f"async/asgi x{concurrency} in-flight")
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8, help="потоків у sync-режимі")
+    parser.add_argument("--concurrency", type=int, default=200, help="одночасних запитів у async-режимі")
+    parser.add_argument("--latency", type=float, default=0.5, help="затримка мок-LLM, с")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--json", help="зберегти результати у файл")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_llm(latency=args.latency, jitter=args.jitter)
+    setup_django(OPENROUTER_BASE_URL=base_url)
+    db_name = create_test_database()
+    try:
+        user = create_user()
+        headers = auth_header(user)
+        rows = [
+            run_sync(seed_lessons(user, args.requests), headers, args.threads),
+            run_async(seed_lessons(user, args.requests), headers, args.concurrency),
+        ]
+    finally:
+        destroy_test_database(db_name)
+        server.shutdown()
+
+    print_table(rows)
+    if args.json:
+        write_json(args.json, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Час матеріалізації курсу (create_course_from_json) і скільки часу
+транзакція тримає write-lock: від першого INSERT до COMMIT.
+Порівнюється з колишнім варіантом "один INSERT на рядок".
+
+    python -m benchmarks.bench_course_insert --modules 5 20 100 --lessons 5 --repeat 5
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.common import (
+    create_test_database,
+    create_user,
+    destroy_test_database,
+    print_table,
+    setup_django,
+    write_json,
+)
+
+
+def make_course_json(modules, lessons):
+    return {
+        "meta": {"topic": f"Bench {modules}x{lessons}"},
+        "modules": [
+            {
+                "title": f"Module {m}",
+                "homework_topic": f"Homework {m}",
+                "lessons": [{"title": f"Lesson {m}.{l}", "type": "lecture"} for l in range(lessons)],
+            }
+            for m in range(modules)
+        ],
+    }
+
+
+def create_course_row_by_row(user, course_json):
+    """Колишня реалізація — для порівняння."""
+    from django.db import transaction
+    from Courses.models import CourseModel, HomeworkModel, LessonModel, ModuleModel
+
+    with transaction.atomic():
+        course = CourseModel.objects.create(topic=course_json["meta"]["topic"], owner=user)
+        for module_data in course_json["modules"]:
+            module = ModuleModel.objects.create(title=module_data["title"], course=course)
+            HomeworkModel.objects.create(module=module, owner=user, title=module_data["homework_topic"], content="")
+            for lesson_data in module_data["lessons"]:
+                LessonModel.objects.create(module=module, course=course, owner=user, title=lesson_data["title"], type=lesson_data["type"])
+    return course
+
+
+def measure(func, user, course_json):
+    from django.db import connection, transaction
+
+    marks = {"queries": 0}
+
+    def wrapper(execute, sql, params, many, context):
+        if "first_write" not in marks and sql.lstrip().upper().startswith("INSERT"):
+            marks["first_write"] = time.perf_counter()
+        marks["queries"] += 1
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    with connection.execute_wrapper(wrapper):
+        with transaction.atomic():
+            func(user, course_json)
+            transaction.on_commit(lambda: marks.setdefault("commit", time.perf_counter()))
+    total = time.perf_counter() - start
+    return total, marks["commit"] - marks["first_write"], marks["queries"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", type=int, nargs="+", default=[5, 20, 100])
+    parser.add_argument("--lessons", type=int, default=5, help="уроків у модулі")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="зберегти результати у файл")
+    args = parser.parse_args()
+
+    setup_django()
+    from Courses.views import create_course_from_json
+
+    db_name = create_test_database()
+    rows = []
+    try:
+        user = create_user()
+        for modules in args.modules:
+            course_json = make_course_json(modules, args.lessons)
+            for name, func in (("row-by-row", create_course_row_by_row), ("bulk", create_course_from_json)):
+                samples = [measure(func, user, course_json) for _ in range(args.repeat)]
+                rows.append({
+                    "modules": modules,
+                    "rows": 1 + modules * (2 + args.lessons),
+                    "impl": name,
+                    "queries": samples[0][2],
+                    "insert_ms": round(statistics.median(s[0] for s in samples) * 1000, 2),
+                    "lock_hold_ms": round(statistics.median(s[1] for s in samples) * 1000, 2),
+                })
+    finally:
+        destroy_test_database(db_name)
+
+    print_table(rows)
+    if args.json:
+        write_json(args.json, rows)
+
+
+if __name__ == "__main__":
+    main()
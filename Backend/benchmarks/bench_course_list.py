@@ -0,0 +1,154 @@
+"""
+GET /courses/ для юзера з великою кількістю курсів: колишній
+"усе дерево одним списком" проти сторінок fields=summary / fields=full.
+Міряє час, кількість SQL-запитів, розмір відповіді і пік пам'яті Python.
+
+    python -m benchmarks.bench_course_list --courses 500 --limit 20
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.common import (
+    create_test_database,
+    create_user,
+    destroy_test_database,
+    print_table,
+    setup_django,
+    write_json,
+)
+
+
+def seed(user, courses, modules, lessons, content_kb):
+    from Courses.models import CourseModel, HomeworkModel, LessonModel, ModuleModel
+
+    content = ("# Lesson\n" + "x" * 1023) * content_kb
+    for c in range(courses):
+        course = CourseModel.objects.create(owner=user, topic=f"Course {c}")
+        module_objs = ModuleModel.objects.bulk_create(
+            ModuleModel(course=course, title=f"Module {m}", position=m + 1) for m in range(modules)
+        )
+        HomeworkModel.objects.bulk_create(
+            HomeworkModel(module=module, owner=user, title="Homework", content="") for module in module_objs
+        )
+        LessonModel.objects.bulk_create(
+            LessonModel(
+                module=module, course=course, owner=user, position=m * lessons + l + 1,
+                title=f"Lesson {l}", type="lecture", content=content,
+            )
+            for m, module in enumerate(module_objs) for l in range(lessons)
+        )
+
+
+def legacy_view():
+    """Колишній ChatAPIView.get — все дерево, всі поля, без пагінації."""
+    from rest_framework.response import Response
+    from rest_framework.views import APIView
+    from Courses.models import CourseModel
+
+    class LegacyCourseList(APIView):
+        def get(self, request):
+            courses = (
+                CourseModel.objects
+                .filter(owner=request.user)
+                .prefetch_related("modules__lessons", "modules__homeworks")
+                .order_by('-created_at')
+            )
+            data = []
+            for course in courses:
+                modules = []
+                for module in course.modules.all():
+                    hw_obj = module.homeworks.first()
+                    modules.append({
+                        "id": module.id,
+                        "title": module.title,
+                        "homework": hw_obj.content if hw_obj else "",
+                        "lessons": [
+                            {"id": l.id, "order_id": l.position, "title": l.title, "type": l.type}
+                            for l in module.lessons.all()
+                        ],
+                    })
+                data.append({"id": course.id, "topic": course.topic, "modules": modules})
+            return Response(data)
+
+    return LegacyCourseList.as_view()
+
+
+def measure(view, user, query, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    factory = APIRequestFactory()
+
+    def call():
+        request = factory.get("/courses/", query)
+        force_authenticate(request, user=user)
+        response = view(request)
+        response.render()
+        assert response.status_code == 200, response.content
+        return response
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+
+    # Запити і пам'ять — окремим прогоном, щоб tracemalloc не псував час
+    connection.queries_log.clear()
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+        response = call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "queries": len(queries),
+        "response_kb": round(len(response.content) / 1024, 1),
+        "peak_mem_kb": round(peak / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=500)
+    parser.add_argument("--modules", type=int, default=5)
+    parser.add_argument("--lessons", type=int, default=4, help="уроків у модулі")
+    parser.add_argument("--content-kb", type=int, default=4, help="розмір content кожного уроку")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="зберегти результати у файл")
+    args = parser.parse_args()
+
+    setup_django()
+    from Courses.views import ChatAPIView
+
+    db_name = create_test_database()
+    try:
+        user = create_user()
+        seed(user, args.courses, args.modules, args.lessons, args.content_kb)
+
+        view = ChatAPIView.as_view()
+        cases = [
+            ("legacy (all, no paging)", legacy_view(), {}),
+            (f"summary limit={args.limit}", view, {"fields": "summary", "limit": args.limit}),
+            (f"full limit={args.limit}", view, {"fields": "full", "limit": args.limit}),
+        ]
+        rows = []
+        for name, case_view, query in cases:
+            row = {"mode": name}
+            row.update(measure(case_view, user, query, args.repeat))
+            rows.append(row)
+    finally:
+        destroy_test_database(db_name)
+
+    print_table(rows)
+    if args.json:
+        write_json(args.json, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Пропускна здатність конкурентних записів у БД: N потоків одночасно
+створюють курси (create_course_from_json в transaction.atomic),
+зберігають ДЗ і роблять "прочитав -> записав" у транзакції.
+
+Профілі SQLite в одному процесі:
+    sqlite-default  — як було: rollback journal, DEFERRED, timeout 5 с
+    sqlite-wal      — settings.py: WAL, synchronous=NORMAL, busy_timeout, IMMEDIATE
+
+    python -m benchmarks.bench_db_writers --threads 8 --ops 400
+
+PostgreSQL (потрібен запущений сервер і права на CREATE DATABASE):
+    DB_ENGINE=postgres POSTGRES_USER=... POSTGRES_PASSWORD=... python -m benchmarks.bench_db_writers
+"""
+import argparse
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import (
+    create_test_database,
+    create_user,
+    destroy_test_database,
+    print_table,
+    setup_django,
+    summarize,
+    write_json,
+)
+
+# Django за замовчуванням, без жодного тюнінгу
+SQLITE_DEFAULT_OPTIONS = {"timeout": 5}
+
+
+def course_json(n):
+    return {
+        "meta": {"topic": f"Курс {n}"},
+        "modules": [
+            {
+                "title": f"Модуль {m}",
+                "homework_topic": f"ДЗ {m}",
+                "lessons": [{"title": f"Урок {m}.{l}", "type": "lecture"} for l in range(4)],
+            }
+            for m in range(5)
+        ],
+    }
+
+
+def make_operations(user):
+    from django.db import transaction
+    from Courses.models import CourseModel, HomeworkModel, LessonModel
+    from Courses.views import create_course_from_json
+
+    seed = create_course_from_json(user, course_json("seed"))
+    homework_ids = list(HomeworkModel.objects.filter(module__course=seed).values_list("id", flat=True))
+    lesson_ids = list(LessonModel.objects.filter(course=seed).values_list("id", flat=True))
+
+    def create_course(n):
+        create_course_from_json(user, course_json(n))
+
+    def save_homework(n):
+        # Як generate_homework_content: save() ДЗ + touch курсу
+        homework = HomeworkModel.objects.get(id=random.choice(homework_ids))
+        homework.content = f"# ДЗ {n}\n" + "Завдання. " * 200
+        homework.save()
+        CourseModel.touch(seed.id)
+
+    def read_then_write(n):
+        # Транзакція, що спершу читає — у SQLite з DEFERRED саме вона падає одразу
+        with transaction.atomic():
+            lesson = LessonModel.objects.get(id=random.choice(lesson_ids))
+            lesson.content = f"# Урок {n}\n" + "Текст. " * 200
+            lesson.save(update_fields=["content", "updated_at"])
+
+    return [(create_course, 1), (save_homework, 2), (read_then_write, 2)]
+
+
+def run_profile(name, threads, ops):
+    from django.db import OperationalError, connection
+
+    user = create_user(f"writer-{name}")
+    operations = make_operations(user)
+    funcs = [func for func, weight in operations for _ in range(weight)]
+
+    def one(n):
+        func = random.choice(funcs)
+        start = time.perf_counter()
+        try:
+            func(n)
+            error = None
+        except OperationalError as e:
+            error = str(e)
+        return func.__name__, time.perf_counter() - start, error
+
+    def worker(chunk):
+        try:
+            return [one(n) for n in chunk]
+        finally:
+            connection.close()
+
+    chunks = [range(i, ops, threads) for i in range(threads)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = [r for part in pool.map(worker, chunks) for r in part]
+    elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if r[2] is None]
+    errors = Counter(r[2] for r in results if r[2] is not None)
+    row = {"profile": name}
+    # requests/rps — лише успішні коміти
+    row.update(summarize(
+        [r[1] for r in ok], elapsed,
+        errors=sum(errors.values()),
+        error_types="; ".join(f"{e} x{c}" for e, c in errors.items()),
+    ))
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=400, help="операцій запису на профіль")
+    parser.add_argument("--json", help="зберегти результати у файл")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+
+    if connection.vendor == "sqlite":
+        profiles = [("sqlite-default", SQLITE_DEFAULT_OPTIONS), ("sqlite-wal", dict(connection.settings_dict["OPTIONS"]))]
+    else:
+        profiles = [(connection.vendor, None)]
+
+    rows = []
+    for name, options in profiles:
+        if options is not None:
+            connection.close()
+            connection.settings_dict["OPTIONS"] = dict(options)
+        db_name = create_test_database()
+        try:
+            rows.append(run_profile(name, args.threads, args.ops))
+        finally:
+            connection.close()
+            destroy_test_database(db_name)
+
+    print_table(rows)
+    if args.json:
+        write_json(args.json, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Перевірка ДЗ цілої групи: N викликів teacher/homeworks/<id>/check/ підряд
+(як зараз робить фронт) проти одного POST teacher/homeworks/check_batch/.
+LLM — LLM_BACKEND=stub із затримкою --latency. Частина студентів здає
+ту саму програму (--duplicates), як воно і буває з простими задачами.
+Перед кожним прогоном кеш рев'ю і здачі чистяться.
+
+    python -m benchmarks.bench_review_batch --students 200 --latency 0.5 --concurrency 1 8 16
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.common import (
+    auth_header,
+    create_test_database,
+    create_user,
+    destroy_test_database,
+    print_table,
+    setup_django,
+    write_json,
+)
+
+TASK = "# ДЗ\n\nНапишіть функцію solve(items), що повертає відсортований список."
+SOLUTIONS = [
+    "def solve(items):\n    return sorted(items)\n",
+    "def solve(items):\n    items.sort()\n    return items\n",
+    "def solve(items):\n    return list(sorted(items))\n",
+]
+
+
+def seed(students):
+    from Courses.models import CourseModel, HomeworkModel, ModuleModel
+
+    teacher = create_user("teacher")
+    teacher.is_staff = True
+    teacher.save()
+
+    seeded = []
+    for s in range(students):
+        user = create_user(f"student{s}")
+        course = CourseModel.objects.create(owner=user, topic="Python")
+        module = ModuleModel.objects.create(course=course, title="Модуль 1", position=1)
+        HomeworkModel.objects.create(module=module, owner=user, title="ДЗ", content=TASK)
+        seeded.append({"module_id": module.id, "headers": auth_header(user)})
+    return teacher, seeded
+
+
+def make_submissions(seeded, duplicates):
+    """duplicates — частка студентів з однією з типових відповідей, решта пишуть своє."""
+    items = []
+    for n, data in enumerate(seeded):
+        if random.random() < duplicates:
+            code = random.choice(SOLUTIONS)
+        else:
+            code = f"def solve(items):\n    result = sorted(items)\n    return result[:{n + 1000}]\n"
+        items.append({"module_id": data["module_id"], "submission": code})
+    return items
+
+
+def reset():
+    from Courses.models import HomeworkModel
+    from Teacher.models import ReviewResult, Submission
+
+    ReviewResult.objects.all().delete()
+    Submission.objects.all().delete()
+    HomeworkModel.objects.update(user_submission=None, grade=None, ai_feedback=None)
+
+
+def run_serial(seeded, items):
+    from django.test import Client
+
+    reset()
+    start = time.perf_counter()
+    errors = 0
+    for data, item in zip(seeded, items):
+        response = Client(headers=data["headers"]).post(
+            f"/teacher/homeworks/{item['module_id']}/check/", {"submission": item["submission"]},
+            content_type="application/json",
+        )
+        errors += response.status_code >= 400
+    elapsed = time.perf_counter() - start
+    return {"mode": "serial check/", "concurrency": 1, "elapsed_s": round(elapsed, 2),
+            "first_result_ms": "", "llm_calls": "", "errors": errors}
+
+
+def run_batch(teacher, items, concurrency):
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    reset()
+    with override_settings(REVIEW_BATCH_CONCURRENCY=concurrency):
+        start = time.perf_counter()
+        response = Client(headers=auth_header(teacher)).post(
+            "/teacher/homeworks/check_batch/", {"items": items}, content_type="application/json",
+        )
+        first = None
+        lines = []
+        for chunk in response.streaming_content:
+            if first is None:
+                first = time.perf_counter() - start
+            lines.extend(chunk.splitlines())
+        elapsed = time.perf_counter() - start
+
+    summary = json.loads(lines[-1])
+    return {"mode": "check_batch", "concurrency": concurrency, "elapsed_s": round(elapsed, 2),
+            "first_result_ms": round((first or 0) * 1000, 1),
+            "llm_calls": summary["unique"] - summary["cached"], "errors": summary["errors"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="частка однакових здач")
+    parser.add_argument("--latency", type=float, default=0.5, help="затримка stub-LLM, с")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 16])
+    parser.add_argument("--skip-serial", action="store_true")
+    parser.add_argument("--json", help="зберегти результати у файл")
+    args = parser.parse_args()
+
+    setup_django(LLM_BACKEND="stub", LLM_STUB_LATENCY=args.latency, LLM_STUB_JITTER=0)
+    random.seed(42)
+    db_name = create_test_database()
+    try:
+        teacher, seeded = seed(args.students)
+        items = make_submissions(seeded, args.duplicates)
+        rows = [] if args.skip_serial else [run_serial(seeded, items)]
+        rows += [run_batch(teacher, items, concurrency) for concurrency in args.concurrency]
+    finally:
+        destroy_test_database(db_name)
+
+    print(f"students={args.students}  duplicates={args.duplicates}  latency={args.latency}s")
+    print_table(rows)
+    if args.json:
+        write_json(args.json, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Пропускна здатність пісочниці автотестів (Teacher/sandbox.py):
+скільки здач на секунду перевіряє run_tests() при різній кількості
+процесів у пулі (SANDBOX_WORKERS). Здачі надходять з --threads потоків
+одночасно, як від паралельних запитів. Суміш: правильні, неправильні,
+з винятком і (опційно) нескінченний цикл, що впирається в таймаут.
+
+    python -m benchmarks.bench_sandbox --workers 1 2 4 8 --submissions 200 --cases 5
+"""
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import print_table, setup_django, summarize, write_json
+
+SUBMISSIONS = {
+    "correct": "a, b = map(int, input().split())\nprint(a + b)\n",
+    "wrong": "a, b = map(int, input().split())\nprint(a - b)\n",
+    "crash": "a, b = input().split()\nprint(a + b + 1)\n",
+    "timeout": "while True:\n    pass\n",
+}
+
+
+def make_cases(count):
+    return [
+        {"input": f"{a} {b}\n", "expected_output": f"{a + b}\n"}
+        for a, b in ((random.randint(-999, 999), random.randint(-999, 999)) for _ in range(count))
+    ]
+
+
+def make_submissions(count, timeout_share):
+    kinds = ["correct", "correct", "wrong", "crash"]
+    submissions = []
+    for _ in range(count):
+        kind = "timeout" if random.random() < timeout_share else random.choice(kinds)
+        submissions.append(SUBMISSIONS[kind])
+    return submissions
+
+
+def run(workers, submissions, cases, threads):
+    from django.test.utils import override_settings
+    from Teacher import sandbox
+
+    with override_settings(SANDBOX_WORKERS=workers):
+        sandbox.run_tests(SUBMISSIONS["correct"], cases[:1])  # прогрів пулу
+
+        def one(code):
+            start = time.perf_counter()
+            results = sandbox.run_tests(code, cases)
+            return time.perf_counter() - start, sum(r["passed"] for r in results)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(one, submissions))
+        elapsed = time.perf_counter() - start
+
+    row = {"workers": workers}
+    row.update(summarize(
+        [r[0] for r in results], elapsed,
+        cases_per_sec=round(len(submissions) * len(cases) / elapsed, 1),
+    ))
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--submissions", type=int, default=200)
+    parser.add_argument("--cases", type=int, default=5, help="кейсів на здачу")
+    parser.add_argument("--threads", type=int, default=16, help="одночасних здач")
+    parser.add_argument("--timeout-share", type=float, default=0.0, help="частка здач з нескінченним циклом")
+    parser.add_argument("--json", help="зберегти результати у файл")
+    args = parser.parse_args()
+
+    setup_django()
+    random.seed(42)
+    cases = make_cases(args.cases)
+    submissions = make_submissions(args.submissions, args.timeout_share)
+
+    rows = [run(workers, submissions, cases, args.threads) for workers in sorted(set(args.workers))]
+    print(f"cpu_count={os.cpu_count()}  submissions={args.submissions}  cases={args.cases}")
+    print_table(rows)
+    if args.json:
+        write_json(args.json, rows)
+
+
+if __name__ == "__main__":
+    main()
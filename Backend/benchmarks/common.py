@@ -0,0 +1,107 @@
+"""
+Спільна обв'язка для бенчмарків.
+
+Запуск з каталогу Backend:
+    python -m benchmarks.<name> [--help]
+
+Бенчмарки піднімають окрему тимчасову БД (як test runner),
+тож робоча db.sqlite3 не чіпається.
+"""
+import json
+import os
+import statistics
+import tempfile
+
+
+def setup_django(**env):
+    for key, value in env.items():
+        os.environ[key] = str(value)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Backend.settings")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+    # Бенчмарки ганяють одних і тих самих юзерів — ліміти генерацій їм заважають
+    os.environ.setdefault("RATE_LIMITS_DISABLED", "1")
+    os.environ.setdefault("DAILY_TOKEN_QUOTA", "0")
+
+    import django
+    django.setup()
+
+
+def create_test_database():
+    """
+    Створює тестову БД і повертає її ім'я.
+    SQLite кладемо у файл, а не в пам'ять: інакше потоки б'ються
+    за shared-cache локи і цифри нічого не значать.
+    """
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    if connection.vendor == "sqlite":
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(
+            tempfile.mkdtemp(prefix="edupixels-bench-"), "bench.sqlite3"
+        )
+        connection.settings_dict["OPTIONS"].setdefault("timeout", 30)
+    return connection.creation.create_test_db(verbosity=0, serialize=False)
+
+
+def destroy_test_database(name):
+    from django.db import connection
+    from django.test.utils import teardown_test_environment
+    from Auth import token_ledger
+
+    # Буфер журналу токенів — поки тимчасова БД ще існує
+    token_ledger.flush()
+    connection.creation.destroy_test_db(name, verbosity=0)
+    teardown_test_environment()
+
+
+def create_user(username="bench", password="bench-password-1"):
+    from Auth.models import CustomUser
+    return CustomUser.objects.create_user(
+        username=username, email=f"{username}@bench.local", password=password
+    )
+
+
+def auth_header(user):
+    from rest_framework_simplejwt.tokens import RefreshToken
+    return {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(latencies, elapsed, **extra):
+    """latencies і elapsed — в секундах, у звіті — мілісекунди."""
+    result = {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+    result.update(extra)
+    return result
+
+
+def print_table(rows):
+    if not rows:
+        return
+    columns = list(rows[0].keys())
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(widths[c]) for c in columns))
+
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,109 @@
+"""
+Локальний мок OpenRouter (/chat/completions) для навантажувальних тестів.
+Відповідає з заданою затримкою, нічого не коштує. На відміну від
+LLM_BACKEND=stub, йде через справжній HTTP-клієнт і пул з'єднань.
+
+    python -m benchmarks.mock_llm --port 8100 --latency 0.5 --jitter 0.1
+    OPENROUTER_BASE_URL=http://127.0.0.1:8100 python manage.py runserver
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from Courses.llm_backends import stub_content
+
+def mock_content(body):
+    """Ті самі заготовки, що й у StubBackend; ендпоінт вгадуємо з промпту."""
+    messages = body.get("messages") or []
+    system = messages[0]["content"] if messages else ""
+    if "Code Reviewer" in system:
+        endpoint = "review"
+    elif (body.get("response_format") or {}).get("type") == "json_object":
+        endpoint = "course"
+    elif "homework_focus" in (messages[-1]["content"] if messages else ""):
+        endpoint = "homework"
+    else:
+        endpoint = "lesson"
+    return stub_content(endpoint, messages)
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.5
+    jitter = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        content = mock_content(body)
+        base = {"id": "mock-completion", "created": int(time.time()), "model": body.get("model", "mock")}
+
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            step = 40
+            for i in range(0, len(content), step):
+                chunk = dict(base, object="chat.completion.chunk", choices=[
+                    {"index": 0, "delta": {"content": content[i:i + step]}, "finish_reason": None}
+                ])
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+            return
+
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+        completion_tokens = len(content) // 4
+        payload = json.dumps(dict(
+            base,
+            object="chat.completion",
+            choices=[{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            usage={
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        )).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start_mock_llm(port=0, latency=0.5, jitter=0.0):
+    """Стартує мок у фоновому потоці. Повертає (server, base_url)."""
+    handler = type("Handler", (MockLLMHandler,), {"latency": latency, "jitter": jitter})
+    server = MockLLMServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.5, help="секунди на відповідь")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    args = parser.parse_args()
+
+    server, url = start_mock_llm(args.port, args.latency, args.jitter)
+    print(f"Mock LLM listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()